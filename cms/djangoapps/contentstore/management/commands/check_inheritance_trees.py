@@ -0,0 +1,50 @@
+"""
+Command to check that the cached metadata inheritance trees and course structures,
+which Studio writes update incrementally, match the courses in the modulestore.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from xmodule.course_module import CourseDescriptor
+from xmodule.modulestore.django import modulestore
+
+
+class Command(BaseCommand):
+    """Compare the cached inheritance trees of courses with freshly computed ones"""
+    help = '''Compare the cached metadata inheritance trees and course structures of the given courses
+(or of all courses) with freshly computed ones, listing the urls that differ.
+With --repair, recompute the cached trees of inconsistent courses.'''
+    args = '[<course_id> ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--repair',
+                    action='store_true',
+                    dest='repair',
+                    default=False,
+                    help='Recompute the cached trees of courses found to be inconsistent'),
+    )
+
+    def handle(self, *args, **options):
+        store = modulestore('direct')
+        if not hasattr(store, 'check_cached_metadata_inheritance_tree'):
+            raise CommandError("The modulestore does not cache metadata inheritance trees")
+
+        if args:
+            locations = [CourseDescriptor.id_to_location(course_id) for course_id in args]
+        else:
+            locations = [course.location for course in store.get_courses()]
+
+        num_inconsistent = 0
+        for location in locations:
+            inconsistent = store.check_cached_metadata_inheritance_tree(location)
+            if not inconsistent:
+                continue
+            num_inconsistent += 1
+            self.stdout.write("{0}: {1} inconsistent entries\n".format(location.course_id, len(inconsistent)))
+            for url in inconsistent:
+                self.stdout.write("    {0}\n".format(url))
+            if options['repair']:
+                store.refresh_cached_metadata_inheritance_tree(location)
+                self.stdout.write("    repaired\n")
+
+        self.stdout.write("Checked {0} courses, {1} inconsistent\n".format(len(locations), num_inconsistent))
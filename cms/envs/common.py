@@ -192,6 +192,11 @@ MIDDLEWARE_CLASSES = (
     'session_inactivity_timeout.middleware.SessionInactivityTimeout',
 )
 
+# Local directory in which to cache assets too large for memcached, and the total size
+# it may grow to. The disk cache is disabled when the directory is None.
+STATIC_CONTENT_DISK_CACHE_DIR = None
+STATIC_CONTENT_DISK_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
 ############# XBlock Configuration ##########
 
 # This should be moved into an XBlock Runtime/Application object
@@ -0,0 +1,129 @@
+"""
+A local on-disk cache of the content of assets too large to cache in memcached.
+"""
+import errno
+import hashlib
+import logging
+import os
+import tempfile
+
+from xmodule.contentstore.content import StaticContentStream
+
+log = logging.getLogger(__name__)
+
+# prefix of the files assets are written to before being moved into the cache
+TEMP_FILE_PREFIX = '.tmp-'
+
+
+class AssetDiskCache(object):
+    """
+    Caches asset content in files in `directory`, evicting the least recently used files
+    once they total more than `max_size` bytes.
+
+    Files are named by the asset's location and content digest, so a changed asset is
+    never served from a stale file: the old file just ages out. Files are written under a
+    temporary name and renamed into place, so several processes can share the directory.
+    """
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        try:
+            os.makedirs(directory)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+
+    def _path(self, content):
+        """
+        Return the path of the file holding content
+        """
+        location_hash = hashlib.md5(unicode(content.location).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, '{}-{}'.format(location_hash, content.content_digest))
+
+    def open(self, content):
+        """
+        Return a StaticContentStream reading the cached copy of content's data, or None if
+        it isn't cached. The caller must close it.
+        """
+        if not content.content_digest:
+            return None
+        path = self._path(content)
+        try:
+            cached_file = open(path, 'rb')
+        except IOError:
+            return None
+
+        try:
+            # mark the file as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return StaticContentStream(
+            content.location, content.name, content.content_type, cached_file,
+            last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+            import_path=content.import_path, length=content.length, locked=content.locked,
+            content_digest=content.content_digest
+        )
+
+    def stream_data_and_cache(self, content):
+        """
+        Yield content's data, writing it to the cache as it goes. The file only enters the
+        cache once all the data has been read, so an abandoned download caches nothing.
+        """
+        if not content.content_digest or content.length is None or content.length > self.max_size:
+            for chunk in content.stream_data():
+                yield chunk
+            return
+
+        temp_fd, temp_path = tempfile.mkstemp(prefix=TEMP_FILE_PREFIX, dir=self.directory)
+        temp_file = os.fdopen(temp_fd, 'wb')
+        try:
+            for chunk in content.stream_data():
+                if temp_file is not None:
+                    try:
+                        temp_file.write(chunk)
+                    except IOError:
+                        log.warning("Failed to write %s to the asset disk cache", content.location, exc_info=True)
+                        temp_file.close()
+                        temp_file = None
+                yield chunk
+
+            if temp_file is not None:
+                temp_file.close()
+                temp_file = None
+                os.rename(temp_path, self._path(content))
+                self.evict()
+        finally:
+            if temp_file is not None:
+                temp_file.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self):
+        """
+        Remove the least recently used files until the cache is no bigger than max_size
+        """
+        entries = []
+        total_size = 0
+        for filename in os.listdir(self.directory):
+            if filename.startswith(TEMP_FILE_PREFIX):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for __, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
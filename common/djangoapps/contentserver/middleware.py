@@ -1,15 +1,36 @@
+import calendar
+import re
+
+from django.conf import settings
 from django.http import (HttpResponse, HttpResponseNotModified,
     HttpResponseForbidden)
+from django.utils.http import http_date, parse_http_date_safe
 from student.models import CourseEnrollment
 
 from xmodule.contentstore.django import contentstore
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, StaticContentStream, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
 from cache_toolbox.core import get_cached_content, set_cached_content
 from xmodule.exceptions import NotFoundError
 
+from .disk_cache import AssetDiskCache
+
+# assets smaller than this are cached in memcached; larger ones are streamed from GridFS
+MAX_CACHED_CONTENT_SIZE = 1048576
+
+# a single byte range, e.g. "bytes=0-499", "bytes=500-" or "bytes=-500"
+BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
 
 class StaticContentServer(object):
+    def __init__(self):
+        self.disk_cache = None
+        if getattr(settings, 'STATIC_CONTENT_DISK_CACHE_DIR', None):
+            self.disk_cache = AssetDiskCache(
+                settings.STATIC_CONTENT_DISK_CACHE_DIR,
+                settings.STATIC_CONTENT_DISK_CACHE_SIZE
+            )
+
     def process_request(self, request):
         # look to see if the request is prefixed with 'c4x' tag
         if request.path.startswith('/' + XASSET_LOCATION_TAG + '/'):
@@ -33,15 +54,13 @@ class StaticContentServer(object):
                     return response
 
                 # since we fetched it from DB, let's cache it going forward, but only if it's < 1MB
-                # this is because I haven't been able to find a means to stream data out of memcached
+                # as we can't stream data out of memcached. Larger content is streamed from GridFS
+                # (or the disk cache) a chunk at a time.
                 if content.length is not None:
-                    if content.length < 1048576:
+                    if content.length < MAX_CACHED_CONTENT_SIZE:
                         # since we've queried as a stream, let's read in the stream into memory to set in cache
                         content = content.copy_to_in_mem()
                         set_cached_content(content)
-            else:
-                # NOP here, but we may wish to add a "cache-hit" counter in the future
-                pass
 
             # Check that user has access to content
             if getattr(content, "locked", False):
@@ -52,18 +71,129 @@ class StaticContentServer(object):
                         request.user, course_partial_id):
                     return HttpResponseForbidden('Unauthorized')
 
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+            # getattr b/c content cached before digests were recorded doesn't have one
+            content_digest = getattr(content, 'content_digest', None)
+            etag = '"{}"'.format(content_digest) if content_digest else None
+            last_modified = calendar.timegm(content.last_modified_at.utctimetuple())
+
+            if self._is_not_modified(request, etag, last_modified):
+                response = HttpResponseNotModified()
+                self._set_validators(response, etag, last_modified)
+                return response
 
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            from_disk_cache = False
+            if isinstance(content, StaticContentStream) and self.disk_cache is not None:
+                cached_content = self.disk_cache.open(content)
+                if cached_content is not None:
+                    content = cached_content
+                    from_disk_cache = True
 
-            response = HttpResponse(content.stream_data(), content_type=content.content_type)
-            response['Last-Modified'] = last_modified_at_str
+            length = content.length
+            byte_range = None
+            if length is not None and self._range_applies(request, etag, last_modified):
+                byte_range = self._parse_byte_range(request.META.get('HTTP_RANGE', ''), length)
+                if byte_range == 'unsatisfiable':
+                    if from_disk_cache:
+                        content.close()
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = 'bytes */{}'.format(length)
+                    return response
 
+            if byte_range is None or byte_range == (0, length - 1):
+                # stream large content from GridFS into the disk cache as it is served
+                if (not from_disk_cache and self.disk_cache is not None and
+                        isinstance(content, StaticContentStream) and length >= MAX_CACHED_CONTENT_SIZE):
+                    data = self.disk_cache.stream_data_and_cache(content)
+                else:
+                    data = content.stream_data()
+            else:
+                data = content.stream_data_in_range(*byte_range)
+            if from_disk_cache:
+                data = self._closing(content, data)
+
+            response = HttpResponse(data, content_type=content.content_type)
+            if byte_range is not None:
+                first_byte, last_byte = byte_range
+                response.status_code = 206
+                response['Content-Range'] = 'bytes {}-{}/{}'.format(first_byte, last_byte, length)
+                response['Content-Length'] = str(last_byte - first_byte + 1)
+            elif length is not None:
+                response['Content-Length'] = str(length)
+            response['Accept-Ranges'] = 'bytes'
+            self._set_validators(response, etag, last_modified)
             return response
+
+    def _set_validators(self, response, etag, last_modified):
+        """
+        Set the headers clients use to revalidate their cached copy of the content
+        """
+        response['Last-Modified'] = http_date(last_modified)
+        if etag is not None:
+            response['ETag'] = etag
+
+    def _is_not_modified(self, request, etag, last_modified):
+        """
+        Return whether the client's cached copy (as described by the request's conditional
+        headers) is current. If-None-Match takes precedence over If-Modified-Since.
+        """
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            if etag is None:
+                return False
+            return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and last_modified <= if_modified_since
+
+    def _range_applies(self, request, etag, last_modified):
+        """
+        Return whether the request's Range header should be honored: it must have one, and any
+        If-Range must match the current content
+        """
+        if 'HTTP_RANGE' not in request.META:
+            return False
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None:
+            return True
+        if etag is not None and if_range.strip() == etag:
+            return True
+        return parse_http_date_safe(if_range) == last_modified
+
+    def _parse_byte_range(self, range_header, length):
+        """
+        Return the (first_byte, last_byte) of a single byte range header for content of the given
+        length, 'unsatisfiable' if the range lies outside the content, or None if the header can't
+        be honored (e.g. it's malformed or asks for several ranges), in which case the whole content
+        should be served.
+        """
+        match = BYTE_RANGE_RE.match(range_header.strip())
+        if match is None:
+            return None
+        first, last = match.groups()
+        if first:
+            first_byte = int(first)
+            last_byte = min(int(last), length - 1) if last else length - 1
+            if first_byte >= length:
+                return 'unsatisfiable'
+            if last_byte < first_byte:
+                return None
+        elif last:
+            # a suffix range: the last N bytes
+            suffix_length = int(last)
+            if suffix_length == 0:
+                return 'unsatisfiable'
+            first_byte = max(length - suffix_length, 0)
+            last_byte = length - 1
+        else:
+            return None
+        return first_byte, last_byte
+
+    def _closing(self, content, data):
+        """
+        Yield from data, closing content afterwards
+        """
+        try:
+            for chunk in data:
+                yield chunk
+        finally:
+            content.close()
@@ -3,25 +3,34 @@ Tests for StaticContentServer
 """
 import copy
 import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from StringIO import StringIO
 from uuid import uuid4
 from path import path
 from pymongo import MongoClient
 
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.test import TestCase
 from django.test.client import Client
 from django.test.utils import override_settings
+from django.utils.http import http_date
 
 from student.models import CourseEnrollment
 
 from xmodule.contentstore.django import contentstore, _CONTENTSTORE
 from xmodule.modulestore import Location
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, StaticContentStream
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.django_utils import (studio_store_config,
     ModuleStoreTestCase)
 from xmodule.modulestore.xml_importer import import_from_xml
 
+from contentserver.disk_cache import AssetDiskCache
+
 log = logging.getLogger(__name__)
 
 TEST_DATA_CONTENTSTORE = copy.deepcopy(settings.CONTENTSTORE)
@@ -134,3 +143,94 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         resp = self.client.get(self.url_locked)
         self.assertEqual(resp.status_code, 200) #pylint: disable=E1103
 
+
+    def test_etag(self):
+        """
+        Test that a matching If-None-Match gets a 304.
+        """
+        resp = self.client.get(self.url_unlocked)
+        etag = resp['ETag']
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+
+    def test_if_modified_since(self):
+        """
+        Test that If-Modified-Since is compared as a date rather than a string.
+        """
+        resp = self.client.get(self.url_unlocked)
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+
+    def test_range(self):
+        """
+        Test that byte ranges get partial content.
+        """
+        content = self.contentstore.find(self.loc_unlocked)
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp.content, content.data[10:20])
+        self.assertEqual(resp['Content-Range'], 'bytes 10-19/{}'.format(content.length))
+        self.assertEqual(resp['Content-Length'], '10')
+
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=-5')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp.content, content.data[-5:])
+
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={}-'.format(content.length))
+        self.assertEqual(resp.status_code, 416)  # pylint: disable=E1103
+
+        # a range that can't be honored gets the whole content
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+        self.assertEqual(resp.content, content.data)
+
+
+class AssetDiskCacheTest(TestCase):
+    """
+    Tests for the on-disk cache of large assets.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = AssetDiskCache(self.directory, 100)
+
+    def content(self, name, data):
+        """
+        Return a StaticContentStream of data
+        """
+        return StaticContentStream(
+            Location('c4x', 'edX', 'toy', 'asset', name), name, 'application/octet-stream', StringIO(data),
+            last_modified_at=datetime.now(), length=len(data), content_digest='digest-' + name
+        )
+
+    def test_stream_and_cache(self):
+        content = self.content('a', 'x' * 60)
+        self.assertIsNone(self.cache.open(content))
+        self.assertEqual(''.join(self.cache.stream_data_and_cache(content)), 'x' * 60)
+
+        cached = self.cache.open(self.content('a', ''))
+        self.assertEqual(''.join(cached.stream_data()), 'x' * 60)
+        self.assertEqual(''.join(cached.stream_data_in_range(10, 14)), 'x' * 5)
+        cached.close()
+
+    def test_abandoned_stream_not_cached(self):
+        content = self.content('a', 'x' * 60)
+        data = self.cache.stream_data_and_cache(content)
+        next(data)
+        data.close()
+        self.assertIsNone(self.cache.open(content))
+
+    def test_eviction(self):
+        content = self.content('a', 'x' * 60)
+        list(self.cache.stream_data_and_cache(content))
+        # make sure 'a' is the least recently used, whatever the filesystem's mtime resolution
+        os.utime(self.cache._path(content), (0, 0))  # pylint: disable=protected-access
+        list(self.cache.stream_data_and_cache(self.content('b', 'x' * 60)))
+        # the least recently used asset was evicted to keep within the size limit
+        self.assertIsNone(self.cache.open(self.content('a', '')))
+        self.assertIsNotNone(self.cache.open(self.content('b', '')))
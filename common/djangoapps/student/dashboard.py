@@ -0,0 +1,214 @@
+"""
+Batched loading of the per-course data shown on the student dashboard.
+
+The dashboard lists every course a student is enrolled in, along with the
+course's modes, the student's certificate and any open midcourse
+reverification window. Looking these up course by course costs several
+queries per enrollment, so `DashboardData` loads them for all of the
+student's courses at once. The data that doesn't depend on the student is
+kept in a cached `CourseSummary` per course.
+"""
+import datetime
+
+from pytz import UTC
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from bulk_email.models import CourseAuthorization
+from certificates.models import certificate_statuses_for_student
+from course_modes.models import CourseMode, Mode
+from reverification.models import MidcourseReverificationWindow
+from verify_student.models import SoftwareSecurePhotoVerification
+
+# Course summaries are dropped from the cache whenever the modes, windows or
+# email authorization of their course change, so this only bounds how long a
+# summary missed by that (e.g. after a bulk update) can be out of date.
+COURSE_SUMMARY_CACHE_TIMEOUT = 60 * 60
+
+
+class CourseSummary(object):
+    """
+    The data about a course that the dashboard shows to every student enrolled
+    in it: the course's modes, its midcourse reverification windows, and
+    whether instructor email is authorized for it.
+
+    Summaries hold the data whatever the time, and are filtered by the current
+    time when read, so that they can be cached.
+    """
+    def __init__(self, course_id, modes, reverification_windows, email_authorized):
+        self.course_id = course_id
+        self.modes = modes
+        self.reverification_windows = reverification_windows
+        self.email_authorized = email_authorized
+
+    @staticmethod
+    def cache_key(course_id):
+        """Return the cache key of the summary of the course"""
+        return u'student.dashboard.course_summary.{0}'.format(course_id)
+
+    @classmethod
+    def get_many(cls, course_ids):
+        """
+        Return a dictionary mapping each of course_ids to its summary, loading
+        the summaries that aren't cached in a fixed number of queries.
+        """
+        keys = dict((cls.cache_key(course_id), course_id) for course_id in course_ids)
+        summaries = dict(
+            (keys[key], summary) for key, summary in cache.get_many(keys.keys()).iteritems()
+        )
+        missing = [course_id for course_id in course_ids if course_id not in summaries]
+        if missing:
+            loaded = cls.load_many(missing)
+            cache.set_many(
+                dict((cls.cache_key(course_id), summary) for course_id, summary in loaded.iteritems()),
+                COURSE_SUMMARY_CACHE_TIMEOUT
+            )
+            summaries.update(loaded)
+        return summaries
+
+    @classmethod
+    def load_many(cls, course_ids):
+        """
+        Return a dictionary mapping each of course_ids to its summary, read
+        from the database with one query per kind of data.
+        """
+        modes = dict((course_id, []) for course_id in course_ids)
+        for course_mode in CourseMode.objects.filter(course_id__in=course_ids):
+            modes[course_mode.course_id].append(Mode(
+                course_mode.mode_slug,
+                course_mode.mode_display_name,
+                course_mode.min_price,
+                course_mode.suggested_prices,
+                course_mode.currency,
+                course_mode.expiration_datetime
+            ))
+
+        windows = dict((course_id, []) for course_id in course_ids)
+        for window in MidcourseReverificationWindow.objects.filter(course_id__in=course_ids):
+            windows[window.course_id].append(window)
+
+        email_authorized = dict(
+            CourseAuthorization.objects.filter(course_id__in=course_ids).values_list('course_id', 'email_enabled')
+        )
+
+        return dict(
+            (course_id, cls(course_id, modes[course_id], windows[course_id], email_authorized.get(course_id, False)))
+            for course_id in course_ids
+        )
+
+    @classmethod
+    def invalidate(cls, course_id):
+        """Drop the cached summary of the course"""
+        cache.delete(cls.cache_key(course_id))
+
+    def modes_dict(self, now):
+        """
+        Return the modes of the course unexpired at now, as
+        CourseMode.modes_for_course_dict does.
+        """
+        modes = [
+            mode for mode in self.modes
+            if mode.expiration_datetime is None or mode.expiration_datetime >= now
+        ]
+        if not modes:
+            modes = [CourseMode.DEFAULT_MODE]
+        return dict((mode.slug, mode) for mode in modes)
+
+    def reverification_window(self, now):
+        """
+        Return the reverification window open at now, as
+        MidcourseReverificationWindow.get_window does.
+        """
+        windows = [
+            window for window in self.reverification_windows
+            if window.start_date is not None and window.end_date is not None and
+            window.start_date <= now <= window.end_date
+        ]
+        if len(windows) != 1:
+            return None
+        return windows[0]
+
+    def email_enabled(self):
+        """
+        Return whether instructor email is enabled for the course, as
+        CourseAuthorization.instructor_email_enabled does.
+        """
+        if not settings.FEATURES['REQUIRE_COURSE_EMAIL_AUTH']:
+            return True
+        return self.email_authorized
+
+
+@receiver(post_save, sender=CourseMode)
+@receiver(post_delete, sender=CourseMode)
+@receiver(post_save, sender=MidcourseReverificationWindow)
+@receiver(post_delete, sender=MidcourseReverificationWindow)
+@receiver(post_save, sender=CourseAuthorization)
+@receiver(post_delete, sender=CourseAuthorization)
+def invalidate_course_summary(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Drop the cached summary of the course whose modes, reverification windows
+    or email authorization changed.
+    """
+    CourseSummary.invalidate(instance.course_id)
+
+
+class DashboardData(object):
+    """
+    The per-course data of a student's dashboard, loaded for all of the
+    student's (course, enrollment) pairs in a fixed number of queries: the
+    courses' summaries (if they aren't cached), the student's certificates in
+    the courses that have ended, and the student's attempts in the open
+    reverification windows of the courses they are verified in.
+    """
+    def __init__(self, user, course_enrollment_pairs):
+        self.now = datetime.datetime.now(UTC)
+        course_ids = [course.id for course, _enrollment in course_enrollment_pairs]
+        self.summaries = CourseSummary.get_many(course_ids)
+
+        ended_course_ids = [course.id for course, _enrollment in course_enrollment_pairs if course.has_ended()]
+        if ended_course_ids:
+            self.certificate_statuses = certificate_statuses_for_student(user, ended_course_ids)
+        else:
+            self.certificate_statuses = {}
+
+        self.reverification_windows = {}
+        for course, enrollment in course_enrollment_pairs:
+            window = self.summaries[course.id].reverification_window(self.now)
+            if window is not None and enrollment.mode == 'verified':
+                self.reverification_windows[course.id] = window
+        self.reverification_statuses = SoftwareSecurePhotoVerification.reverification_statuses(
+            user, self.reverification_windows.values()
+        )
+
+    def modes(self, course_id):
+        """Return the course's unexpired modes, as CourseMode.modes_for_course_dict does"""
+        return self.summaries[course_id].modes_dict(self.now)
+
+    def refundable(self, course_id):
+        """Return whether enrollments in the course are refundable, as CourseEnrollment.refundable does"""
+        return 'verified' in self.modes(course_id)
+
+    def email_enabled(self, course_id):
+        """Return whether instructor email is enabled for the course"""
+        return self.summaries[course_id].email_enabled()
+
+    def certificate_status(self, course_id):
+        """
+        Return the student's certificate status in the course, as
+        certificate_status_for_student does, if the course has ended
+        """
+        return self.certificate_statuses.get(course_id)
+
+    def reverification(self, course_id):
+        """
+        Return (window, status, display) for the reverification window open
+        in the course, if the student is verified in it, or None
+        """
+        window = self.reverification_windows.get(course_id)
+        if window is None:
+            return None
+        status, _error_msg, display = self.reverification_statuses[window.id]
+        return window, status, display
@@ -0,0 +1,117 @@
+"""
+Tests of the batched loading of the student dashboard's data.
+"""
+from datetime import datetime, timedelta
+from mock import patch
+import pytz
+
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from courseware.tests.tests import TEST_DATA_MIXED_MODULESTORE
+
+from bulk_email.models import CourseAuthorization
+from certificates.models import CertificateStatuses, GeneratedCertificate
+from reverification.tests.factories import MidcourseReverificationWindowFactory
+from student.dashboard import CourseSummary, DashboardData
+from student.models import CourseEnrollment
+from student.tests.factories import UserFactory, CourseModeFactory
+from student.views import cert_info, complete_course_mode_info, reverification_info
+from verify_student.models import SoftwareSecurePhotoVerification
+
+NUM_COURSES = 4
+REVERIFICATION_STATUSES = ["approved", "denied", "pending", "must_reverify"]
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class DashboardDataTest(ModuleStoreTestCase):
+    """
+    Test that DashboardData loads the same data as the per-course lookups,
+    in a number of queries which doesn't grow with the number of courses.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory.create()
+        self.course_enrollment_pairs = []
+        for index in range(NUM_COURSES):
+            course = CourseFactory.create(
+                number='Dashboard_{0}'.format(index),
+                end=datetime.now(pytz.UTC) - timedelta(days=1),
+            )
+            CourseModeFactory.create(course_id=course.id, mode_slug='honor')
+            CourseModeFactory.create(
+                course_id=course.id,
+                mode_slug='verified',
+                expiration_datetime=datetime.now(pytz.UTC) + timedelta(days=index - 1),
+            )
+            window = MidcourseReverificationWindowFactory(course_id=course.id)
+            SoftwareSecurePhotoVerification(user=self.user, window=window, status='submitted').save()
+            GeneratedCertificate.objects.create(
+                user=self.user, course_id=course.id, status=CertificateStatuses.downloadable,
+                download_url='http://example.com/{0}.pdf'.format(index), grade='0.{0}'.format(index + 5),
+            )
+            CourseAuthorization.objects.create(course_id=course.id, email_enabled=bool(index % 2))
+            enrollment = CourseEnrollment.enroll(self.user, course.id, mode='verified')
+            self.course_enrollment_pairs.append((course, enrollment))
+
+    def load(self):
+        """Load the dashboard data, returning what the dashboard view gets from it"""
+        dashboard_data = DashboardData(self.user, self.course_enrollment_pairs)
+        return (
+            [
+                complete_course_mode_info(course.id, enrollment, dashboard_data.modes(course.id))
+                for course, enrollment in self.course_enrollment_pairs
+            ],
+            [
+                cert_info(self.user, course, dashboard_data.certificate_status(course.id))
+                for course, _enrollment in self.course_enrollment_pairs
+            ],
+            [dashboard_data.email_enabled(course.id) for course, _enrollment in self.course_enrollment_pairs],
+            [dashboard_data.refundable(course.id) for course, _enrollment in self.course_enrollment_pairs],
+            reverification_info(self.course_enrollment_pairs, self.user, REVERIFICATION_STATUSES, dashboard_data),
+        )
+
+    def test_num_queries(self):
+        # the courses' modes, reverification windows and email authorizations,
+        # and the user's certificates and reverification attempts:
+        with self.assertNumQueries(5):
+            self.load()
+        # with the course summaries cached:
+        with self.assertNumQueries(2):
+            self.load()
+
+    @patch.dict('django.conf.settings.FEATURES', {'REQUIRE_COURSE_EMAIL_AUTH': True})
+    def test_matches_per_course_lookups(self):
+        expected = (
+            [
+                complete_course_mode_info(course.id, enrollment)
+                for course, enrollment in self.course_enrollment_pairs
+            ],
+            [cert_info(self.user, course) for course, _enrollment in self.course_enrollment_pairs],
+            [
+                CourseAuthorization.instructor_email_enabled(course.id)
+                for course, _enrollment in self.course_enrollment_pairs
+            ],
+            [enrollment.refundable() for _course, enrollment in self.course_enrollment_pairs],
+            reverification_info(self.course_enrollment_pairs, self.user, REVERIFICATION_STATUSES),
+        )
+        # once when loading the summaries, once when reading them from the cache:
+        self.assertEqual(self.load(), expected)
+        self.assertEqual(self.load(), expected)
+        self.assertEqual(expected[2], [False, True, False, True])
+        self.assertEqual(expected[3], [False, False, True, True])
+        self.assertEqual(len(expected[4]['pending']), NUM_COURSES)
+
+    def test_summaries_invalidated(self):
+        course_id = self.course_enrollment_pairs[0][0].id
+        self.assertFalse(CourseSummary.get_many([course_id])[course_id].email_authorized)
+
+        authorization = CourseAuthorization.objects.get(course_id=course_id)
+        authorization.email_enabled = True
+        authorization.save()
+        self.assertTrue(CourseSummary.get_many([course_id])[course_id].email_authorized)
+
+        CourseModeFactory.create(course_id=course_id, mode_slug='audit')
+        self.assertIn('audit', CourseSummary.get_many([course_id])[course_id].modes_dict(datetime.now(pytz.UTC)))
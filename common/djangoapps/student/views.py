@@ -45,6 +45,7 @@ from student.models import (
     PendingEmailChange, CourseEnrollment, unique_id_for_user,
     CourseEnrollmentAllowed, UserStanding, LoginFailures
 )
+from student.dashboard import DashboardData
 from student.forms import PasswordResetFormNoActive
 
 from verify_student.models import SoftwareSecurePhotoVerification, MidcourseReverificationWindow
@@ -63,7 +64,7 @@ from courseware.access import has_access
 from external_auth.models import ExternalAuthMap
 import external_auth.views
 
-from bulk_email.models import Optout, CourseAuthorization
+from bulk_email.models import Optout
 import shoppingcart
 
 import track.views
@@ -165,10 +166,11 @@ def process_survey_link(survey_link, user):
     return survey_link.format(UNIQUE_ID=unique_id_for_user(user))
 
 
-def cert_info(user, course):
+def cert_info(user, course, cert_status=None):
     """
     Get the certificate info needed to render the dashboard section for the given
-    student and course.  Returns a dictionary with keys:
+    student and course, from the student's cert_status (as returned by
+    certificate_status_for_student) if already known.  Returns a dictionary with keys:
 
     'status': one of 'generating', 'ready', 'notpassing', 'processing', 'restricted'
     'show_download_url': bool
@@ -181,10 +183,12 @@ def cert_info(user, course):
     if not course.has_ended():
         return {}
 
-    return _cert_info(user, course, certificate_status_for_student(user, course.id))
+    if cert_status is None:
+        cert_status = certificate_status_for_student(user, course.id)
+    return _cert_info(user, course, cert_status)
 
 
-def reverification_info(course_enrollment_pairs, user, statuses):
+def reverification_info(course_enrollment_pairs, user, statuses, dashboard_data=None):
     """
     Returns reverification-related information for *all* of user's enrollments whose
     reverification status is in status_list
@@ -194,6 +198,7 @@ def reverification_info(course_enrollment_pairs, user, statuses):
         user (User): the user whose information we want
         statuses (list): a list of reverification statuses we want information for
             example: ["must_reverify", "denied"]
+        dashboard_data (DashboardData): the data already loaded for course_enrollment_pairs, if any
 
     Returns:
         dictionary of lists: dictionary with one key per status, e.g.
@@ -202,7 +207,7 @@ def reverification_info(course_enrollment_pairs, user, statuses):
     """
     reverifications = defaultdict(list)
     for (course, enrollment) in course_enrollment_pairs:
-        info = single_course_reverification_info(user, course, enrollment)
+        info = single_course_reverification_info(user, course, enrollment, dashboard_data)
         if info:
             reverifications[info.status].append(info)
 
@@ -213,7 +218,7 @@ def reverification_info(course_enrollment_pairs, user, statuses):
     return reverifications
 
 
-def single_course_reverification_info(user, course, enrollment):  # pylint: disable=invalid-name
+def single_course_reverification_info(user, course, enrollment, dashboard_data=None):  # pylint: disable=invalid-name
     """Returns midcourse reverification-related information for user with enrollment in course.
 
     If a course has an open re-verification window, and that user has a verified enrollment in
@@ -223,11 +228,24 @@ def single_course_reverification_info(user, course, enrollment):  # pylint: disa
         user (User): the user we want to get information for
         course (Course): the course in which the student is enrolled
         enrollment (CourseEnrollment): the object representing the type of enrollment user has in course
+        dashboard_data (DashboardData): the data already loaded for the user's dashboard, if any
 
     Returns:
         ReverifyInfo: (course_id, course_name, course_number, date, status)
         OR, None: None if there is no re-verification info for this enrollment
     """
+    if dashboard_data is not None:
+        reverification = dashboard_data.reverification(course.id)
+        if reverification is None:
+            return None
+        window, status, display = reverification
+        return ReverifyInfo(
+            course.id, course.display_name, course.number,
+            window.end_date.strftime('%B %d, %Y %X %p'),
+            status,
+            display,
+        )
+
     window = MidcourseReverificationWindow.get_window(course.id, datetime.datetime.now(UTC))
 
     # If there's no window OR the user is not verified, we don't get reverification info
@@ -378,16 +396,18 @@ def register_user(request, extra_context=None):
     return render_to_response('register.html', context)
 
 
-def complete_course_mode_info(course_id, enrollment):
+def complete_course_mode_info(course_id, enrollment, modes=None):
     """
     We would like to compute some more information from the given course modes
-    and the user's current enrollment
+    (the course's unexpired modes, by slug, if not given) and the user's current
+    enrollment
 
     Returns the given information:
         - whether to show the course upsell information
         - numbers of days until they can't upsell anymore
     """
-    modes = CourseMode.modes_for_course_dict(course_id)
+    if modes is None:
+        modes = CourseMode.modes_for_course_dict(course_id)
     mode_info = {'show_upsell': False, 'days_for_upsell': None}
     # we want to know if the user is already verified and if verified is an
     # option
@@ -440,15 +460,24 @@ def dashboard(request):
     show_courseware_links_for = frozenset(course.id for course, _enrollment in course_enrollment_pairs
                                           if has_access(request.user, course, 'load'))
 
-    course_modes = {course.id: complete_course_mode_info(course.id, enrollment) for course, enrollment in course_enrollment_pairs}
-    cert_statuses = {course.id: cert_info(request.user, course) for course, _enrollment in course_enrollment_pairs}
+    # The modes, certificates, reverifications etc. of all the courses, loaded at once
+    dashboard_data = DashboardData(user, course_enrollment_pairs)
+
+    course_modes = {
+        course.id: complete_course_mode_info(course.id, enrollment, dashboard_data.modes(course.id))
+        for course, enrollment in course_enrollment_pairs
+    }
+    cert_statuses = {
+        course.id: cert_info(request.user, course, dashboard_data.certificate_status(course.id))
+        for course, _enrollment in course_enrollment_pairs
+    }
 
     # only show email settings for Mongo course and when bulk email is turned on
     show_email_settings_for = frozenset(
         course.id for course, _enrollment in course_enrollment_pairs if (
             settings.FEATURES['ENABLE_INSTRUCTOR_EMAIL'] and
             modulestore().get_modulestore_type(course.id) == MONGO_MODULESTORE_TYPE and
-            CourseAuthorization.instructor_email_enabled(course.id)
+            dashboard_data.email_enabled(course.id)
         )
     )
 
@@ -458,10 +487,10 @@ def dashboard(request):
 
     # Gets data for midcourse reverifications, if any are necessary or have failed
     statuses = ["approved", "denied", "pending", "must_reverify"]
-    reverifications = reverification_info(course_enrollment_pairs, user, statuses)
+    reverifications = reverification_info(course_enrollment_pairs, user, statuses, dashboard_data)
 
     show_refund_option_for = frozenset(course.id for course, _enrollment in course_enrollment_pairs
-                                       if _enrollment.refundable())
+                                       if dashboard_data.refundable(course.id))
 
     # get info w.r.t ExternalAuthMap
     external_auth_map = None
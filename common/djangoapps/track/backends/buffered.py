@@ -0,0 +1,159 @@
+"""
+Event tracker backend that queues events in-process and ships them to another
+backend in batches from a background thread, so that storing events doesn't
+add to the latency of the requests that emit them.
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import threading
+from Queue import Queue, Empty, Full
+
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+
+
+log = logging.getLogger(__name__)
+
+
+class BufferedBackend(BaseBackend):
+    """
+    Event tracker backend that wraps another backend, passing it events in
+    batches (with `send_many`) from a background thread.
+
+    It is configured with the wrapped backend's own configuration::
+
+      TRACKING_BACKENDS = {
+          'mongo': {
+              'ENGINE': 'track.backends.buffered.BufferedBackend',
+              'OPTIONS': {
+                  'backend': {
+                      'ENGINE': 'track.backends.mongodb.MongoBackend',
+                      'OPTIONS': {...}
+                  },
+                  'max_queue_size': 10000,
+                  'batch_size': 500,
+                  'flush_interval': 1,
+              }
+          }
+      }
+
+    Events that arrive while `max_queue_size` events are already waiting are
+    dropped (and counted) rather than making the request wait. Queued events
+    are flushed when the process exits.
+
+    """
+
+    def __init__(self, backend, max_queue_size=10000, batch_size=500, flush_interval=1, **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: configuration of the wrapped backend, with its
+            `ENGINE` and `OPTIONS`
+          - `max_queue_size`: the most events to hold before dropping
+            new ones
+          - `batch_size`: the most events to pass to the wrapped backend
+            at once
+          - `flush_interval`: the longest time (in seconds) to wait for a
+            batch to fill before sending it
+
+        """
+        super(BufferedBackend, self).__init__(**kwargs)
+
+        # imported here, as the tracker imports this module while initializing its backends
+        from track.tracker import _instantiate_backend_from_name  # pylint: disable=protected-access
+        self.backend = _instantiate_backend_from_name(backend['ENGINE'], backend.get('OPTIONS', {}))
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = Queue(max_queue_size)
+        self.num_dropped = 0
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        atexit.register(self.close)
+
+    def send(self, event):
+        """Queue the event, or drop it if the queue is full."""
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(event)
+        except Full:
+            self.num_dropped += 1
+            dog_stats_api.increment('track.buffered.dropped')
+
+    def send_many(self, events):
+        """Queue the events, dropping those that don't fit in the queue."""
+        for event in events:
+            self.send(event)
+
+    def _ensure_worker(self):
+        """
+        Start the thread that sends queued events, unless it is already running
+        in this process. (Threads don't survive the fork of a preloading server
+        into workers, so the worker is started by the first event in a process.)
+        """
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='track.buffered')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        """Send batches of queued events until the backend is closed."""
+        while not self._stopping.is_set():
+            try:
+                event = self.queue.get(timeout=self.flush_interval)
+            except Empty:
+                continue
+            self._send_batch(self._next_batch([event]))
+
+    def _next_batch(self, batch):
+        """Add queued events to batch (without waiting for more) up to the batch size."""
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _send_batch(self, batch):
+        """Pass batch to the wrapped backend."""
+        try:
+            with dog_stats_api.timer('track.buffered.send_batch'):
+                self.backend.send_many(batch)
+        except Exception:  # pylint: disable=broad-except
+            dog_stats_api.increment('track.buffered.failed', len(batch))
+            log.exception('Error sending a batch of %d events to %s', len(batch), type(self.backend).__name__)
+
+    def flush(self):
+        """Send all the queued events from the calling thread."""
+        batch = self._next_batch([])
+        while batch:
+            self._send_batch(batch)
+            batch = self._next_batch([])
+
+    def close(self, timeout=5):
+        """
+        Stop the background thread, waiting up to `timeout` seconds for it to
+        finish its current batch, and send the events still queued.
+        """
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join(timeout)
+        self.flush()
@@ -0,0 +1,70 @@
+from __future__ import absolute_import
+
+from mock import patch
+
+from django.test import TestCase
+
+from track.backends.buffered import BufferedBackend
+from track.tests.test_tracker import DummyBackend
+
+
+DUMMY_BACKEND = {'ENGINE': 'track.tests.test_tracker.DummyBackend'}
+
+
+class RecordingBackend(DummyBackend):
+    """A backend that records the batches of events it is sent."""
+    def __init__(self, **options):
+        super(RecordingBackend, self).__init__(**options)
+        self.batches = []
+
+    def send_many(self, events):
+        self.batches.append(list(events))
+
+
+class TestBufferedBackend(TestCase):
+    def setUp(self):
+        self.backend = BufferedBackend(
+            {'ENGINE': 'track.backends.tests.test_buffered.RecordingBackend'},
+            max_queue_size=3,
+            batch_size=2,
+            flush_interval=0.01,
+        )
+        self.addCleanup(self.backend.close)
+
+    def test_wrapped_backend_instantiated(self):
+        backend = BufferedBackend(dict(DUMMY_BACKEND, OPTIONS={'flag': True}))
+        self.assertIsInstance(backend.backend, DummyBackend)
+        self.assertTrue(backend.backend.flag)
+
+    def test_events_sent_in_batches(self):
+        # keep the worker from taking events off the queue while they are sent:
+        with patch.object(BufferedBackend, '_ensure_worker'):
+            self.backend.send_many([{'test': 1}, {'test': 2}, {'test': 3}])
+        self.backend.close()
+        self.assertEqual(
+            self.backend.backend.batches,
+            [[{'test': 1}, {'test': 2}], [{'test': 3}]]
+        )
+
+    def test_full_queue_drops_events(self):
+        with patch.object(BufferedBackend, '_ensure_worker'):
+            for index in range(5):
+                self.backend.send({'test': index})
+        self.assertEqual(self.backend.num_dropped, 2)
+        self.backend.flush()
+        self.assertEqual(sum(len(batch) for batch in self.backend.backend.batches), 3)
+
+    def test_worker_sends_events(self):
+        self.backend.send({'test': 1})
+        self.backend.close()
+        self.assertFalse(self.backend._thread.is_alive())  # pylint: disable=protected-access
+        self.assertEqual(self.backend.backend.batches, [[{'test': 1}]])
+
+    def test_failed_batch_logged(self):
+        with patch.object(RecordingBackend, 'send_many', side_effect=Exception):
+            with patch('track.backends.buffered.log') as mock_log:
+                with patch.object(BufferedBackend, '_ensure_worker'):
+                    self.backend.send({'test': 1})
+                self.backend.flush()
+        self.assertTrue(mock_log.exception.called)
+        self.assertEqual(self.backend.queue.qsize(), 0)
@@ -0,0 +1,393 @@
+"""
+Columnar storage of tracking events, for analytics.
+
+Tracking logs hold one JSON event per line, so every analysis of them has to
+parse every field of every event. `ColumnarWriter` converts events into
+compressed column files partitioned by course and day::
+
+    <root>/<course_id, quoted>/<YYYY-MM-DD>/<part>/_schema.json
+                                                  /<column files>
+
+Each export adds new parts to the partitions, so logs can be exported as they
+are rotated. `query` reads only the columns it is asked for, from only the
+partitions of the requested course and days, and `replay` returns the original
+events.
+
+Besides the fields common to all events (see COMMON_COLUMNS), there are typed
+columns for the fields of the payloads of common event types (see
+EVENT_COLUMNS), and a `raw` column holding each event's original JSON.
+
+"""
+
+import calendar
+import datetime
+import gzip
+import json
+import os
+import shutil
+import urllib
+import uuid
+
+import dateutil.parser
+import numpy
+from pytz import UTC
+
+from track.contexts import COURSE_REGEX
+
+# column types:
+TIMESTAMP = 'timestamp'  # microseconds since the epoch, as int64
+FLOAT = 'float'  # float64, with NaN for missing values
+STRING = 'string'  # short, repetitive strings: dictionary encoded, with int32 codes (-1 for None)
+TEXT = 'text'  # long strings: one per line
+
+# the columns of every event, taken from the event's top-level fields
+COMMON_COLUMNS = (
+    ('time', TIMESTAMP),
+    ('course_id', STRING),
+    ('username', STRING),
+    ('event_type', STRING),
+    ('event_source', STRING),
+    ('ip', STRING),
+    ('page', STRING),
+)
+
+PROBLEM_EVENTS = ('problem_check', 'problem_rescore')
+VIDEO_EVENTS = ('play_video', 'pause_video', 'seek_video', 'speed_change_video', 'load_video')
+SEQUENCE_EVENTS = ('seq_goto', 'seq_next', 'seq_prev')
+
+# typed columns for fields of the payloads (`event`) of common event types, as
+# (column, type, field, event types): other events have no value in the column
+EVENT_COLUMNS = (
+    ('problem_id', STRING, 'problem_id', PROBLEM_EVENTS),
+    ('attempts', FLOAT, 'attempts', PROBLEM_EVENTS),
+    ('success', STRING, 'success', PROBLEM_EVENTS),
+    ('grade', FLOAT, 'grade', ('problem_check',)),
+    ('max_grade', FLOAT, 'max_grade', ('problem_check',)),
+    ('video_id', STRING, 'id', VIDEO_EVENTS),
+    ('video_time', FLOAT, 'currentTime', ('play_video', 'pause_video')),
+    ('video_old_time', FLOAT, 'old_time', ('seek_video',)),
+    ('video_new_time', FLOAT, 'new_time', ('seek_video',)),
+    ('sequence_id', STRING, 'id', SEQUENCE_EVENTS),
+    ('sequence_old', FLOAT, 'old', SEQUENCE_EVENTS),
+    ('sequence_new', FLOAT, 'new', SEQUENCE_EVENTS),
+)
+
+COLUMNS = COMMON_COLUMNS + tuple((name, column_type) for name, column_type, __, __ in EVENT_COLUMNS) + (
+    ('raw', TEXT),
+)
+
+SCHEMA_FILENAME = '_schema.json'
+SCHEMA_VERSION = 1
+
+# the name of the partitions of events that aren't in a course
+NO_COURSE = '_no_course'
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def to_timestamp(time):
+    """
+    Return the microseconds since the epoch of `time`, a datetime (naive ones
+    are taken to be in UTC) or an isoformat string. Returns None if a string
+    can't be parsed.
+    """
+    if isinstance(time, basestring) and time:
+        try:
+            # the common case: the UTC times written by track.utils.DateTimeJSONEncoder
+            if len(time) == 32 and time.endswith('+00:00'):
+                time = datetime.datetime.strptime(time[:26], '%Y-%m-%dT%H:%M:%S.%f')
+            else:
+                time = dateutil.parser.parse(time)
+        except (ValueError, OverflowError):
+            return None
+    if not isinstance(time, datetime.datetime):
+        return None
+
+    if time.tzinfo is not None:
+        time = time.astimezone(UTC).replace(tzinfo=None)
+    return calendar.timegm(time.timetuple()) * 1000000 + time.microsecond
+
+
+def _day(timestamp):
+    """Return the date (in UTC) of timestamp"""
+    return (EPOCH + datetime.timedelta(microseconds=timestamp)).date()
+
+
+def _payload(event):
+    """
+    Return the dict of the event's payload. (Browser events send theirs as a
+    JSON string.) Returns an empty dict if the payload isn't a dict.
+    """
+    payload = event.get('event')
+    if isinstance(payload, basestring):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _course_id(event):
+    """Return the id of the course event happened in, or '' if none"""
+    context = event.get('context')
+    if isinstance(context, dict) and context.get('course_id'):
+        return context['course_id']
+    for url in (event.get('page'), event.get('event_type')):
+        match = COURSE_REGEX.match(url or '')
+        if match:
+            return match.group('course_id')
+    return ''
+
+
+def _course_dirname(course_id):
+    """Return the name of the directory of course_id's partitions"""
+    return urllib.quote(course_id.encode('utf-8'), safe='') if course_id else NO_COURSE
+
+
+def _float(value):
+    """Return value as a float, or NaN if it isn't a number"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _string(value):
+    """Return value as unicode, or None if it is missing"""
+    if value is None:
+        return None
+    return value if isinstance(value, unicode) else unicode(value)
+
+
+class ColumnarWriter(object):
+    """
+    Converts tracking events into column files under `root`.
+
+    Events are buffered until `max_rows` have been added, and then written as
+    new parts of their partitions. Call `close` to write the rest.
+    """
+    def __init__(self, root, max_rows=100000):
+        self.root = root
+        self.max_rows = max_rows
+        self.num_rows = 0
+        self.partitions = {}
+
+    def add(self, line):
+        """
+        Add the event logged as the JSON line. Returns False if the line isn't
+        an event with a valid time, and so was skipped.
+        """
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return False
+        if not isinstance(event, dict):
+            return False
+        timestamp = to_timestamp(event.get('time'))
+        if timestamp is None:
+            return False
+
+        course_id = _course_id(event)
+        event_type = _string(event.get('event_type'))
+        payload = _payload(event)
+
+        row = {
+            'time': timestamp,
+            'course_id': course_id,
+            'username': _string(event.get('username')),
+            'event_type': event_type,
+            'event_source': _string(event.get('event_source')),
+            'ip': _string(event.get('ip')),
+            'page': _string(event.get('page')),
+            'raw': (line if isinstance(line, unicode) else line.decode('utf-8', 'replace')).rstrip('\n'),
+        }
+        for name, column_type, field, event_types in EVENT_COLUMNS:
+            value = payload.get(field) if event_type in event_types else None
+            row[name] = _float(value) if column_type == FLOAT else _string(value)
+
+        self.partitions.setdefault((course_id, _day(timestamp)), []).append(row)
+        self.num_rows += 1
+        if self.num_rows >= self.max_rows:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write the buffered events as new parts of their partitions"""
+        for (course_id, day), rows in self.partitions.iteritems():
+            partition_dir = os.path.join(self.root, _course_dirname(course_id), day.isoformat())
+            _write_part(partition_dir, rows)
+        self.partitions = {}
+        self.num_rows = 0
+
+    def close(self):
+        """Write the events that are still buffered"""
+        self.flush()
+
+
+def _write_part(partition_dir, rows):
+    """
+    Write rows to a new part in partition_dir. The part is written under a
+    temporary name, so that readers never see part of one.
+    """
+    part_name = uuid.uuid4().hex
+    temp_dir = os.path.join(partition_dir, '.' + part_name)
+    os.makedirs(temp_dir)
+    try:
+        for name, column_type in COLUMNS:
+            _write_column(temp_dir, name, column_type, [row[name] for row in rows])
+        with open(os.path.join(temp_dir, SCHEMA_FILENAME), 'w') as schema_file:
+            json.dump({'version': SCHEMA_VERSION, 'num_rows': len(rows), 'columns': COLUMNS}, schema_file)
+        os.rename(temp_dir, os.path.join(partition_dir, part_name))
+    except:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def _write_column(part_dir, name, column_type, values):
+    """Write the values of a column to compressed files in part_dir"""
+    path = os.path.join(part_dir, name)
+    if column_type == TEXT:
+        with gzip.open(path + '.txt.gz', 'wb') as text_file:
+            for value in values:
+                text_file.write(value.encode('utf-8') + '\n')
+        return
+
+    if column_type == STRING:
+        codes = {None: -1}
+        for value in values:
+            codes.setdefault(value, len(codes) - 1)
+        dictionary = sorted((code, value) for value, code in codes.iteritems() if value is not None)
+        with gzip.open(path + '.values.json.gz', 'wb') as values_file:
+            json.dump([value for __, value in dictionary], values_file)
+        array = numpy.array([codes[value] for value in values], dtype=numpy.int32)
+    elif column_type == TIMESTAMP:
+        array = numpy.array(values, dtype=numpy.int64)
+    else:
+        array = numpy.array(values, dtype=numpy.float64)
+
+    with gzip.open(path + '.bin.gz', 'wb') as array_file:
+        array_file.write(array.tostring())
+
+
+def _read_column(part_dir, name, column_type):
+    """
+    Return a numpy array of the values of a column of the part in part_dir
+    (an object array, for string columns).
+    """
+    path = os.path.join(part_dir, name)
+    if column_type == TEXT:
+        with gzip.open(path + '.txt.gz', 'rb') as text_file:
+            return numpy.array([line.rstrip('\n').decode('utf-8') for line in text_file], dtype=object)
+
+    dtype = {STRING: numpy.int32, TIMESTAMP: numpy.int64, FLOAT: numpy.float64}[column_type]
+    with gzip.open(path + '.bin.gz', 'rb') as array_file:
+        array = numpy.fromstring(array_file.read(), dtype=dtype)
+
+    if column_type == STRING:
+        with gzip.open(path + '.values.json.gz', 'rb') as values_file:
+            dictionary = numpy.array(json.load(values_file) + [None], dtype=object)
+        # code -1 (None) picks the last entry
+        return dictionary[array]
+    return array
+
+
+def _missing_column(column_type, num_rows):
+    """Return an array of num_rows missing values of column_type"""
+    if column_type == FLOAT:
+        return numpy.array([float('nan')] * num_rows, dtype=numpy.float64)
+    return numpy.array([None] * num_rows, dtype=object)
+
+
+def _partition_dirs(root, course_id, start, end):
+    """
+    Return the directories of the partitions that may hold events in course_id
+    (or any course, if None) with times between the timestamps start and end
+    (either of which may be None).
+    """
+    if course_id is None:
+        course_dirs = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    else:
+        course_dirs = [_course_dirname(course_id)]
+
+    first_day = _day(start).isoformat() if start is not None else None
+    last_day = _day(end).isoformat() if end is not None else None
+    partition_dirs = []
+    for course_dir in course_dirs:
+        course_path = os.path.join(root, course_dir)
+        if not os.path.isdir(course_path):
+            continue
+        for day in sorted(os.listdir(course_path)):
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                partition_dirs.append(os.path.join(course_path, day))
+    return partition_dirs
+
+
+def query(root, columns, course_id=None, start=None, end=None, event_types=None):
+    """
+    Return a dict mapping each of `columns` to a numpy array of its values for
+    the events exported to `root` (ordered by time) that:
+
+      - are in the course with `course_id`, if given ('' for events outside
+        of courses)
+      - happened at or after `start` and before `end` (datetimes), if given
+      - are of one of `event_types`, if given
+
+    Values of string columns are unicode, or None for missing values; missing
+    values of float columns are NaN.
+    """
+    column_types = dict(COLUMNS)
+    unknown = set(columns) - set(column_types)
+    if unknown:
+        raise ValueError("Unknown tracking log columns: {}".format(', '.join(sorted(unknown))))
+
+    start = to_timestamp(start) if start is not None else None
+    end = to_timestamp(end) if end is not None else None
+
+    results = dict((name, []) for name in columns)
+    times = []
+    for partition_dir in _partition_dirs(root, course_id, start, end):
+        for part_name in sorted(os.listdir(partition_dir)):
+            if part_name.startswith('.'):
+                # a part still being written
+                continue
+            part_dir = os.path.join(partition_dir, part_name)
+            with open(os.path.join(part_dir, SCHEMA_FILENAME)) as schema_file:
+                schema = json.load(schema_file)
+            num_rows = schema['num_rows']
+            part_columns = dict((name, column_type) for name, column_type in schema['columns'])
+
+            part_times = _read_column(part_dir, 'time', TIMESTAMP)
+            mask = numpy.ones(num_rows, dtype=bool)
+            if start is not None:
+                mask &= part_times >= start
+            if end is not None:
+                mask &= part_times < end
+            if event_types is not None:
+                part_event_types = _read_column(part_dir, 'event_type', STRING)
+                mask &= numpy.array([event_type in event_types for event_type in part_event_types], dtype=bool)
+            if not mask.any():
+                continue
+
+            times.append(part_times[mask])
+            for name in columns:
+                if name in part_columns:
+                    values = _read_column(part_dir, name, part_columns[name])
+                else:
+                    # a column added since the part was written
+                    values = _missing_column(column_types[name], num_rows)
+                results[name].append(values[mask])
+
+    if not times:
+        return dict((name, _missing_column(column_types[name], 0)) for name in columns)
+
+    order = numpy.concatenate(times).argsort(kind='mergesort')
+    return dict((name, numpy.concatenate(arrays)[order]) for name, arrays in results.iteritems())
+
+
+def replay(root, course_id=None, start=None, end=None, event_types=None):
+    """
+    Yield the original events exported to `root` which match the filters (as
+    for `query`), in order of time.
+    """
+    for line in query(root, ['raw'], course_id, start, end, event_types)['raw']:
+        yield json.loads(line)
@@ -0,0 +1,52 @@
+"""
+Command to convert tracking logs into columnar files, for analytics.
+"""
+import gzip
+from optparse import make_option
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+
+from track.columnar import ColumnarWriter
+
+
+class Command(BaseCommand):
+    """
+    Convert the events in tracking log files (as written by the logger
+    backend, one JSON event per line, optionally gzipped) into columnar files
+    under output_dir, partitioned by course and day. See track.columnar.
+    """
+    help = dedent(__doc__).strip()
+    args = '<output_dir> <log_file> [<log_file> ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--max-rows',
+                    action='store',
+                    type='int',
+                    dest='max_rows',
+                    default=100000,
+                    help='Number of events to hold in memory before writing them out'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 2:
+            raise CommandError("Usage: {}".format(self.args))
+
+        output_dir = args[0]
+        writer = ColumnarWriter(output_dir, max_rows=options['max_rows'])
+        num_exported = 0
+        num_skipped = 0
+        for log_path in args[1:]:
+            opener = gzip.open if log_path.endswith('.gz') else open
+            with opener(log_path, 'rb') as log_file:
+                for line in log_file:
+                    if not line.strip():
+                        continue
+                    if writer.add(line):
+                        num_exported += 1
+                    else:
+                        num_skipped += 1
+        writer.close()
+
+        self.stdout.write(
+            "Exported {} events to {} ({} lines skipped)\n".format(num_exported, output_dir, num_skipped)
+        )
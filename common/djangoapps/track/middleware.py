@@ -13,6 +13,9 @@ log = logging.getLogger(__name__)
 
 CONTEXT_NAME = 'edx.request'
 
+# the most characters of a request's GET and POST parameters to log
+MAX_EVENT_LENGTH = 512
+
 
 class TrackMiddleware(object):
     """
@@ -43,8 +46,8 @@ class TrackMiddleware(object):
 
             censored_strings = ['password', 'newpassword', 'new_password',
                                 'oldpassword', 'old_password']
-            post_dict = dict(request.POST)
-            get_dict = dict(request.GET)
+            post_dict = self.truncated_params(request.POST)
+            get_dict = self.truncated_params(request.GET)
             for string in censored_strings:
                 if string in post_dict:
                     post_dict[string] = '*' * 8
@@ -56,12 +59,23 @@ class TrackMiddleware(object):
 
             # TODO: Confirm no large file uploads
             event = json.dumps(event)
-            event = event[:512]
+            event = event[:MAX_EVENT_LENGTH]
 
             views.server_track(request, request.META['PATH_INFO'], event)
         except:
             pass
 
+    def truncated_params(self, query_dict):
+        """
+        Return a dict of the lists of values in query_dict, with each value cut
+        to the length of the logged event: no more of it could be logged, and
+        large values (e.g. file contents) would otherwise be encoded in full.
+        """
+        return dict(
+            (key, [value[:MAX_EVENT_LENGTH] for value in values])
+            for key, values in query_dict.iterlists()
+        )
+
     def should_process_request(self, request):
         """Don't track requests to the specified URL patterns"""
         path = request.META['PATH_INFO']
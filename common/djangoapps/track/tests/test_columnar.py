@@ -0,0 +1,152 @@
+"""Tests of the columnar export of tracking logs"""
+
+import datetime
+import gzip
+import json
+import math
+import os
+import shutil
+from tempfile import mkdtemp
+
+from pytz import UTC
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from track import columnar
+from track.columnar import ColumnarWriter, query, replay
+from track.utils import DateTimeJSONEncoder
+
+COURSE_ID = 'edX/999/Test_Course'
+OTHER_COURSE_ID = 'edX/999/Other_Course'
+
+
+def event_line(event_type, time, course_id=COURSE_ID, payload=None, **fields):
+    """Return the JSON log line of an event"""
+    event = {
+        'username': 'student',
+        'ip': '127.0.0.1',
+        'event_source': 'server',
+        'event_type': event_type,
+        'event': payload or {},
+        'agent': '',
+        'page': None,
+        'time': time,
+        'host': 'testserver',
+        'context': {'course_id': course_id, 'org_id': 'edX'},
+    }
+    event.update(fields)
+    return json.dumps(event, cls=DateTimeJSONEncoder) + '\n'
+
+
+class TestColumnarExport(TestCase):
+    def setUp(self):
+        self.root = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.day = datetime.datetime(2014, 1, 6, 15, 0, tzinfo=UTC)
+
+    def write(self, lines, max_rows=100000):
+        """Export lines to self.root"""
+        writer = ColumnarWriter(self.root, max_rows=max_rows)
+        results = [writer.add(line) for line in lines]
+        writer.close()
+        return results
+
+    def test_timestamps(self):
+        time = datetime.datetime(2014, 1, 6, 15, 59, 49, 599522, tzinfo=UTC)
+        expected = columnar.to_timestamp(time)
+        self.assertEqual(columnar.to_timestamp(time.isoformat()), expected)
+        self.assertEqual(columnar.to_timestamp('2014-01-06T10:59:49.599522-05:00'), expected)
+        self.assertEqual(columnar.to_timestamp(time.replace(tzinfo=None)), expected)
+        self.assertIsNone(columnar.to_timestamp('not a time'))
+        self.assertIsNone(columnar.to_timestamp(None))
+
+    def test_partitions(self):
+        self.write([
+            event_line('problem_check', self.day),
+            event_line('problem_check', self.day + datetime.timedelta(days=1)),
+            event_line('problem_check', self.day, course_id=OTHER_COURSE_ID),
+            event_line('/heartbeat', self.day, course_id=''),
+        ])
+        self.assertEqual(
+            sorted(os.listdir(self.root)),
+            sorted([columnar.NO_COURSE, 'edX%2F999%2FOther_Course', 'edX%2F999%2FTest_Course'])
+        )
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.root, 'edX%2F999%2FTest_Course'))),
+            ['2014-01-06', '2014-01-07']
+        )
+
+    def test_typed_columns(self):
+        self.write([
+            event_line(
+                'problem_check', self.day,
+                payload={'problem_id': 'i4x://edX/999/problem/p1', 'attempts': 2, 'success': 'correct',
+                         'grade': 1, 'max_grade': 2}
+            ),
+            event_line(
+                'play_video', self.day + datetime.timedelta(minutes=1), event_source='browser',
+                payload=json.dumps({'id': 'video1', 'currentTime': 12.5, 'code': 'html5'})
+            ),
+        ])
+        result = query(self.root, ['event_type', 'problem_id', 'attempts', 'grade', 'video_id', 'video_time'])
+        self.assertEqual(list(result['event_type']), ['problem_check', 'play_video'])
+        self.assertEqual(list(result['problem_id']), ['i4x://edX/999/problem/p1', None])
+        self.assertEqual(result['attempts'][0], 2)
+        self.assertEqual(result['grade'][0], 1)
+        self.assertTrue(math.isnan(result['grade'][1]))
+        self.assertEqual(list(result['video_id']), [None, 'video1'])
+        self.assertEqual(result['video_time'][1], 12.5)
+
+    def test_query_filters(self):
+        times = [self.day + datetime.timedelta(hours=hours) for hours in range(0, 48, 6)]
+        self.write([event_line('problem_check', time) for time in times])
+        self.write([event_line('seq_goto', time, course_id=OTHER_COURSE_ID) for time in times])
+
+        result = query(self.root, ['time', 'course_id'], course_id=COURSE_ID, start=times[2], end=times[5])
+        self.assertEqual(list(result['time']), [columnar.to_timestamp(time) for time in times[2:5]])
+        self.assertEqual(set(result['course_id']), set([COURSE_ID]))
+
+        result = query(self.root, ['course_id'], event_types=['seq_goto'])
+        self.assertEqual(list(result['course_id']), [OTHER_COURSE_ID] * len(times))
+
+        result = query(self.root, ['time'], course_id='edX/999/No_Such_Course')
+        self.assertEqual(len(result['time']), 0)
+
+        with self.assertRaises(ValueError):
+            query(self.root, ['no_such_column'])
+
+    def test_results_ordered_by_time(self):
+        times = [self.day + datetime.timedelta(minutes=minutes) for minutes in (3, 1, 2)]
+        # write the events to separate parts:
+        self.write([event_line('problem_check', time) for time in times], max_rows=1)
+        result = query(self.root, ['time'])
+        self.assertEqual(list(result['time']), sorted(columnar.to_timestamp(time) for time in times))
+
+    def test_replay(self):
+        lines = [
+            event_line('problem_check', self.day, payload={'problem_id': u'i4x://edX/999/problem/\u00e9'}),
+            event_line('/courses/edX/999/Test_Course/info', self.day, course_id=''),
+        ]
+        self.write(lines)
+        self.assertEqual(list(replay(self.root, course_id=COURSE_ID)), [json.loads(line) for line in lines])
+
+    def test_invalid_lines_skipped(self):
+        results = self.write([
+            'not json\n',
+            '[1, 2]\n',
+            event_line('problem_check', 'not a time'),
+            event_line('problem_check', self.day),
+        ])
+        self.assertEqual(results, [False, False, False, True])
+
+    def test_export_command(self):
+        log_path = os.path.join(self.root, 'tracking.log.gz')
+        with gzip.open(log_path, 'wb') as log_file:
+            log_file.write(event_line('problem_check', self.day))
+            log_file.write('\n')
+            log_file.write('garbage\n')
+        output_dir = os.path.join(self.root, 'export')
+
+        call_command('export_tracking_logs', output_dir, log_path)
+        self.assertEqual(len(query(output_dir, ['time'])['time']), 1)
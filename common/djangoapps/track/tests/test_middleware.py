@@ -1,3 +1,4 @@
+import json
 import re
 
 from mock import patch
@@ -33,6 +34,16 @@ class TrackMiddlewareTestCase(TestCase):
             self.assertFalse(self.mock_server_track.called)
             self.mock_server_track.reset_mock()
 
+    def test_large_params_truncated(self):
+        request = self.request_factory.post('/somewhere', {'essay': 'x' * 10000, 'password': 'secret'})
+        self.track_middleware.process_request(request)
+        event = self.mock_server_track.call_args[0][2]
+        self.assertEqual(len(event), 512)
+        self.assertEqual(
+            event,
+            json.dumps({'GET': {}, 'POST': {'essay': ['x' * 10000], 'password': '*' * 8}})[:512]
+        )
+
     @override_settings(TRACKING_IGNORE_URL_PATTERNS=[])
     def test_reading_filtered_urls_from_settings(self):
         request = self.request_factory.get('/event')
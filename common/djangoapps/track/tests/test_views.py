@@ -128,3 +128,29 @@ class TestTrackViews(TestCase):
             },
         }
         self.mock_tracker.send.assert_called_once_with(expected_event)
+
+    def test_task_track_many(self):
+        request_info = {
+            'username': 'anonymous',
+            'ip': '127.0.0.1',
+            'agent': 'agent',
+            'host': 'testserver',
+        }
+        task_infos_and_events = [
+            ({'student': 'first'}, {'old_attempts': 1}),
+            ({'student': 'second'}, {'old_attempts': 2}),
+        ]
+
+        views.task_track_many(request_info, str(sentinel.event_type), task_infos_and_events)
+
+        self.assertFalse(self.mock_tracker.send.called)
+        self.assertEqual(self.mock_tracker.send_many.call_count, 1)
+        events = self.mock_tracker.send_many.call_args[0][0]
+        self.assertEqual(
+            [event['event'] for event in events],
+            [{'student': 'first', 'old_attempts': 1}, {'student': 'second', 'old_attempts': 2}]
+        )
+        for event in events:
+            self.assertEqual(event['event_type'], str(sentinel.event_type))
+            self.assertEqual(event['event_source'], 'task')
+            self.assertEqual(event['time'], self._expected_timestamp)
@@ -16,6 +16,10 @@ below::
       }
   }
 
+Backends are called synchronously by `send`. To keep a backend's writes
+out of the request, wrap it in `track.backends.buffered.BufferedBackend`,
+which queues events and sends them in batches from a background thread.
+
 """
 
 import inspect
@@ -28,7 +32,7 @@ from django.conf import settings
 from track.backends import BaseBackend
 
 
-__all__ = ['send']
+__all__ = ['send', 'send_many']
 
 
 backends = {}
@@ -96,4 +100,18 @@ def send(event):
             backend.send(event)
 
 
+@dog_stats_api.timed('track.send_many')
+def send_many(events):
+    """
+    Send a list of event objects to all the initialized backends, letting
+    each store them in as few operations as it can.
+
+    """
+    dog_stats_api.increment('track.send.count', len(events))
+
+    for name, backend in backends.iteritems():
+        with dog_stats_api.timer('track.send_many.backend.{0}'.format(name)):
+            backend.send_many(events)
+
+
 _initialize_backends_from_django_settings()
@@ -119,7 +119,28 @@ def task_track(request_info, task_info, event_type, event, page=None):
     The `page` parameter is optional, and allows the name of the page to
     be provided.
     """
+    log_event(_task_event(request_info, task_info, event_type, event, page))
 
+
+def task_track_many(request_info, event_type, task_infos_and_events, page=None):
+    """
+    Logs tracking information for many events of the same `event_type` occuring
+    within a celery task, sending them to the trackers as a single batch.
+
+    `task_infos_and_events` is a list of (`task_info`, `event`) pairs; the other
+    arguments are as for `task_track`.
+    """
+    tracker.send_many([
+        _task_event(request_info, task_info, event_type, event, page)
+        for task_info, event in task_infos_and_events
+    ])
+
+
+def _task_event(request_info, task_info, event_type, event, page):
+    """
+    Return the tracking event for an event occuring within a celery task, as
+    described by the arguments to `task_track`.
+    """
     # supplement event information with additional information
     # about the task in which it is running.
     full_event = dict(event, **task_info)
@@ -128,7 +149,7 @@ def task_track(request_info, task_info, event_type, event, page=None):
     # also saved to the TrackingLog model.  Get values from the task-level
     # information, or just add placeholder values.
     with eventtracker.get_tracker().context('edx.course.task', contexts.course_context_from_url(page)):
-        event = {
+        return {
             "username": request_info.get('username', 'unknown'),
             "ip": request_info.get('ip', 'unknown'),
             "event_source": "task",
@@ -141,8 +162,6 @@ def task_track(request_info, task_info, event_type, event, page=None):
             "context": eventtracker.get_tracker().resolve_context(),
         }
 
-    log_event(event)
-
 
 @login_required
 @ensure_csrf_cookie
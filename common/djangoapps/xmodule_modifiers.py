@@ -12,6 +12,7 @@ from django.utils.timezone import UTC
 from edxmako.shortcuts import render_to_string
 from xblock.fragment import Fragment
 
+from xmodule.modulestore import Location
 from xmodule.seq_module import SequenceModule
 from xmodule.vertical_module import VerticalModule
 from xmodule.x_module import shim_xmodule_js, XModuleDescriptor, XModule
@@ -129,6 +130,11 @@ def grade_histogram(module_id):
     ''' Print out a histogram of grades on a given problem.
         Part of staff member debug info.
     '''
+    if settings.FEATURES.get('ENABLE_GRADE_HISTOGRAM_COUNTS') and Location(module_id).category == 'problem':
+        # read the grade counts kept up to date as problem StudentModules change
+        from courseware.models import StudentModuleGradeCount
+        return StudentModuleGradeCount.histogram(module_id)
+
     from django.db import connection
     cursor = connection.cursor()
 
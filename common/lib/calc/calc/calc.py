@@ -7,6 +7,8 @@ Uses pyparsing to parse. Main function as of now is evaluator().
 import math
 import operator
 import numbers
+import threading
+from collections import OrderedDict
 import numpy
 import scipy.constants
 import functions
@@ -121,8 +123,8 @@ def eval_atom(parse_result):
 
     In the case of parenthesis, ignore them.
     """
-    # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    # Find first number (or array of samples) in the list
+    result = next(k for k in parse_result if not isinstance(k, basestring))
     return result
 
 
@@ -136,7 +138,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if not isinstance(k, basestring)]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -162,6 +164,21 @@ def eval_parallel(parse_result):
     return 1. / sum(reciprocals)
 
 
+def eval_parallel_samples(parse_result):
+    """
+    Like `eval_parallel`, but for inputs which may be arrays of samples.
+
+    Return NaN for the samples where any of the inputs is zero.
+    """
+    values = [numpy.asarray(e) for e in parse_result if not isinstance(e, basestring)]
+    if len(values) == 1:
+        return values[0]
+    has_zero = reduce(numpy.logical_or, [value == 0 for value in values])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        result = 1. / sum(1. / value for value in values)
+    return numpy.where(has_zero, float('nan'), result)
+
+
 def eval_sum(parse_result):
     """
     Add the inputs, keeping in mind their sign.
@@ -173,12 +190,12 @@ def eval_sum(parse_result):
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
+        if not isinstance(token, basestring):
+            total = current_op(total, token)
+        elif token == '+':
             current_op = operator.add
         elif token == '-':
             current_op = operator.sub
-        else:
-            total = current_op(total, token)
     return total
 
 
@@ -191,12 +208,12 @@ def eval_product(parse_result):
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
+        if not isinstance(token, basestring):
+            prod = current_op(prod, token)
+        elif token == '*':
             current_op = operator.mul
         elif token == '/':
             current_op = operator.truediv
-        else:
-            prod = current_op(prod, token)
     return prod
 
 
@@ -216,6 +233,127 @@ def add_defaults(variables, functions, case_sensitive):
     return (all_variables, all_functions)
 
 
+def build_grammar():
+    """
+    Build the pyparsing grammar for algebraic expressions.
+
+    Building it is expensive, so it is done once, as `ALGEBRA_GRAMMAR`.
+    """
+    # 0.33 or 7 or .34 or 16.
+    number_part = Word(nums)
+    inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
+    # pyparsing allows spaces between tokens--`Combine` prevents that.
+    inner_number = Combine(inner_number)
+
+    # SI suffixes and percent.
+    number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
+
+    # 0.33k or 17
+    plus_minus = Literal('+') | Literal('-')
+    number = Group(
+        Optional(plus_minus) +
+        inner_number +
+        Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
+        Optional(number_suffix)
+    )
+    number = number("number")
+
+    # Predefine recursive variables.
+    expr = Forward()
+
+    # Handle variables passed in. They must start with letters/underscores
+    # and may contain numbers afterward.
+    inner_varname = Word(alphas + "_", alphanums + "_")
+    varname = Group(inner_varname)("variable")
+
+    # Same thing for functions.
+    function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
+
+    atom = number | function | varname | "(" + expr + ")"
+    atom = Group(atom)("atom")
+
+    # Do the following in the correct order to preserve order of operation.
+    pow_term = atom + ZeroOrMore("^" + atom)
+    pow_term = Group(pow_term)("power")
+
+    par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
+    par_term = Group(par_term)("parallel")
+
+    prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
+    prod_term = Group(prod_term)("product")
+
+    sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
+    sum_term = Group(sum_term)("sum")
+
+    # Finish the recursion.
+    expr << sum_term  # pylint: disable=W0104
+    return expr + stringEnd
+
+
+def find_names(tree):
+    """
+    Return the sets of the variable names and function names used in a parse tree.
+    """
+    variables_used = set()
+    functions_used = set()
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        node_name = node.getName()
+        if node_name == 'variable':
+            variables_used.add(node[0])
+        elif node_name == 'function':
+            functions_used.add(node[0])
+        nodes.extend(kid for kid in node if isinstance(kid, ParseResults))
+    return variables_used, functions_used
+
+
+class ParseCache(object):
+    """
+    A thread-safe LRU cache of parsed expressions, so that evaluating the same
+    expression with different variables (e.g. the samples of a
+    FormulaResponse) only parses it once.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None.
+        """
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.entries[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Cache value for key, evicting the least recently used entry if full.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Empty the cache.
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+ALGEBRA_GRAMMAR = build_grammar()
+
+# Parsed expressions, keyed by `(math_expr, case_sensitive)`.
+PARSE_CACHE_SIZE = 1000
+PARSE_CACHE = ParseCache(PARSE_CACHE_SIZE)
+
+
 def evaluator(variables, functions, math_expr, case_sensitive=False):
     """
     Evaluate an expression; that is, take a string of math and return a float.
@@ -228,6 +366,36 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     if math_expr.strip() == "":
         return float('nan')
 
+    return _evaluate(variables, functions, math_expr, case_sensitive, eval_parallel)
+
+
+def vectorized_evaluator(variables, functions, math_expr, num_samples, case_sensitive=False):
+    """
+    Evaluate an expression at many samples at once; return a numpy array of
+    its `num_samples` values.
+
+    Like `evaluator`, but each variable's value may be a numpy array of its
+    value at each sample. Functions are applied to whole arrays, so any that
+    numpy can't vectorize (e.g. `fact`) raise an error. Where Python would
+    raise for an invalid operation (e.g. division by zero), numpy instead
+    gives infinity or NaN. So if this raises, or gives values which aren't
+    finite, callers should fall back to `evaluator` for each sample.
+    """
+    if math_expr.strip() == "":
+        result = float('nan')
+    else:
+        with numpy.errstate(all='ignore'):
+            result = _evaluate(variables, functions, math_expr, case_sensitive, eval_parallel_samples)
+
+    # Broadcast the values of expressions without variables to every sample.
+    return numpy.asarray(result) + numpy.zeros(num_samples)
+
+
+def _evaluate(variables, functions, math_expr, case_sensitive, parallel_action):
+    """
+    Parse and evaluate a (non-empty) expression, using `parallel_action` to
+    evaluate the parallel resistors operator.
+    """
     # Parse the tree.
     math_interpreter = ParseAugmenter(math_expr, case_sensitive)
     math_interpreter.parse_algebra()
@@ -250,7 +418,7 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
         'function': lambda x: all_functions[casify(x[0])](x[1]),
         'atom': eval_atom,
         'power': eval_power,
-        'parallel': eval_parallel,
+        'parallel': parallel_action,
         'product': eval_product,
         'sum': eval_sum
     }
@@ -278,23 +446,6 @@ class ParseAugmenter(object):
         self.variables_used = set()
         self.functions_used = set()
 
-        def vpa(tokens):
-            """
-            When a variable is recognized, store it in `variables_used`.
-            """
-            varname = tokens[0][0]
-            self.variables_used.add(varname)
-
-        def fpa(tokens):
-            """
-            When a function is recognized, store it in `functions_used`.
-            """
-            varname = tokens[0][0]
-            self.functions_used.add(varname)
-
-        self.variable_parse_action = vpa
-        self.function_parse_action = fpa
-
     def parse_algebra(self):
         """
         Parse an algebraic expression into a tree.
@@ -303,61 +454,24 @@ class ParseAugmenter(object):
         reflect parenthesis and order of operations. Leave all operators in the
         tree and do not parse any strings of numbers into their float versions.
 
+        Trees are cached by expression, so the tree may be shared with other
+        ParseAugmenters and must not be modified.
+
         Adding the groups and result names makes the `repr()` of the result
         really gross. For debugging, use something like
           print OBJ.tree.asXML()
         """
-        # 0.33 or 7 or .34 or 16.
-        number_part = Word(nums)
-        inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
-        # pyparsing allows spaces between tokens--`Combine` prevents that.
-        inner_number = Combine(inner_number)
-
-        # SI suffixes and percent.
-        number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
-
-        # 0.33k or 17
-        plus_minus = Literal('+') | Literal('-')
-        number = Group(
-            Optional(plus_minus) +
-            inner_number +
-            Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
-            Optional(number_suffix)
-        )
-        number = number("number")
-
-        # Predefine recursive variables.
-        expr = Forward()
-
-        # Handle variables passed in. They must start with letters/underscores
-        # and may contain numbers afterward.
-        inner_varname = Word(alphas + "_", alphanums + "_")
-        varname = Group(inner_varname)("variable")
-        varname.setParseAction(self.variable_parse_action)
-
-        # Same thing for functions.
-        function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
-        function.setParseAction(self.function_parse_action)
-
-        atom = number | function | varname | "(" + expr + ")"
-        atom = Group(atom)("atom")
-
-        # Do the following in the correct order to preserve order of operation.
-        pow_term = atom + ZeroOrMore("^" + atom)
-        pow_term = Group(pow_term)("power")
-
-        par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
-        par_term = Group(par_term)("parallel")
-
-        prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
-        prod_term = Group(prod_term)("product")
-
-        sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
-        sum_term = Group(sum_term)("sum")
-
-        # Finish the recursion.
-        expr << sum_term  # pylint: disable=W0104
-        self.tree = (expr + stringEnd).parseString(self.math_expr)[0]
+        key = (self.math_expr, self.case_sensitive)
+        parsed = PARSE_CACHE.get(key)
+        if parsed is None:
+            tree = ALGEBRA_GRAMMAR.parseString(self.math_expr)[0]
+            variables_used, functions_used = find_names(tree)
+            parsed = (tree, frozenset(variables_used), frozenset(functions_used))
+            PARSE_CACHE.set(key, parsed)
+
+        self.tree = parsed[0]
+        self.variables_used = set(parsed[1])
+        self.functions_used = set(parsed[2])
 
     def reduce_tree(self, handle_actions, terminal_converter=None):
         """
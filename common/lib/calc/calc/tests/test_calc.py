@@ -558,3 +558,64 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+    def test_parse_cache(self):
+        """
+        Check that evaluating an expression again reuses its parse tree, and
+        that the cached parse still reports the names it uses
+        """
+        calc.PARSE_CACHE.clear()
+        first = calc.ParseAugmenter("2*x+sin(y)")
+        first.parse_algebra()
+        second = calc.ParseAugmenter("2*x+sin(y)")
+        second.parse_algebra()
+        self.assertIs(first.tree, second.tree)
+        self.assertEqual(second.variables_used, set(['x', 'y']))
+        self.assertEqual(second.functions_used, set(['sin']))
+
+        # Case sensitivity is part of the key.
+        sensitive = calc.ParseAugmenter("2*x+sin(y)", case_sensitive=True)
+        sensitive.parse_algebra()
+        self.assertIsNot(first.tree, sensitive.tree)
+
+        self.assertEqual(calc.evaluator({'x': 1, 'y': 0}, {}, "2*x+sin(y)"), 2)
+        self.assertEqual(calc.evaluator({'x': 2, 'y': 0}, {}, "2*x+sin(y)"), 4)
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            calc.evaluator({'x': 2}, {}, "2*x+sin(y)")
+
+    def test_parse_cache_eviction(self):
+        """
+        Check that the parse cache keeps only the most recently used trees
+        """
+        cache = calc.ParseCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_vectorized_evaluator(self):
+        """
+        Check that evaluating over arrays of samples matches evaluating each
+        sample alone
+        """
+        x_samples = numpy.array([0.5, 1.0, 2.0])
+        y_samples = numpy.array([1.0, 0.0, 3.0])
+        expression = "2*x^2 - sin(y)/3 + x||y + 5%"
+        result = calc.vectorized_evaluator(
+            {'x': x_samples, 'y': y_samples}, {}, expression, 3
+        )
+        self.assertEqual(result.shape, (3,))
+        for index in (0, 2):
+            expected = calc.evaluator({'x': x_samples[index], 'y': y_samples[index]}, {}, expression)
+            self.assertAlmostEqual(result[index], expected)
+        # parallel resistance with a zero is NaN, as for one sample
+        self.assertTrue(numpy.isnan(result[1]))
+
+        # Expressions without variables are broadcast to every sample.
+        self.assertEqual(list(calc.vectorized_evaluator({}, {}, "1+2", 2)), [3, 3])
+
+        with self.assertRaises(calc.UndefinedVariable):
+            calc.vectorized_evaluator({'x': x_samples}, {}, "x+z", 3)
@@ -14,10 +14,12 @@ This is used by capa_module.
 """
 
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
 
+from dogapi import dog_stats_api
 from lxml import etree
 from xml.sax.saxutils import unescape
 from copy import deepcopy
@@ -30,6 +32,7 @@ from capa.util import contextualize_text, convert_files_to_filenames
 import capa.xqueue_interface as xqueue_interface
 
 from capa.safe_exec import safe_exec
+from xmodule.modulestore.lru_cache import LRUCache
 
 from pytz import UTC
 
@@ -59,6 +62,103 @@ html_problem_semantics = [
 
 log = logging.getLogger(__name__)
 
+# the number of problems (distinct xml and seed) whose parsed xml and script context are kept
+PROBLEM_CACHE_SIZE = 500
+
+
+class ProblemCache(object):
+    """
+    A process-wide LRU cache of the parts of LoncapaProblems that depend only on the problem's
+    xml and seed: the parsed xml tree and the context produced by executing its scripts.
+
+    Constructing a problem from the cache skips parsing its xml and executing its scripts,
+    which for problems that aren't randomized (whose seed is always 1) is most of the cost.
+    Each problem modifies its own tree and context, so the cache stores and returns copies.
+    """
+    def __init__(self, max_size):
+        self.cache = LRUCache(max_size)
+
+    def get(self, key):
+        """
+        Return a copy of the (tree, context) cached under key, or None if there isn't one
+        """
+        entry = self.cache.get(key)
+        dog_stats_api.increment('capa.problem_cache', tags=['result:hit' if entry is not None else 'result:miss'])
+        if entry is None:
+            return None
+        tree, context = entry
+        return deepcopy(tree), deepcopy(context)
+
+    def set(self, key, tree, context):
+        """
+        Cache a copy of tree and context under key
+        """
+        self.cache.set(key, (deepcopy(tree), deepcopy(context)))
+
+    def clear(self):
+        """
+        Empty the cache, and reset its statistics
+        """
+        self.cache.clear()
+
+    @property
+    def hits(self):
+        """
+        The number of lookups that found a cached problem
+        """
+        return self.cache.hits
+
+    @property
+    def misses(self):
+        """
+        The number of lookups that didn't find a cached problem
+        """
+        return self.cache.misses
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups that found a cached problem
+        """
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+
+PROBLEM_CACHE = ProblemCache(PROBLEM_CACHE_SIZE)
+
+
+def convert_outtext(problem_text):
+    """
+    Convert startouttext and endouttext to proper <text></text>
+    """
+    problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
+    problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
+    return problem_text
+
+
+def get_max_score_from_xml(problem_text):
+    """
+    Return the maximum score of the problem defined by problem_text, from its xml alone:
+    without executing its scripts or instantiating its responses, and so without the
+    LoncapaSystem of any particular student.
+
+    Returns None if the maximum score can't be determined this way, because the problem
+    includes other files, or has scripts: building such a problem can fail (e.g. a script
+    that raises for some seeds), in which case it is an ErrorModule without a maximum
+    score, which grading leaves out rather than scoring as 0 out of the xml's maximum.
+    """
+    tree = etree.XML(convert_outtext(problem_text))
+    if tree.find('.//include') is not None or tree.find('.//script') is not None:
+        return None
+
+    input_tags = inputtypes.registry.registered_tags()
+    max_score = 0
+    for response in tree.xpath('//' + "|//".join(responsetypes.registry.registered_tags())):
+        inputfields = response.xpath("|".join(['.//' + tag for tag in input_tags]))
+        responsetype_cls = responsetypes.registry.get_class_for_tag(response.tag)
+        max_score += responsetype_cls.get_max_score_from_xml(inputfields)
+    return max_score
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -151,19 +251,24 @@ class LoncapaProblem(object):
         self.done = state.get('done', False)
         self.input_state = state.get('input_state', {})
 
-        # Convert startouttext and endouttext to proper <text></text>
-        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
-        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
-        self.problem_text = problem_text
+        self.problem_text = convert_outtext(problem_text)
+
+        cache_key = self._problem_cache_key()
+        cached = PROBLEM_CACHE.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            self.tree, self.context = cached
+        else:
+            # parse problem XML file into an element tree
+            self.tree = etree.XML(self.problem_text)
 
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
+            # handle any <include file="foo"> tags
+            self._process_includes()
 
-        # handle any <include file="foo"> tags
-        self._process_includes()
+            # construct script processor context (eg for customresponse problems)
+            self.context = self._extract_context(self.tree)
 
-        # construct script processor context (eg for customresponse problems)
-        self.context = self._extract_context(self.tree)
+            if cache_key is not None:
+                PROBLEM_CACHE.set(cache_key, self.tree, self.context)
 
         # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
         # transformations.  This also creates the dict (self.responders) of Response
@@ -444,6 +549,24 @@ class LoncapaProblem(object):
 
     # ======= Private Methods Below ========
 
+    def _problem_cache_key(self):
+        """
+        Return the key under which this problem's parsed xml and script context are cached,
+        or None if they can't be: the files a problem includes may change, so those aren't cached.
+        """
+        if '<include' in self.problem_text:
+            return None
+        problem_text = self.problem_text
+        if isinstance(problem_text, unicode):
+            problem_text = problem_text.encode('utf-8')
+        return (
+            hashlib.sha1(problem_text).hexdigest(),
+            self.seed,
+            # the scripts' python path is relative to the course's files
+            getattr(self.capa_system.filestore, 'root_path', None),
+            self.capa_system.can_execute_unsafe_code(),
+        )
+
     def _process_includes(self):
         """
         Handle any <include file="foo"> tags by reading in the specified file and inserting it
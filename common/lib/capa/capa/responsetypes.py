@@ -33,13 +33,13 @@ from collections import namedtuple
 from shapely.geometry import Point, MultiPoint
 
 # specific library imports
-from calc import evaluator, UndefinedVariable
+from calc import evaluator, vectorized_evaluator, UndefinedVariable
 from . import correctmap
 from .registry import TagRegistry
 from datetime import datetime
 from pytz import UTC
 from .util import (
-    compare_with_tolerance, contextualize_text, convert_files_to_filenames,
+    compare_with_tolerance, compare_arrays_with_tolerance, contextualize_text, convert_files_to_filenames,
     is_list_of_files, find_with_default, default_tolerance
 )
 from lxml import etree
@@ -205,6 +205,15 @@ class LoncapaResponse(object):
         """
         return sum(self.maxpoints.values())
 
+    @classmethod
+    def get_max_score_from_xml(cls, inputfields):
+        """
+        Return the total maximum points of a Response with the given answer fields,
+        from their xml alone (i.e. without instantiating the Response).
+        """
+        # By default, each answerfield is worth 1 point
+        return sum(int(inputfield.get('points', '1')) for inputfield in inputfields)
+
     def render_html(self, renderer, response_msg=''):
         """
         Return XHTML Element tree representation of this Response.
@@ -2055,6 +2064,37 @@ class FormulaResponse(LoncapaResponse):
                 )
         return out
 
+    def evaluate_samples(self, answer, var_dict_list):
+        """
+        Takes in an answer and a list of dictionaries mapping variables to values,
+        as for tupleize_answers. Returns a numpy array of formula evaluation results.
+
+        Evaluates all the samples at once with numpy where it can. Answers which
+        can't be evaluated that way, and those with errors or infinite or NaN
+        results, are evaluated sample by sample with tupleize_answers, so that
+        they're handled exactly as they would be without vectorization.
+        """
+        variables = {}
+        if var_dict_list:
+            for var in var_dict_list[0]:
+                variables[var] = numpy.array([var_dict[var] for var_dict in var_dict_list])
+
+        # pylint: disable=W0703
+        try:
+            result = vectorized_evaluator(
+                variables,
+                dict(),
+                answer,
+                len(var_dict_list),
+                case_sensitive=self.case_sensitive,
+            )
+        except Exception:
+            result = None
+
+        if result is None or not numpy.all(numpy.isfinite(result)):
+            result = numpy.array(self.tupleize_answers(answer, var_dict_list))
+        return result
+
     def randomize_variables(self, samples):
         """
         Returns a list of dictionaries mapping variables to random values in range,
@@ -2084,11 +2124,10 @@ class FormulaResponse(LoncapaResponse):
         "correct" or "incorrect".
         """
         var_dict_list = self.randomize_variables(samples)
-        student_result = self.tupleize_answers(given, var_dict_list)
-        instructor_result = self.tupleize_answers(expected, var_dict_list)
+        student_result = self.evaluate_samples(given, var_dict_list)
+        instructor_result = self.evaluate_samples(expected, var_dict_list)
 
-        correct = all(compare_with_tolerance(student, instructor, self.tolerance)
-                      for student, instructor in zip(student_result, instructor_result))
+        correct = compare_arrays_with_tolerance(student_result, instructor_result, self.tolerance)
         if correct:
             return "correct"
         else:
@@ -2107,7 +2146,7 @@ class FormulaResponse(LoncapaResponse):
         """
         var_dict_list = self.randomize_variables(self.samples)
         try:
-            self.tupleize_answers(answer, var_dict_list)
+            self.evaluate_samples(answer, var_dict_list)
             return True
         except StudentInputError:
             return False
@@ -2411,6 +2450,11 @@ class AnnotationResponse(LoncapaResponse):
                 answer_map[input_id] = correct_option.get('description')
         return answer_map
 
+    @classmethod
+    def get_max_score_from_xml(cls, inputfields):
+        """Each input is worth the points for a correct answer."""
+        return cls.default_scoring.get('correct') * len(inputfields)
+
     def _get_max_points(self):
         """Returns a dict of the max points for each input: input id -> maxpoints."""
         scoring = self.default_scoring
@@ -0,0 +1,71 @@
+"""
+Tests of computing a problem's maximum score from its xml alone.
+"""
+import textwrap
+import unittest
+
+from capa.capa_problem import get_max_score_from_xml
+from capa.tests import new_loncapa_problem
+from capa.tests.response_xml_factory import (
+    AnnotationResponseXMLFactory,
+    CustomResponseXMLFactory,
+    NumericalResponseXMLFactory,
+)
+
+
+class MaxScoreFromXmlTest(unittest.TestCase):
+    """
+    Test that get_max_score_from_xml agrees with the max score of the constructed problem.
+    """
+    def assert_max_score(self, xml, expected):
+        """
+        Check that both ways of computing the max score of the problem xml give `expected`
+        """
+        self.assertEqual(get_max_score_from_xml(xml), expected)
+        self.assertEqual(new_loncapa_problem(xml).get_max_score(), expected)
+
+    def test_one_input(self):
+        xml = NumericalResponseXMLFactory().build_xml(answer="3.14")
+        self.assert_max_score(xml, 1)
+
+    def test_several_inputs(self):
+        xml = textwrap.dedent("""
+            <problem>
+                <optionresponse>
+                    <optioninput options="('a','b')" correct="a"/>
+                    <optioninput options="('a','b')" correct="b"/>
+                </optionresponse>
+                <optionresponse>
+                    <optioninput options="('a','b')" correct="a"/>
+                </optionresponse>
+            </problem>
+        """)
+        self.assert_max_score(xml, 3)
+
+    def test_points(self):
+        xml = textwrap.dedent("""
+            <problem>
+                <stringresponse answer="a">
+                    <textline points="3"/>
+                </stringresponse>
+                <stringresponse answer="b">
+                    <textline/>
+                </stringresponse>
+            </problem>
+        """)
+        self.assert_max_score(xml, 4)
+
+    def test_annotation(self):
+        xml = AnnotationResponseXMLFactory().build_xml(options=[('x', 'correct'), ('y', 'incorrect')])
+        self.assert_max_score(xml, 2)
+
+    def test_includes(self):
+        xml = '<problem><include file="does_not_exist.xml"/></problem>'
+        self.assertIsNone(get_max_score_from_xml(xml))
+
+    def test_scripts(self):
+        # the problem is built to score it, as building it may fail
+        xml = CustomResponseXMLFactory().build_xml(
+            cfn="check_func", num_inputs=3, num_responses=2, script="def check_func(expect, ans): return True"
+        )
+        self.assertIsNone(get_max_score_from_xml(xml))
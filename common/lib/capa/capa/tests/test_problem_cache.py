@@ -0,0 +1,72 @@
+"""
+Tests of the cache of parsed problems and their script contexts.
+"""
+import textwrap
+import unittest
+
+from mock import patch
+
+import capa.capa_problem
+from capa.capa_problem import PROBLEM_CACHE, ProblemCache
+from capa.tests import new_loncapa_problem, test_capa_system
+from capa.tests.response_xml_factory import CustomResponseXMLFactory
+
+
+class ProblemCacheTest(unittest.TestCase):
+    """
+    Test that problems with the same xml and seed share their parsed xml and script context.
+    """
+    def setUp(self):
+        PROBLEM_CACHE.clear()
+        script = textwrap.dedent("""
+            import random
+            expected = str(random.randint(0, 1000))
+            def check_func(expect, answer_given):
+                return {'ok': answer_given == expected, 'msg': ''}
+        """)
+        self.xml = CustomResponseXMLFactory().build_xml(script=script, cfn="check_func", expect="42")
+
+    def tearDown(self):
+        PROBLEM_CACHE.clear()
+
+    def test_problem_cached(self):
+        with patch('capa.capa_problem.safe_exec', wraps=capa.capa_problem.safe_exec) as mock_safe_exec:
+            problem = new_loncapa_problem(self.xml)
+            cached_problem = new_loncapa_problem(self.xml)
+        self.assertEqual(mock_safe_exec.call_count, 1)
+        self.assertEqual((PROBLEM_CACHE.hits, PROBLEM_CACHE.misses), (1, 1))
+        self.assertEqual(PROBLEM_CACHE.hit_rate, 0.5)
+
+        self.assertEqual(cached_problem.context['expected'], problem.context['expected'])
+        self.assertEqual(cached_problem.get_html(), problem.get_html())
+
+        # problems built from the cache are independent of each other:
+        self.assertIsNot(cached_problem.tree, problem.tree)
+        self.assertIsNot(cached_problem.context, problem.context)
+        answer_id = cached_problem.get_answer_ids()[0][0]
+        correct_map = cached_problem.grade_answers({answer_id: problem.context['expected']})
+        self.assertEqual(correct_map.get_correctness(answer_id), 'correct')
+        self.assertEqual(problem.correct_map.get_dict(), {})
+
+    def test_problem_cached_by_seed(self):
+        with patch('capa.capa_problem.safe_exec', wraps=capa.capa_problem.safe_exec) as mock_safe_exec:
+            new_loncapa_problem(self.xml)
+            capa.capa_problem.LoncapaProblem(self.xml, id='1', seed=724, capa_system=test_capa_system())
+        self.assertEqual(mock_safe_exec.call_count, 2)
+        self.assertEqual(PROBLEM_CACHE.hits, 0)
+
+    def test_problem_with_includes_not_cached(self):
+        # the test system is in debug mode, so the missing file is just skipped:
+        xml = '<problem><include file="does_not_exist.xml"/></problem>'
+        with patch('capa.capa_problem.etree.XML', wraps=capa.capa_problem.etree.XML) as mock_parse:
+            new_loncapa_problem(xml)
+            new_loncapa_problem(xml)
+        self.assertEqual(PROBLEM_CACHE.hits + PROBLEM_CACHE.misses, 0)
+        self.assertGreaterEqual(mock_parse.call_count, 2)
+
+    def test_eviction(self):
+        cache = ProblemCache(2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, None, {'key': key})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), (None, {'key': 'c'}))
@@ -507,6 +507,32 @@ class FormulaResponseTest(ResponseTest):
         self.assertTrue(problem.responders.values()[0].validate_answer('14*x'))
         self.assertFalse(problem.responders.values()[0].validate_answer('3*y+2*x'))
 
+    def test_vectorized_grading(self):
+        """
+        Test that samples are evaluated all at once when numpy can do so, and
+        one by one otherwise.
+        """
+        sample_dict = {'x': (1, 2), 'y': (1, 2)}
+        problem = self.build_problem(sample_dict=sample_dict,
+                                     num_samples=100,
+                                     tolerance="0.01%",
+                                     answer="sin(x)^2 + cos(x)^2 + x || y")
+        responder = problem.responders.values()[0]
+
+        with mock.patch.object(responder, 'tupleize_answers') as tupleize_answers:
+            self.assert_grade(problem, '1 + x*y/(x+y)', 'correct')
+            self.assert_grade(problem, '1 + x*y', 'incorrect')
+            self.assertFalse(tupleize_answers.called)
+
+        # factorial can't be applied to arrays
+        with mock.patch.object(responder, 'tupleize_answers', wraps=responder.tupleize_answers) as tupleize_answers:
+            self.assert_grade(problem, 'fact(0*x)/x', 'incorrect')
+            self.assertTrue(tupleize_answers.called)
+
+        # nor can it be applied to non-integers, which gives the usual error
+        input_dict = {'1_2_1': 'fact(x)'}
+        self.assertRaises(StudentInputError, problem.grade_answers, input_dict)
+
 
 class StringResponseTest(ResponseTest):
     from capa.tests.response_xml_factory import StringResponseXMLFactory
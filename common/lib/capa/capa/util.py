@@ -1,5 +1,6 @@
 from calc import evaluator
 from cmath import isinf
+import numpy
 
 #-----------------------------------------------------------------------------
 #
@@ -48,6 +49,29 @@ def compare_with_tolerance(complex1, complex2, tolerance=default_tolerance, rela
         return abs(complex1 - complex2) <= tolerance
 
 
+def compare_arrays_with_tolerance(array1, array2, tolerance=default_tolerance):
+    """
+    Return whether each element of numpy array array1 is within tolerance of
+    the corresponding element of array2, as per compare_with_tolerance (with
+    `tolerance` given as a string).
+
+     - array1      :  student results
+     - array2      :  instructor results
+     - tolerance   :  string representing a number, relative if it ends in %
+    """
+    if tolerance.endswith('%'):
+        tolerance = evaluator(dict(), dict(), tolerance[:-1]) * 0.01
+        tolerance = tolerance * numpy.maximum(abs(array1), abs(array2))
+    else:
+        tolerance = evaluator(dict(), dict(), tolerance)
+
+    with numpy.errstate(invalid='ignore'):
+        # As in compare_with_tolerance, compare infinite values directly.
+        infinite = numpy.isinf(array1) | numpy.isinf(array2)
+        close = numpy.where(infinite, array1 == array2, abs(array1 - array2) <= tolerance)
+    return bool(numpy.all(close))
+
+
 def contextualize_text(text, context):  # private
     """
     Takes a string with variables. E.g. $a+$b.
@@ -5,6 +5,9 @@ import sys
 
 from pkg_resources import resource_string
 
+from capa.capa_problem import get_max_score_from_xml
+from lxml import etree
+
 from .capa_base import CapaMixin, CapaFields, ComplexEncoder
 from .progress import Progress
 from xmodule.x_module import XModule, module_attr
@@ -173,6 +176,26 @@ class CapaDescriptor(CapaFields, RawDescriptor):
         ])
         return non_editable_fields
 
+    def get_max_score_from_xml(self):
+        """
+        Return the maximum score for this problem, computed from its xml alone (without
+        building a LoncapaProblem or executing its scripts), or None if it can't be.
+
+        This lets grading find the maximum score of a problem a student hasn't attempted
+        without instantiating the problem for the student.  The result is cached on the descriptor.
+        """
+        cached = getattr(self, '_max_score_from_xml', None)
+        if cached is not None and cached[0] == self.data:
+            return cached[1]
+
+        try:
+            max_score = get_max_score_from_xml(self.data)
+        except (etree.XMLSyntaxError, ValueError):
+            log.warning("Couldn't compute the max score of %s from its xml", self.location, exc_info=True)
+            max_score = None
+        self._max_score_from_xml = (self.data, max_score)  # pylint: disable=attribute-defined-outside-init
+        return max_score
+
     # Proxy to CapaModule for access to any of its attributes
     answer_available = module_attr('answer_available')
     check_button_name = module_attr('check_button_name')
@@ -0,0 +1,73 @@
+"""
+A small, thread-safe, bounded least-recently-used cache used by the modulestores
+to hold deserialized course data in-process between requests.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A dict-like cache holding at most `max_size` entries. When full, the
+    least recently read or written entry is evicted.
+
+    Hits and misses are counted so callers can report the cache's effectiveness.
+    """
+    def __init__(self, max_size):
+        if max_size < 1:
+            raise ValueError("LRUCache max_size must be at least 1, got {}".format(max_size))
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """
+        Return the value cached for `key` (marking it as most recently used),
+        or `default` if it isn't cached.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Cache `value` under `key`, evicting the least recently used entries if
+        the cache is over capacity.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove `key` from the cache, if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Empty the cache and reset the hit and miss counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
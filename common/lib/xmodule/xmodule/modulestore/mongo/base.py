@@ -12,15 +12,16 @@ structure:
 }
 """
 
+import copy
 import pymongo
 import sys
 import logging
-import copy
 
 from bson.son import SON
 from fs.osfs import OSFS
 from itertools import repeat
 from path import path
+from uuid import uuid4
 
 from importlib import import_module
 from xmodule.errortracker import null_error_tracker, exc_info_to_str
@@ -33,11 +34,28 @@ from xblock.fields import Scope, ScopeIds
 from xmodule.modulestore import ModuleStoreWriteBase, Location, MONGO_MODULESTORE_TYPE
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.inheritance import own_metadata, InheritanceMixin, inherit_metadata, InheritanceKeyValueStore
+from xmodule.modulestore.lru_cache import LRUCache
 from xmodule.modulestore.xml import LocationReader
 from xblock.core import XBlock
 
 log = logging.getLogger(__name__)
 
+# sentinel for metadata fields that are not set
+_MISSING = object()
+
+# the revision of draft records (see xmodule.modulestore.draft)
+DRAFT_REVISION = 'draft'
+
+# how long (in seconds) a write may hold the lock on its course's cached inheritance tree
+INHERITANCE_TREE_LOCK_TIMEOUT = 30
+
+# the categories of blocks whose children inherit their metadata. Note that when we add new
+# categories of containers, we have to add them here
+INHERITANCE_CONTAINER_CATEGORIES = [
+    'course', 'chapter', 'sequential', 'vertical', 'videosequence', 'wrapper', 'problemset', 'conditional',
+    'randomize'
+]
+
 # TODO (cpennington): This code currently operates under the assumption that
 # there is only one revision for each item. Once we start versioning inside the CMS,
 # that assumption will have to change
@@ -254,6 +272,152 @@ def metadata_cache_key(location):
     return u"{0.org}/{0.course}".format(location)
 
 
+def course_structure_cache_key(location):
+    """Turn a `Location` into the cache key of its course's structure."""
+    return u"{0.org}/{0.course}/structure".format(location)
+
+
+def course_version_cache_key(location):
+    """Turn a `Location` into the cache key of its course's version."""
+    return u"{0.org}/{0.course}/version".format(location)
+
+
+def inheritance_tree_lock_cache_key(location):
+    """Turn a `Location` into the cache key of the lock on its course's cached inheritance tree."""
+    return u"{0.org}/{0.course}/tree_lock".format(location)
+
+
+def inheritance_tree_contended_cache_key(location):
+    """
+    Turn a `Location` into the cache key of the flag marking its course's cached inheritance
+    tree as written to while locked.
+    """
+    return u"{0.org}/{0.course}/tree_contended".format(location)
+
+
+def metadata_inheritance_tree(resultset):
+    """
+    Compute the metadata inheritance tree from the container records of a course (as
+    returned by Mongo, with their '_id', 'definition.children' and inheritable 'metadata').
+
+    Returns a dict mapping the url of each block below the course to the metadata it
+    inherits. The tree is walked iteratively, and a block shares its parent's metadata dict
+    unless its own metadata changes something, so the tree (and its pickled form) only
+    grows with the number of places metadata is actually set. The dicts are shared:
+    callers must not modify them.
+    """
+    metadata_by_url = {}
+    children_by_url = {}
+    root = None
+
+    # now go through the results and order them by the location url
+    for result in resultset:
+        location = Location(result['_id'])
+        # We need to collate between draft and non-draft
+        # i.e. draft verticals will have draft children but will have non-draft parents currently
+        location_url = location.replace(revision=None).url()
+        children_by_url.setdefault(location_url, []).extend(result.get('definition', {}).get('children', []))
+        # check for presence of metadata key. Note that a given module may not yet be fully formed.
+        # example: update_item -> update_children -> update_metadata sequence on new item create
+        # if we get called here without update_metadata called first then 'metadata' hasn't been set
+        # as we're not fully transactional at the DB layer.
+        if location_url not in metadata_by_url or takes_collated_metadata(location):
+            metadata_by_url[location_url] = result.get('metadata', {})
+        if location.category == 'course':
+            root = location_url
+
+    metadata_to_inherit = {}
+    if root is None:
+        return metadata_to_inherit
+
+    propagate_inherited_metadata(root, metadata_by_url[root], metadata_by_url, children_by_url, metadata_to_inherit)
+    return metadata_to_inherit
+
+
+def propagate_inherited_metadata(root, root_metadata, metadata_by_url, children_by_url, metadata_to_inherit):
+    """
+    Walk down from the container with url root, whose children inherit root_metadata, recording
+    in metadata_to_inherit the metadata inherited by each block below it.
+
+    metadata_by_url and children_by_url give the own inheritable metadata and the children of
+    the containers below root; any other child is taken to be a leaf.
+    """
+    # now traverse the tree and compute down the inherited metadata
+    expanded = set([root])
+    to_process = [(root, root_metadata)]
+    while to_process:
+        url, my_metadata = to_process.pop()
+        containers = []
+        for child in children_by_url[url]:
+            if child in metadata_by_url:
+                child_metadata = my_metadata
+                own_metadata = metadata_by_url[child]
+                if any(my_metadata.get(name, _MISSING) != value for name, value in own_metadata.iteritems()):
+                    child_metadata = my_metadata.copy()
+                    child_metadata.update(own_metadata)
+                metadata_to_inherit[child] = child_metadata
+                # guard against malformed courses where a container is its own ancestor
+                if child not in expanded:
+                    expanded.add(child)
+                    containers.append((child, child_metadata))
+            else:
+                # results do not contain leaf nodes, so this is likely a leaf:
+                # record what metadata it needs to inherit
+                metadata_to_inherit[child] = my_metadata
+        # walk the children in order
+        to_process.extend(reversed(containers))
+
+
+def takes_collated_metadata(location):
+    """
+    Return whether the metadata of the record at location replaces that of a record already
+    collated for another revision of the same block: the draft's metadata wins over the
+    published record's, whatever order the records come in. Both the inheritance tree and
+    the course structure collate metadata this way, so that they agree.
+    """
+    return location.revision == DRAFT_REVISION
+
+
+def course_structure_record_filter():
+    """
+    Return the fields of the records that the course structure is computed from. The
+    (potentially large) definition data is left on the server.
+    """
+    record_filter = {'_id': 1, 'definition.children': 1, 'metadata.display_name': 1}
+    for field_name in InheritanceMixin.fields:
+        record_filter['metadata.{0}'.format(field_name)] = 1
+    return record_filter
+
+
+def add_to_course_structure(blocks, parents, result):
+    """
+    Add a record (as returned by Mongo, with `course_structure_record_filter`) to the
+    'blocks' and 'parents' of a course structure.
+    """
+    children = result.get('definition', {}).get('children', [])
+    for child in children:
+        parents.setdefault(child, []).append(dict(result['_id']))
+    block_location = Location(result['_id']).replace(revision=None)
+    is_new = block_location.url() not in blocks
+    block = blocks.setdefault(block_location.url(), {
+        'category': block_location.category,
+        'children': [],
+        'metadata': {},
+    })
+    for child in children:
+        if child not in block['children']:
+            block['children'].append(child)
+    if is_new or takes_collated_metadata(Location(result['_id'])):
+        metadata = result.get('metadata', {})
+        block.pop('display_name', None)
+        if 'display_name' in metadata:
+            block['display_name'] = metadata['display_name']
+        block['metadata'] = dict(
+            (field_name, value) for field_name, value in metadata.iteritems()
+            if field_name in InheritanceMixin.fields
+        )
+
+
 class MongoModuleStore(ModuleStoreWriteBase):
     """
     A Mongodb backed ModuleStore
@@ -265,9 +429,17 @@ class MongoModuleStore(ModuleStoreWriteBase):
     def __init__(self, doc_store_config, fs_root, render_template,
                  default_class=None,
                  error_tracker=null_error_tracker,
+                 descriptor_cache_size=0,
+                 descriptor_cache_items=1000,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param descriptor_cache_size: the number of courses whose descriptors' data (the item json that
+            get_item loads descriptors from) is kept in-process between requests. Each call still builds
+            fresh descriptors from a copy of the data, so callers may bind them to their own runtimes and
+            field data. The data of a course is retired when the course's version changes (see
+            `get_course_version`). 0 disables the cache.
+        :param descriptor_cache_items: the number of get_item results whose data is kept per course
         """
 
         super(MongoModuleStore, self).__init__(**kwargs)
@@ -313,6 +485,11 @@ class MongoModuleStore(ModuleStoreWriteBase):
         self.error_tracker = error_tracker
         self.render_template = render_template
         self.ignore_write_events_on_courses = []
+        if descriptor_cache_size:
+            self.descriptor_cache = LRUCache(descriptor_cache_size)
+        else:
+            self.descriptor_cache = None
+        self.descriptor_cache_items = descriptor_cache_items
 
     def compute_metadata_inheritance_tree(self, location):
         '''
@@ -320,11 +497,9 @@ class MongoModuleStore(ModuleStoreWriteBase):
         '''
 
         # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
         query = {'_id.org': location.org,
                  '_id.course': location.course,
-                 '_id.category': {'$in': ['course', 'chapter', 'sequential', 'vertical', 'videosequence',
-                                          'wrapper', 'problemset', 'conditional', 'randomize']}
+                 '_id.category': {'$in': INHERITANCE_CONTAINER_CATEGORIES}
                  }
         # we just want the Location, children, and inheritable metadata
         record_filter = {'_id': 1, 'definition.children': 1}
@@ -337,56 +512,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
         # call out to the DB
         resultset = self.collection.find(query, record_filter)
 
-        results_by_url = {}
-        root = None
-
-        # now go through the results and order them by the location url
-        for result in resultset:
-            location = Location(result['_id'])
-            # We need to collate between draft and non-draft
-            # i.e. draft verticals will have draft children but will have non-draft parents currently
-            location = location.replace(revision=None)
-            location_url = location.url()
-            if location_url in results_by_url:
-                existing_children = results_by_url[location_url].get('definition', {}).get('children', [])
-                additional_children = result.get('definition', {}).get('children', [])
-                total_children = existing_children + additional_children
-                results_by_url[location_url].setdefault('definition', {})['children'] = total_children
-            results_by_url[location.url()] = result
-            if location.category == 'course':
-                root = location.url()
-
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
-
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            # check for presence of metadata key. Note that a given module may not yet be fully formed.
-            # example: update_item -> update_children -> update_metadata sequence on new item create
-            # if we get called here without update_metadata called first then 'metadata' hasn't been set
-            # as we're not fully transactional at the DB layer. Same comment applies to below key name
-            # check
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
-
-        if root is not None:
-            _compute_inherited_metadata(root)
-
-        return metadata_to_inherit
+        return metadata_inheritance_tree(resultset)
 
     def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
         '''
@@ -428,12 +554,288 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
     def refresh_cached_metadata_inheritance_tree(self, location):
         """
-        Refresh the cached metadata inheritance tree for the org/course combination
-        for location
+        Refresh the cached metadata inheritance tree and course structure for the
+        org/course combination for location
         """
         pseudo_course_id = '/'.join([location.org, location.course])
         if pseudo_course_id not in self.ignore_write_events_on_courses:
             self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
+            self.get_course_structure(location, force_refresh=True)
+            self.bump_course_version(location)
+
+    def update_cached_metadata_inheritance_tree(self, location):
+        """
+        Bring the cached metadata inheritance tree and course structure of location's course
+        up to date after a write to location, by recomputing only the structure's entry for
+        location and the inherited metadata of the blocks below it.
+
+        Falls back to recomputing both for the whole course (see
+        `refresh_cached_metadata_inheritance_tree`) if they aren't cached, or if location
+        lost children, whose inherited metadata would have to be traced back to the other
+        parents they may have.
+
+        The update reads, patches and writes back the shared cached entries, so concurrent
+        writes to a course would drop each other's changes. Writes therefore take a lock on
+        the course's entries; a write that finds them locked drops them instead (and flags
+        the contention, so that the lock holder drops what it writes back too), leaving them
+        to be recomputed in full from the database when next read.
+        """
+        location = Location(location)
+        pseudo_course_id = '/'.join([location.org, location.course])
+        if pseudo_course_id in self.ignore_write_events_on_courses:
+            return
+
+        cache = self.metadata_inheritance_cache_subsystem
+        if cache is None:
+            self.refresh_cached_metadata_inheritance_tree(location)
+            return
+
+        lock_key = inheritance_tree_lock_cache_key(location)
+        contended_key = inheritance_tree_contended_cache_key(location)
+        if not cache.add(lock_key, True, INHERITANCE_TREE_LOCK_TIMEOUT):
+            # flag the contention before dropping the entries: either the lock holder sees
+            # the flag after writing back, or its write back precedes the drop below
+            cache.set(contended_key, True, INHERITANCE_TREE_LOCK_TIMEOUT)
+            self.drop_cached_metadata_inheritance_tree(location)
+            return
+        try:
+            self._update_cached_metadata_inheritance_tree(location)
+            if cache.get(contended_key) is not None:
+                cache.delete(contended_key)
+                self.drop_cached_metadata_inheritance_tree(location)
+        finally:
+            cache.delete(lock_key)
+
+    def drop_cached_metadata_inheritance_tree(self, location):
+        """
+        Drop the cached metadata inheritance tree and course structure of location's course
+        (from the caching subsystem and the request cache), so that they are recomputed in
+        full when next read, and move on the course's version.
+        """
+        for key in (metadata_cache_key(location), course_structure_cache_key(location)):
+            self.metadata_inheritance_cache_subsystem.delete(key)
+        if self.request_cache is not None:
+            self.request_cache.data.get('metadata_inheritance', {}).pop(metadata_cache_key(location), None)
+            self.request_cache.data.get('course_structure', {}).pop(course_structure_cache_key(location), None)
+        self.bump_course_version(location)
+
+    def _update_cached_metadata_inheritance_tree(self, location):
+        """
+        Make the update of `update_cached_metadata_inheritance_tree`, with the course's lock held
+        """
+        cache = self.metadata_inheritance_cache_subsystem
+        tree = cache.get(metadata_cache_key(location), {})
+        structure = cache.get(course_structure_cache_key(location))
+        if not tree or structure is None:
+            self.refresh_cached_metadata_inheritance_tree(location)
+            return
+
+        # the records of all the revisions of location
+        url = location.replace(revision=None).url()
+        query = dict(
+            ('_id.' + field, value) for field, value in location.dict().iteritems() if field != 'revision'
+        )
+        new_blocks = {}
+        new_parents = {}
+        for result in self.collection.find(query, course_structure_record_filter()):
+            add_to_course_structure(new_blocks, new_parents, result)
+        old_block = structure['blocks'].get(url)
+        new_block = new_blocks.get(url)
+        old_children = old_block['children'] if old_block is not None else []
+        new_children = new_block['children'] if new_block is not None else []
+        if not set(old_children).issubset(new_children):
+            self.refresh_cached_metadata_inheritance_tree(location)
+            return
+
+        # replace the structure's entries for location
+        if new_block is not None:
+            structure['blocks'][url] = new_block
+        else:
+            structure['blocks'].pop(url, None)
+        for child in old_children:
+            structure['parents'][child] = [
+                parent for parent in structure['parents'].get(child, [])
+                if Location(parent).replace(revision=None).url() != url
+            ]
+        for child, parents in new_parents.iteritems():
+            structure['parents'].setdefault(child, []).extend(parents)
+
+        # recompute the metadata inherited below location, if it is in the course tree
+        changed = old_block is None or new_block is None or any(
+            old_block[key] != new_block[key] for key in ('children', 'metadata')
+        )
+        is_root = location.category == 'course'
+        if changed and new_block is not None and location.category in INHERITANCE_CONTAINER_CATEGORIES and (
+                is_root or url in tree):
+            metadata_by_url = {}
+            children_by_url = {}
+            to_visit = [url]
+            while to_visit:
+                block_url = to_visit.pop()
+                block = structure['blocks'].get(block_url)
+                if (block_url in metadata_by_url or block is None or
+                        block['category'] not in INHERITANCE_CONTAINER_CATEGORIES):
+                    continue
+                metadata_by_url[block_url] = block['metadata']
+                children_by_url[block_url] = block['children']
+                to_visit.extend(block['children'])
+
+            if is_root:
+                root_metadata = new_block['metadata']
+            else:
+                root_metadata = self._parent_inherited_metadata(structure, tree, url).copy()
+                root_metadata.update(new_block['metadata'])
+                tree[url] = root_metadata
+            propagate_inherited_metadata(url, root_metadata, metadata_by_url, children_by_url, tree)
+
+        cache.set(metadata_cache_key(location), tree)
+        cache.set(course_structure_cache_key(location), structure)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('metadata_inheritance', {})[metadata_cache_key(location)] = tree
+            self.request_cache.data.setdefault('course_structure', {})[course_structure_cache_key(location)] = structure
+        self.bump_course_version(location)
+
+    def _parent_inherited_metadata(self, structure, tree, url):
+        """
+        Return the metadata that the block with url inherits from (one of) its parents:
+        the parent's own entry in the tree, or the course's own metadata if the parent
+        is the course.
+        """
+        for parent in structure['parents'].get(url, []):
+            parent_url = Location(parent).replace(revision=None).url()
+            if parent_url in tree:
+                return tree[parent_url]
+            parent_block = structure['blocks'].get(parent_url)
+            if parent_block is not None and parent_block['category'] == 'course':
+                return parent_block['metadata']
+        return {}
+
+    def check_cached_metadata_inheritance_tree(self, location):
+        """
+        Compare the cached metadata inheritance tree and course structure of location's
+        course with freshly computed ones. Returns a sorted list of the urls whose inherited
+        metadata, structure block, or parents differ (empty if nothing is cached).
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return []
+        cached_tree = self.metadata_inheritance_cache_subsystem.get(metadata_cache_key(location), {})
+        cached_structure = self.metadata_inheritance_cache_subsystem.get(course_structure_cache_key(location))
+
+        inconsistent = set()
+        if cached_tree:
+            tree = self.compute_metadata_inheritance_tree(location)
+            inconsistent.update(
+                url for url in set(tree) | set(cached_tree) if tree.get(url) != cached_tree.get(url)
+            )
+        if cached_structure is not None:
+            structure = self.compute_course_structure(location)
+            blocks, cached_blocks = structure['blocks'], cached_structure['blocks']
+            inconsistent.update(
+                url for url in set(blocks) | set(cached_blocks) if blocks.get(url) != cached_blocks.get(url)
+            )
+
+            def parent_urls(parents, url):
+                """The sorted urls (with revisions) of the parents of url"""
+                return sorted(Location(parent).url() for parent in parents.get(url, []))
+
+            parents, cached_parents = structure['parents'], cached_structure['parents']
+            inconsistent.update(
+                url for url in set(parents) | set(cached_parents)
+                if parent_urls(parents, url) != parent_urls(cached_parents, url)
+            )
+        return sorted(inconsistent)
+
+    def compute_course_structure(self, location):
+        '''
+        Compute the structure of the course containing location: a dict with 'blocks', mapping the url of every block in the course
+        to its category, children, display_name and own inheritable metadata, and 'parents',
+        mapping the url of every child in the course to the '_id's of the records that list it
+        as a child.
+
+        Draft and published versions of a block share a url, so their children are collated
+        in 'blocks'; 'parents' keeps their ids (with revisions) apart.
+        '''
+        query = {'_id.org': location.org, '_id.course': location.course}
+
+        blocks = {}
+        parents = {}
+        for result in self.collection.find(query, course_structure_record_filter()):
+            add_to_course_structure(blocks, parents, result)
+
+        return {
+            'blocks': blocks,
+            'parents': parents,
+        }
+
+    def get_course_structure(self, location, force_refresh=False):
+        '''
+        Return the structure of the course containing location (see `compute_course_structure`),
+        from the request cache or the caching subsystem if possible.
+        '''
+        key = course_structure_cache_key(location)
+        structure = None
+
+        if not force_refresh:
+            if self.request_cache is not None and key in self.request_cache.data.get('course_structure', {}):
+                return self.request_cache.data['course_structure'][key]
+
+            if self.metadata_inheritance_cache_subsystem is not None:
+                structure = self.metadata_inheritance_cache_subsystem.get(key)
+
+        if structure is None:
+            structure = self.compute_course_structure(location)
+            if self.metadata_inheritance_cache_subsystem is not None:
+                self.metadata_inheritance_cache_subsystem.set(key, structure)
+
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('course_structure', {})[key] = structure
+
+        return structure
+
+    def get_course_version(self, location):
+        '''
+        Return the version of the course containing location: an opaque token that changes
+        whenever the course is written to, kept in the caching subsystem under its own key (so
+        that it outlives evictions of the much larger structure and inheritance tree). Returns
+        None if there is no caching subsystem to share versions between processes.
+        '''
+        if self.metadata_inheritance_cache_subsystem is None:
+            return None
+        key = course_version_cache_key(location)
+        if self.request_cache is not None and key in self.request_cache.data.get('course_version', {}):
+            return self.request_cache.data['course_version'][key]
+
+        version = self.metadata_inheritance_cache_subsystem.get(key)
+        if version is None:
+            # don't overwrite a version set concurrently by a write
+            self.metadata_inheritance_cache_subsystem.add(key, uuid4().hex)
+            version = self.metadata_inheritance_cache_subsystem.get(key)
+        if self.request_cache is not None and version is not None:
+            self.request_cache.data.setdefault('course_version', {})[key] = version
+        return version
+
+    def bump_course_version(self, location):
+        '''
+        Move on the version of the course containing location after a write to it, so that
+        the descriptor data cached with the old version is not used again.
+        '''
+        if self.metadata_inheritance_cache_subsystem is None:
+            return
+        key = course_version_cache_key(location)
+        version = uuid4().hex
+        self.metadata_inheritance_cache_subsystem.set(key, version)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('course_version', {})[key] = version
+
+    def invalidate_course_structure(self, location):
+        '''
+        Move on the version of the course containing location after a write that doesn't
+        change the course's structure (e.g. to a block's data).
+        '''
+        pseudo_course_id = '/'.join([location.org, location.course])
+        if pseudo_course_id in self.ignore_write_events_on_courses:
+            return
+        self.bump_course_version(location)
 
     def _clean_item_data(self, item):
         """
@@ -449,17 +851,57 @@ class MongoModuleStore(ModuleStoreWriteBase):
         }
         return list(self.collection.find(query))
 
+    def _prefetch_descendants(self, items, depth):
+        """
+        Use the cached course structure to fetch the json data for all descendents of items
+        up to the specified depth in a single query. Returns a dict mapping the (non-draft)
+        url of each descendent to its uncleaned item data.
+
+        Only prefetches when all of items are in the same course.
+        """
+        if depth == 0 or not items:
+            return {}
+
+        locations = [Location(item['_id']) for item in items]
+        if len(set(metadata_cache_key(location) for location in locations)) != 1:
+            return {}
+
+        blocks = self.get_course_structure(locations[0])['blocks']
+        descendants = set()
+        level = [location.replace(revision=None).url() for location in locations]
+        while level and (depth is None or depth > 0):
+            next_level = []
+            for url in level:
+                for child in blocks.get(url, {}).get('children', []):
+                    if child not in descendants:
+                        descendants.add(child)
+                        next_level.append(child)
+            level = next_level
+            if depth is not None:
+                depth -= 1
+
+        if not descendants:
+            return {}
+
+        return dict(
+            (Location(child['_id']).replace(revision=None).url(), child)
+            for child in self._query_children_for_cache_children(list(descendants))
+        )
+
     def _cache_children(self, items, depth=0):
         """
         Returns a dictionary mapping Location -> item data, populated with json data
         for all descendents of items up to the specified depth.
         (0 = no descendents, 1 = children, 2 = grandchildren, etc)
         If depth is None, will load all the children.
-        This will make a number of queries that is linear in the depth.
+        Descendents are fetched in one query using the cached course structure; any that
+        the structure doesn't know about (e.g. because it is out of date) are then loaded
+        with a query per depth level.
         """
 
         data = {}
         to_process = list(items)
+        prefetched = self._prefetch_descendants(to_process, depth)
         while to_process and depth is None or depth >= 0:
             children = []
             for item in to_process:
@@ -470,12 +912,19 @@ class MongoModuleStore(ModuleStoreWriteBase):
             if depth == 0:
                 break
 
-            # Load all children by id. See
+            to_process = []
+            missing = []
+            for child in children:
+                if child in prefetched:
+                    to_process.append(prefetched.pop(child))
+                else:
+                    missing.append(child)
+
+            # Load all remaining children by id. See
             # http://www.mongodb.org/display/DOCS/Advanced+Queries#AdvancedQueries-%24or
             # for or-query syntax
-            to_process = []
-            if children:
-                to_process = self._query_children_for_cache_children(children)
+            if missing:
+                to_process.extend(self._query_children_for_cache_children(missing))
 
             # If depth is None, then we just recurse until we hit all the descendents
             if depth is not None:
@@ -483,36 +932,46 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
         return data
 
-    def _load_item(self, item, data_cache, apply_cached_metadata=True):
+    def _load_item(self, item, data_cache, apply_cached_metadata=True, systems=None):
         """
         Load an XModuleDescriptor from item, using the children stored in data_cache
+
+        systems: an optional dict in which the descriptor system built for each course
+            is remembered, so that loading many items from a course shares one system
         """
         location = Location(item['location'])
         data_dir = getattr(item, 'data_dir', location.course)
-        root = self.fs_root / data_dir
-
-        if not root.isdir():
-            root.mkdir()
-
-        resource_fs = OSFS(root)
-
-        cached_metadata = {}
-        if apply_cached_metadata:
-            cached_metadata = self.get_cached_metadata_inheritance_tree(location)
-
-        # TODO (cdodge): When the 'split module store' work has been completed, we should remove
-        # the 'metadata_inheritance_tree' parameter
-        system = CachingDescriptorSystem(
-            modulestore=self,
-            module_data=data_cache,
-            default_class=self.default_class,
-            resources_fs=resource_fs,
-            error_tracker=self.error_tracker,
-            render_template=self.render_template,
-            cached_metadata=cached_metadata,
-            mixins=self.xblock_mixins,
-            select=self.xblock_select,
-        )
+        system_key = (metadata_cache_key(location), data_dir, apply_cached_metadata)
+        system = systems.get(system_key) if systems is not None else None
+
+        if system is None:
+            root = self.fs_root / data_dir
+
+            if not root.isdir():
+                root.mkdir()
+
+            resource_fs = OSFS(root)
+
+            cached_metadata = {}
+            if apply_cached_metadata:
+                cached_metadata = self.get_cached_metadata_inheritance_tree(location)
+
+            # TODO (cdodge): When the 'split module store' work has been completed, we should remove
+            # the 'metadata_inheritance_tree' parameter
+            system = CachingDescriptorSystem(
+                modulestore=self,
+                module_data=data_cache,
+                default_class=self.default_class,
+                resources_fs=resource_fs,
+                error_tracker=self.error_tracker,
+                render_template=self.render_template,
+                cached_metadata=cached_metadata,
+                mixins=self.xblock_mixins,
+                select=self.xblock_select,
+            )
+            if systems is not None:
+                systems[system_key] = system
+
         return system.load_item(location)
 
     def _load_items(self, items, depth=0):
@@ -521,11 +980,13 @@ class MongoModuleStore(ModuleStoreWriteBase):
         to specified depth
         """
         data_cache = self._cache_children(items, depth)
+        systems = {}
 
         # if we are loading a course object, if we're not prefetching children (depth != 0) then don't
         # bother with the metadata inheritance
         return [self._load_item(item, data_cache,
-                apply_cached_metadata=(item['location']['category'] != 'course' or depth != 0)) for item in items]
+                apply_cached_metadata=(item['location']['category'] != 'course' or depth != 0),
+                systems=systems) for item in items]
 
     def get_courses(self):
         '''
@@ -583,10 +1044,49 @@ class MongoModuleStore(ModuleStoreWriteBase):
             calls to get_children() to cache. None indicates to cache all descendents.
         """
         location = Location.ensure_fully_specified(location)
+        if self.descriptor_cache is not None:
+            return self._get_cached_item(location, depth)
         item = self._find_one(location)
         module = self._load_items([item], depth)[0]
         return module
 
+    def _get_cached_item(self, location, depth):
+        """
+        Return a new descriptor for location, built from a copy of the item data (the item's
+        json and that of its descendents to depth) cached in `self.descriptor_cache`, loading
+        (and caching) the data if it isn't there.
+
+        The cache holds, per course, the item data loaded since the course's version last
+        changed, so any write to the course retires it. Only data is shared between callers:
+        the descriptors are built afresh, as callers bind per-user state onto them.
+        """
+        version = self.get_course_version(location)
+        if version is None:
+            item = self._find_one(location)
+            return self._load_items([item], depth)[0]
+
+        course_key = metadata_cache_key(location)
+        cached = self.descriptor_cache.get(course_key)
+        if cached is None or cached[0] != version:
+            cached = (version, LRUCache(self.descriptor_cache_items))
+            self.descriptor_cache.set(course_key, cached)
+
+        items = cached[1]
+        item_data = items.get((location, depth))
+        if item_data is None:
+            item = self._find_one(location)
+            data_cache = self._cache_children([item], depth)
+            item_data = (Location(item['location']), data_cache)
+            items.set((location, depth), item_data)
+
+        item_location, data_cache = item_data
+        # descriptors write through to their json, so each gets its own copy
+        data_cache = copy.deepcopy(data_cache)
+        item = data_cache[item_location]
+        return self._load_item(
+            item, data_cache, apply_cached_metadata=(item['location']['category'] != 'course' or depth != 0)
+        )
+
     def get_instance(self, course_id, location, depth=0):
         """
         TODO (vshnayder): implement policy tracking in mongo.
@@ -671,8 +1171,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
                     'children': xmodule.children if xmodule.has_children else []
                 }
             })
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(xmodule.location)
+        # update the cached metadata inheritance tree and course structure
+        self.update_cached_metadata_inheritance_tree(xmodule.location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(xmodule.location), xmodule.location)
 
     def create_and_save_xmodule(self, location, definition_data=None, metadata=None, system=None):
@@ -778,6 +1278,9 @@ class MongoModuleStore(ModuleStoreWriteBase):
         except ItemNotFoundError:
             if not allow_not_found:
                 raise
+        # the course structure doesn't include data, but its version has to move on
+        # so that descriptors cached with the old data are not used again
+        self.invalidate_course_structure(Location(location))
 
     def update_children(self, location, children):
         """
@@ -791,8 +1294,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
         children = [Location(child).url() for child in children]
 
         self._update_single_item(location, {'definition.children': children})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # update the cached metadata inheritance tree and course structure
+        self.update_cached_metadata_inheritance_tree(Location(location))
         # fire signal that we've written to DB
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
@@ -821,8 +1324,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
             self.update_metadata(course.location, own_metadata(course))
 
         self._update_single_item(location, {'metadata': metadata})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(loc)
+        # update the cached metadata inheritance tree and course structure
+        self.update_cached_metadata_inheritance_tree(loc)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def delete_item(self, location, delete_all_versions=False):
@@ -847,18 +1350,28 @@ class MongoModuleStore(ModuleStoreWriteBase):
         # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': Location(location).dict()}, safe=self.collection.safe)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # update the cached metadata inheritance tree and course structure
+        self.update_cached_metadata_inheritance_tree(Location(location))
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def get_parent_locations(self, location, course_id):
         '''Find all locations that are the parents of this location in this
         course.  Needed for path_to_location().
+
+        Parents are looked up in the cached course structure, unless writes to the
+        course are being ignored (e.g. during an import), in which case the structure
+        may be out of date and the parents are queried for.
         '''
         location = Location.ensure_fully_specified(location)
-        items = self.collection.find({'definition.children': location.url()},
-                                     {'_id': True})
-        return [i['_id'] for i in items]
+        pseudo_course_id = '/'.join([location.org, location.course])
+        if pseudo_course_id in self.ignore_write_events_on_courses:
+            items = self.collection.find({'definition.children': location.url()},
+                                         {'_id': True})
+            return [i['_id'] for i in items]
+
+        parents = self.get_course_structure(location)['parents'].get(location.url(), [])
+        # copy the ids, as the structure is shared
+        return [dict(parent) for parent in parents]
 
     def get_modulestore_type(self, course_id):
         """
@@ -7,6 +7,7 @@ from xmodule.errortracker import exc_info_to_str
 from xblock.runtime import KvsFieldData, IdReader
 from ..exceptions import ItemNotFoundError
 from .split_mongo_kvs import SplitMongoKVS
+from .definition_lazy_loader import DefinitionBatch
 from xblock.fields import ScopeIds
 from xmodule.modulestore.loc_mapper_store import LocMapperStore
 
@@ -26,7 +27,7 @@ class SplitMongoIdReader(IdReader):
         return usage.definition_locator
 
     def get_block_type(self, def_id):
-        definition = self.system.modulestore.db_connection.get_definition(def_id)
+        definition = self.system.modulestore.get_definition(def_id)
         return definition['category']
 
 
@@ -61,6 +62,8 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
         self.course_entry = course_entry
         self.lazy = lazy
         self.module_data = module_data
+        # the definitions the lazy loaders of this system's blocks have yet to fetch
+        self.definition_batch = DefinitionBatch(modulestore, modulestore.definition_batch_size)
         # Compute inheritance
         modulestore.inherit_settings(
             course_entry['structure'].get('blocks', {}),
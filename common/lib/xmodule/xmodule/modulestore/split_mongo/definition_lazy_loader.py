@@ -1,3 +1,5 @@
+from collections import deque
+
 from xmodule.modulestore.locator import DefinitionLocator
 
 
@@ -8,18 +10,65 @@ class DefinitionLazyLoader(object):
     object doesn't force access during init but waits until client wants the
     definition. Only works if the modulestore is a split mongo store.
     """
-    def __init__(self, modulestore, definition_id):
+    def __init__(self, modulestore, definition_id, batch=None):
         """
         Simple placeholder for yet-to-be-fetched data
         :param modulestore: the pymongo db connection with the definitions
         :param definition_locator: the id of the record in the above to fetch
+        :param batch: an optional DefinitionBatch with which to fetch this definition
+            along with the other pending ones
         """
         self.modulestore = modulestore
         self.definition_locator = DefinitionLocator(definition_id)
+        self.batch = batch
+        if batch is not None:
+            batch.add(definition_id)
 
     def fetch(self):
         """
         Fetch the definition. Note, the caller should replace this lazy
         loader pointer with the result so as not to fetch more than once
         """
-        return self.modulestore.db_connection.get_definition(self.definition_locator.definition_id)
+        if self.batch is not None:
+            return self.batch.get(self.definition_locator.definition_id)
+        return self.modulestore.get_definition(self.definition_locator.definition_id)
+
+
+class DefinitionBatch(object):
+    """
+    The definitions pending for the lazy loaders of a CachingDescriptorSystem. Fetching
+    any of them fetches up to `batch_size` of them in one query, so that loading the
+    definitions of, e.g., all the components of a unit doesn't cost a query apiece.
+    """
+    def __init__(self, modulestore, batch_size):
+        self.modulestore = modulestore
+        self.batch_size = batch_size
+        self.pending = deque()
+        self.pending_ids = set()
+        self.fetched = {}
+
+    def add(self, definition_id):
+        """
+        Add definition_id to the definitions to fetch
+        """
+        if definition_id not in self.pending_ids and definition_id not in self.fetched:
+            self.pending.append(definition_id)
+            self.pending_ids.add(definition_id)
+
+    def get(self, definition_id):
+        """
+        Return the definition with the given id (or None if it doesn't exist), fetching
+        it along with the next batch of pending definitions if it isn't already fetched.
+        """
+        if definition_id not in self.fetched:
+            batch = [definition_id]
+            while self.pending and len(batch) < self.batch_size:
+                pending_id = self.pending.popleft()
+                if pending_id != definition_id and pending_id not in self.fetched:
+                    batch.append(pending_id)
+            for fetched_id in batch:
+                self.pending_ids.discard(fetched_id)
+                self.fetched[fetched_id] = None
+            for definition in self.modulestore.find_definitions(batch):
+                self.fetched[definition['_id']] = definition
+        return self.fetched[definition_id]
@@ -0,0 +1,99 @@
+"""
+Process-wide caching of split modulestore documents by id.
+"""
+import cPickle as pickle
+
+from dogapi import dog_stats_api
+
+from xmodule.modulestore.lru_cache import LRUCache
+
+
+class DocumentCache(object):
+    """
+    A cache of one kind of split mongo document (structures or definitions) keyed by _id.
+
+    Edits to a course create new structure and definition documents with new ids rather
+    than changing the existing ones, so documents can be cached without invalidation.
+    The store's few in-place updates (e.g. continuing a version during bulk operations)
+    must call `delete`.
+
+    Documents are held pickled in a bounded in-process LRU and, optionally, in a shared
+    django cache (e.g. memcached). Each read unpickles a fresh copy, as callers modify
+    the documents they fetch.
+    """
+    def __init__(self, kind, max_size, shared_cache=None):
+        """
+        :param kind: the kind of document cached, used in cache keys and metrics
+        :param max_size: the maximum number of documents to keep in-process
+        :param shared_cache: an optional django cache to share documents between processes
+        """
+        self.kind = kind
+        self.local_cache = LRUCache(max_size)
+        self.shared_cache = shared_cache
+        self.hits = 0
+        self.misses = 0
+
+    def _shared_key(self, doc_id):
+        """
+        Return the key for doc_id in the shared cache
+        """
+        return u'split_mongo.{}.{}'.format(self.kind, doc_id)
+
+    def get_many(self, doc_ids):
+        """
+        Return a dict mapping those of doc_ids that are cached to (a copy of) their document
+        """
+        found = {}
+        missing = []
+        for doc_id in doc_ids:
+            pickled = self.local_cache.get(doc_id)
+            if pickled is None:
+                missing.append(doc_id)
+            else:
+                found[doc_id] = pickled
+
+        if missing and self.shared_cache is not None:
+            shared = self.shared_cache.get_many([self._shared_key(doc_id) for doc_id in missing])
+            for doc_id in missing:
+                pickled = shared.get(self._shared_key(doc_id))
+                if pickled is not None:
+                    self.local_cache.set(doc_id, pickled)
+                    found[doc_id] = pickled
+
+        self._record(len(found), len(doc_ids) - len(found))
+        return dict((doc_id, pickle.loads(pickled)) for doc_id, pickled in found.iteritems())
+
+    def get(self, doc_id):
+        """
+        Return (a copy of) the document with id doc_id, or None if it isn't cached
+        """
+        return self.get_many([doc_id]).get(doc_id)
+
+    def add(self, document):
+        """
+        Cache document under its _id
+        """
+        pickled = pickle.dumps(document, pickle.HIGHEST_PROTOCOL)
+        self.local_cache.set(document['_id'], pickled)
+        if self.shared_cache is not None:
+            self.shared_cache.set(self._shared_key(document['_id']), pickled)
+
+    def delete(self, doc_id):
+        """
+        Remove the document with id doc_id from the cache
+        """
+        self.local_cache.delete(doc_id)
+        if self.shared_cache is not None:
+            self.shared_cache.delete(self._shared_key(doc_id))
+
+    def _record(self, hits, misses):
+        """
+        Count hits and misses, and report them as metrics
+        """
+        tags = [u'kind:{}'.format(self.kind)]
+        if hits:
+            self.hits += hits
+            dog_stats_api.increment('split_modulestore.document_cache', hits, tags=tags + ['result:hit'])
+        if misses:
+            self.misses += misses
+            dog_stats_api.increment('split_modulestore.document_cache', misses, tags=tags + ['result:miss'])
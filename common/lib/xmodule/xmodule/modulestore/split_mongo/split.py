@@ -63,6 +63,7 @@ from xmodule.modulestore import inheritance, ModuleStoreWriteBase, Location, SPL
 
 from ..exceptions import ItemNotFoundError
 from .definition_lazy_loader import DefinitionLazyLoader
+from .document_cache import DocumentCache
 from .caching_descriptor_system import CachingDescriptorSystem
 from xblock.fields import Scope
 from xblock.runtime import Mixologist
@@ -70,6 +71,7 @@ from bson.objectid import ObjectId
 from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
 from xblock.core import XBlock
 from xmodule.modulestore.loc_mapper_store import LocMapperStore
+from xmodule.modulestore.lru_cache import LRUCache
 
 log = logging.getLogger(__name__)
 #==============================================================================
@@ -98,13 +100,25 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
     A Mongodb backed ModuleStore supporting versions, inheritance,
     and sharing.
     """
+    # the number of CachingDescriptorSystems (i.e. course versions) each thread keeps
+    THREAD_COURSE_CACHE_SIZE = 10
+
     def __init__(self, doc_store_config, fs_root, render_template,
                  default_class=None,
                  error_tracker=null_error_tracker,
                  loc_mapper=None,
+                 definition_batch_size=100,
+                 structure_cache_size=100,
+                 definition_cache_size=2000,
+                 share_document_cache=False,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param definition_batch_size: the maximum number of lazily loaded definitions to fetch in one query
+        :param structure_cache_size: the number of structures to cache in-process (0 disables the cache)
+        :param definition_cache_size: the number of definitions to cache in-process (0 disables the cache)
+        :param share_document_cache: whether to also cache structures and definitions in the
+            metadata_inheritance_cache_subsystem (e.g. memcached) so that processes share them
         """
 
         super(SplitMongoModuleStore, self).__init__(**kwargs)
@@ -112,9 +126,17 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         self.db_connection = MongoConnection(**doc_store_config)
         self.db = self.db_connection.database
+        self.definition_batch_size = definition_batch_size
+
+        shared_cache = self.metadata_inheritance_cache_subsystem if share_document_cache else None
+        self.structure_cache = None
+        if structure_cache_size:
+            self.structure_cache = DocumentCache('structure', structure_cache_size, shared_cache)
+        self.definition_cache = None
+        if definition_cache_size:
+            self.definition_cache = DocumentCache('definition', definition_cache_size, shared_cache)
 
-        # Code review question: How should I expire entries?
-        # _add_cache could use a lru mechanism to control the cache size?
+        # each thread's CachingDescriptorSystems by course version; see _get_cache
         self.thread_cache = threading.local()
 
         if default_class is not None:
@@ -152,12 +174,12 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         if lazy:
             for block in new_module_data.itervalues():
-                block['definition'] = DefinitionLazyLoader(self, block['definition'])
+                if not isinstance(block['definition'], DefinitionLazyLoader):
+                    block['definition'] = DefinitionLazyLoader(self, block['definition'], system.definition_batch)
         else:
             # Load all descendants by id
-            descendent_definitions = self.db_connection.find_matching_definitions({
-                '_id': {'$in': [block['definition']
-                                for block in new_module_data.itervalues()]}})
+            descendent_definitions = self.find_definitions([block['definition']
+                                                            for block in new_module_data.itervalues()])
             # turn into a map
             definitions = {definition['_id']: definition
                            for definition in descendent_definitions}
@@ -193,13 +215,91 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             self.cache_items(system, block_ids, depth, lazy)
         return [system.load_item(block_id, course_entry) for block_id in block_ids]
 
+    def get_definition(self, definition_id):
+        """
+        Fetch the definition with the given id, or None if there isn't one
+        """
+        definitions = self.find_definitions([definition_id])
+        return definitions[0] if definitions else None
+
+    def find_definitions(self, definition_ids):
+        """
+        Fetch the definitions with the given ids, querying for any that aren't cached in a single query
+        """
+        return self._find_documents(
+            definition_ids, self.definition_cache, self.db_connection.find_matching_definitions,
+            count_query=self._count_definition_queries
+        )
+
+    def _get_structure(self, version_guid):
+        """
+        Fetch the structure with the given version guid, or None if there isn't one
+        """
+        structures = self._find_structures([version_guid])
+        return structures[0] if structures else None
+
+    def _find_structures(self, version_guids):
+        """
+        Fetch the structures with the given version guids, querying for any that aren't cached in a single query
+        """
+        return self._find_documents(version_guids, self.structure_cache, self.db_connection.find_matching_structures)
+
+    def _update_structure(self, structure):
+        """
+        Update the db record for structure in place, and drop the cached copy of it
+        """
+        self.db_connection.update_structure(structure)
+        if self.structure_cache is not None:
+            self.structure_cache.delete(structure['_id'])
+
+    def _find_documents(self, doc_ids, cache, find_matching, count_query=None):
+        """
+        Return the documents with the given ids from cache (a DocumentCache or None), fetching
+        (and caching) any that it doesn't have using find_matching.
+        """
+        doc_ids = list(collections.OrderedDict.fromkeys(doc_ids))
+        documents = cache.get_many(doc_ids) if cache is not None else {}
+        missing = [doc_id for doc_id in doc_ids if doc_id not in documents]
+        if missing:
+            if count_query is not None:
+                count_query()
+            for document in find_matching({'_id': {'$in': missing}}):
+                documents[document['_id']] = document
+                if cache is not None:
+                    cache.add(document)
+        return [documents[doc_id] for doc_id in doc_ids if doc_id in documents]
+
+    def _count_definition_queries(self):
+        """
+        Count a query for definitions against the current request
+        """
+        counts = self._query_counts()
+        counts['definitions'] = counts.get('definitions', 0) + 1
+
+    def definition_query_count(self):
+        """
+        Return the number of queries for definitions made during the current request (or,
+        outside of a request, by the current thread)
+        """
+        return self._query_counts().get('definitions', 0)
+
+    def _query_counts(self):
+        """
+        Return the dict of query counts for the current request, or thread if there is no request cache
+        """
+        if self.request_cache is not None:
+            return self.request_cache.data.setdefault('split_query_counts', {})
+        if not hasattr(self.thread_cache, 'query_counts'):
+            self.thread_cache.query_counts = {}
+        return self.thread_cache.query_counts
+
     def _get_cache(self, course_version_guid):
         """
         Find the descriptor cache for this course if it exists
         :param course_version_guid:
         """
         if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
+            self.thread_cache.course_cache = LRUCache(self.THREAD_COURSE_CACHE_SIZE)
         system = self.thread_cache.course_cache
         return system.get(course_version_guid)
 
@@ -210,8 +310,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param system:
         """
         if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        self.thread_cache.course_cache[course_version_guid] = system
+            self.thread_cache.course_cache = LRUCache(self.THREAD_COURSE_CACHE_SIZE)
+        self.thread_cache.course_cache.set(course_version_guid, system)
         return system
 
     def _clear_cache(self, course_version_guid=None):
@@ -220,9 +320,10 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid: if provided, clear only this entry
         """
         if course_version_guid:
-            del self.thread_cache.course_cache[course_version_guid]
+            if hasattr(self.thread_cache, 'course_cache'):
+                self.thread_cache.course_cache.delete(course_version_guid)
         else:
-            self.thread_cache.course_cache = {}
+            self.thread_cache.course_cache = LRUCache(self.THREAD_COURSE_CACHE_SIZE)
 
     def _lookup_course(self, course_locator):
         '''
@@ -259,7 +360,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         # cast string to ObjectId if necessary
         version_guid = course_locator.as_object_id(version_guid)
-        entry = self.db_connection.get_structure(version_guid)
+        entry = self._get_structure(version_guid)
 
         # b/c more than one course can use same structure, the 'package_id' and 'branch' are not intrinsic to structure
         # and the one assoc'd w/ it by another fetch may not be the one relevant to this fetch; so,
@@ -297,7 +398,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             version_guids.append(version_guid)
             id_version_map[version_guid] = structure['_id']
 
-        course_entries = self.db_connection.find_matching_structures({'_id': {'$in': version_guids}})
+        course_entries = self._find_structures(version_guids)
 
         # get the block for the course element (s/b the root)
         result = []
@@ -507,7 +608,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             'edited_on': when the change was made
         }
         """
-        definition = self.db_connection.get_definition(definition_locator.definition_id)
+        definition = self.get_definition(definition_locator.definition_id)
         if definition is None:
             return None
         return definition['edit_info']
@@ -638,7 +739,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         # if this looks in cache rather than fresh fetches, then it will probably not detect
         # actual change b/c the descriptor and cache probably point to the same objects
-        old_definition = self.db_connection.get_definition(definition_locator.definition_id)
+        old_definition = self.get_definition(definition_locator.definition_id)
         if old_definition is None:
             raise ItemNotFoundError(definition_locator.url())
 
@@ -802,7 +903,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 parent['edit_info']['update_version'] = new_id
         if continue_version:
             # db update
-            self.db_connection.update_structure(new_structure)
+            self._update_structure(new_structure)
             # clear cache so things get refetched and inheritance recomputed
             self._clear_cache(new_id)
         else:
@@ -905,7 +1006,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 if block_fields is not None:
                     root_block['fields'].update(block_fields)
                 if definition_fields is not None:
-                    definition = self.db_connection.get_definition(root_block['definition'])
+                    definition = self.get_definition(root_block['definition'])
                     definition['fields'].update(definition_fields)
                     definition['edit_info']['previous_version'] = definition['_id']
                     definition['edit_info']['edited_by'] = user_id
@@ -1376,7 +1477,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                     block_id for block_id in block['fields']["children"]
                     if LocMapperStore.encode_key_for_mongo(block_id) in original_structure['blocks']
                 ]
-        self.db_connection.update_structure(original_structure)
+        self._update_structure(original_structure)
         # clear cache again b/c inheritance may be wrong over orphans
         self._clear_cache(original_structure['_id'])
 
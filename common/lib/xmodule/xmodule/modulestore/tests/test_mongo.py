@@ -1,11 +1,12 @@
 from pprint import pprint
 # pylint: disable=E0611
 from nose.tools import assert_equals, assert_raises, \
-    assert_not_equals, assert_false
+    assert_not_equals, assert_false, assert_not_in
 from itertools import ifilter
 # pylint: enable=E0611
 import pymongo
 import logging
+from mock import patch
 from uuid import uuid4
 
 from xblock.fields import Scope
@@ -15,6 +16,10 @@ from xblock.exceptions import InvalidScopeError
 from xmodule.tests import DATA_DIR
 from xmodule.modulestore import Location, MONGO_MODULESTORE_TYPE
 from xmodule.modulestore.mongo import MongoModuleStore, MongoKeyValueStore
+from xmodule.modulestore.mongo.base import (
+    metadata_inheritance_tree, add_to_course_structure, metadata_cache_key, course_structure_cache_key,
+    inheritance_tree_lock_cache_key, inheritance_tree_contended_cache_key,
+)
 from xmodule.modulestore.draft import DraftModuleStore
 from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
 from xmodule.contentstore.mongo import MongoContentStore
@@ -35,6 +40,29 @@ DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
 RENDER_TEMPLATE = lambda t_n, d, ctx = None, nsp = 'main': ''
 
 
+class DictCache(object):
+    """
+    A minimal stand-in for a django cache, for use as a metadata_inheritance_cache_subsystem
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value, timeout=None):  # pylint: disable=unused-argument
+        self.data[key] = value
+
+    def add(self, key, value, timeout=None):  # pylint: disable=unused-argument
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
 class TestMongoModuleStore(object):
     '''Tests!'''
     @classmethod
@@ -272,6 +300,255 @@ class TestMongoModuleStore(object):
             {'displayname': 'hello'}
         )
 
+    def test_course_structure(self):
+        course_location = Location('i4x', 'edX', 'toy', 'course', '2012_Fall')
+        course = self.store.get_item(course_location)
+        structure = self.store.compute_course_structure(course_location)
+
+        course_block = structure['blocks'][course_location.url()]
+        assert_equals('course', course_block['category'])
+        assert_equals(course.children, course_block['children'])
+        assert_equals(course.display_name, course_block['display_name'])
+        for child in course.get_children():
+            assert_equals(child.location.category, structure['blocks'][child.location.url()]['category'])
+
+    def test_cache_children_uses_structure(self):
+        course_location = Location('i4x', 'edX', 'toy', 'course', '2012_Fall')
+        with patch.object(
+            self.store, '_query_children_for_cache_children', wraps=self.store._query_children_for_cache_children
+        ) as query_children:
+            course = self.store.get_item(course_location, depth=None)
+        # all descendents are fetched with a single query
+        assert_equals(1, query_children.call_count)
+
+        loaded = course.runtime.module_data
+        for chapter in course.get_children():
+            assert_in(chapter.location, loaded)
+            for section in chapter.get_children():
+                assert_in(section.location, loaded)
+
+    def test_get_parent_locations_uses_structure(self):
+        store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': COLLECTION},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=DictCache(),
+        )
+        location = Location('i4x', 'edX', 'toy', 'video', 'Welcome')
+        queried = [
+            item['_id'] for item in store.collection.find({'definition.children': location.url()}, {'_id': True})
+        ]
+        assert_equals(1, len(queried))
+
+        store.get_course_structure(location)
+        with patch.object(store.collection, 'find') as find:
+            assert_equals(queried, store.get_parent_locations(location, 'edX/toy/2012_Fall'))
+            assert_equals([], store.get_parent_locations(Location('i4x', 'edX', 'toy', 'course', '2012_Fall'), None))
+        assert_false(find.called)
+
+        # while writes to the course are ignored, the parents are queried for
+        store.ignore_write_events_on_courses.append('edX/toy')
+        try:
+            with patch.object(store.collection, 'find', wraps=store.collection.find) as find:
+                assert_equals(queried, store.get_parent_locations(location, 'edX/toy/2012_Fall'))
+            assert_equals(1, find.call_count)
+        finally:
+            store.ignore_write_events_on_courses.remove('edX/toy')
+
+    def test_descriptor_cache(self):
+        store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': COLLECTION},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            descriptor_cache_size=2,
+            descriptor_cache_items=1,
+            metadata_inheritance_cache_subsystem=DictCache(),
+        )
+        location = Location('i4x', 'edX', 'toy', 'video', 'Welcome')
+        video = store.get_item(location)
+        with patch.object(store.collection, 'find_one') as find_one:
+            cached_video = store.get_item(location)
+        assert_false(find_one.called)
+        assert_equals(video.location, cached_video.location)
+        # each call gets its own descriptor, so binding state onto one doesn't affect the others
+        assert cached_video is not video
+        cached_video.display_name = 'changed'
+        assert_not_equals('changed', store.get_item(location).display_name)
+        assert_equals(1, len(store.descriptor_cache))
+
+        # an eviction of the course structure doesn't retire the cached data
+        store.metadata_inheritance_cache_subsystem.delete(course_structure_cache_key(location))
+        with patch.object(store.collection, 'find_one') as find_one:
+            store.get_item(location)
+        assert_false(find_one.called)
+
+        # each course keeps at most descriptor_cache_items results
+        with patch.object(store.collection, 'find_one', wraps=store.collection.find_one) as find_one:
+            store.get_item(location, depth=None)
+            store.get_item(location)
+        assert_equals(2, find_one.call_count)
+
+        # any write to the course retires its cached data
+        store.update_item(location, store._find_one(location)['definition']['data'])
+        with patch.object(store.collection, 'find_one', wraps=store.collection.find_one) as find_one:
+            store.get_item(location)
+        assert_equals(1, find_one.call_count)
+
+
+class TestMetadataInheritanceTree(object):
+    """
+    Tests for computing the metadata inheritance tree from container records
+    """
+    def record(self, category, name, children, metadata):
+        """
+        Return a container record as the inheritance tree query returns it
+        """
+        return {
+            '_id': Location('i4x', 'org', 'course', category, name).dict(),
+            'definition': {'children': [Location('i4x', 'org', 'course', *child.split('/')).url() for child in children]},
+            'metadata': metadata,
+        }
+
+    def test_inheritance(self):
+        tree = metadata_inheritance_tree([
+            self.record('course', 'run', ['chapter/a', 'chapter/b'], {'start': '2014-01-01T00:00:00Z'}),
+            self.record('chapter', 'a', ['sequential/s', 'html/h'], {}),
+            self.record('chapter', 'b', ['problem/p'], {'graded': True}),
+            self.record('sequential', 's', ['problem/q'], {'start': '2014-01-01T00:00:00Z'}),
+        ])
+        url = lambda child: Location('i4x', 'org', 'course', *child.split('/')).url()
+
+        assert_equals({'start': '2014-01-01T00:00:00Z'}, tree[url('chapter/a')])
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, tree[url('chapter/b')])
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, tree[url('problem/p')])
+        assert_equals({'start': '2014-01-01T00:00:00Z'}, tree[url('problem/q')])
+        assert_equals({'start': '2014-01-01T00:00:00Z'}, tree[url('html/h')])
+        # blocks that don't change anything share their parent's metadata
+        assert tree[url('problem/q')] is tree[url('chapter/a')]
+        assert tree[url('sequential/s')] is tree[url('chapter/a')]
+
+    def test_cycle(self):
+        tree = metadata_inheritance_tree([
+            self.record('course', 'run', ['chapter/a'], {}),
+            self.record('chapter', 'a', ['vertical/v'], {}),
+            self.record('vertical', 'v', ['chapter/a'], {'graded': True}),
+        ])
+        assert_equals({'graded': True}, tree[Location('i4x', 'org', 'course', 'chapter', 'a').url()])
+
+    def test_no_course(self):
+        assert_equals({}, metadata_inheritance_tree([self.record('chapter', 'a', [], {})]))
+
+
+class TestIncrementalInheritanceTree(object):
+    """
+    Tests that writes update the cached inheritance tree and course structure incrementally
+    """
+    def setUp(self):
+        self.store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': 'incremental_%s' % uuid4().hex[:5]},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=DictCache(),
+        )
+        self.course = self.location('course', 'run')
+        self.insert(self.course, ['chapter/a', 'chapter/b'], {'start': '2014-01-01T00:00:00Z'})
+        self.insert(self.location('chapter', 'a'), ['sequential/s'], {})
+        self.insert(self.location('chapter', 'b'), [], {'graded': True})
+        self.insert(self.location('sequential', 's'), ['problem/p'], {})
+        self.insert(self.location('problem', 'p'), [], {})
+        self.insert(self.location('problem', 'q'), [], {})
+        self.store.refresh_cached_metadata_inheritance_tree(self.course)
+
+    def tearDown(self):
+        self.store.collection.drop()
+
+    def location(self, category, name):
+        """Return the location of a block in the test course"""
+        return Location('i4x', 'org', 'course', category, name)
+
+    def insert(self, location, children, metadata):
+        """Insert a block's record"""
+        self.store.collection.insert({
+            '_id': location.dict(),
+            'metadata': metadata,
+            'definition': {'data': {}, 'children': [self.location(*child.split('/')).url() for child in children]},
+        })
+
+    def inherited(self, category, name):
+        """Return the metadata a block inherits, from the cached tree"""
+        return self.store.get_cached_metadata_inheritance_tree(self.course)[self.location(category, name).url()]
+
+    def assert_incremental(self, write, *args):
+        """Make a write, checking that it updates the cached tree without recomputing it"""
+        with patch.object(self.store, 'refresh_cached_metadata_inheritance_tree') as refresh:
+            write(*args)
+        assert_false(refresh.called)
+        assert_equals([], self.store.check_cached_metadata_inheritance_tree(self.course))
+
+    def test_metadata_change_updates_subtree(self):
+        self.assert_incremental(self.store.update_metadata, self.location('chapter', 'a'), {'graded': True})
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, self.inherited('problem', 'p'))
+
+        self.assert_incremental(self.store.update_metadata, self.course, {'start': '2015-01-01T00:00:00Z'})
+        assert_equals({'start': '2015-01-01T00:00:00Z', 'graded': True}, self.inherited('problem', 'p'))
+
+    def test_added_children_inherit(self):
+        self.assert_incremental(
+            self.store.update_children, self.location('chapter', 'b'), [self.location('problem', 'q')]
+        )
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, self.inherited('problem', 'q'))
+        assert_equals(
+            [self.location('chapter', 'b')],
+            [Location(parent) for parent in self.store.get_parent_locations(self.location('problem', 'q'), None)]
+        )
+
+    def test_removed_children_recompute(self):
+        self.store.update_children(self.location('chapter', 'a'), [])
+        assert_equals([], self.store.check_cached_metadata_inheritance_tree(self.course))
+        assert_not_in(self.location('problem', 'p').url(), self.store.get_cached_metadata_inheritance_tree(self.course))
+
+    def test_check(self):
+        self.store.collection.update(
+            {'_id': self.location('chapter', 'b').dict()}, {'$set': {'metadata': {'graded': False}}}
+        )
+        assert_equals([self.location('chapter', 'b').url()], self.store.check_cached_metadata_inheritance_tree(self.course))
+
+    def test_draft_metadata_collated(self):
+        self.insert(self.location('chapter', 'a').replace(revision='draft'), ['sequential/s'], {'graded': True})
+        self.store.refresh_cached_metadata_inheritance_tree(self.course)
+        self.assert_incremental(self.store.update_metadata, self.location('chapter', 'a'), {'graded': False})
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, self.inherited('problem', 'p'))
+
+        # the draft's metadata wins whichever order the records come in
+        records = list(self.store.collection.find({'_id.category': {'$in': ['course', 'chapter']}}))
+        for ordered in (records, list(reversed(records))):
+            blocks = {}
+            parents = {}
+            for record in ordered:
+                add_to_course_structure(blocks, parents, record)
+            assert_equals({'graded': True}, blocks[self.location('chapter', 'a').url()]['metadata'])
+            assert_equals(
+                {'start': '2014-01-01T00:00:00Z', 'graded': True},
+                metadata_inheritance_tree(ordered)[self.location('chapter', 'a').url()]
+            )
+
+    def test_concurrent_write_drops_cached_tree(self):
+        cache = self.store.metadata_inheritance_cache_subsystem
+        # another write holds the course's lock
+        cache.add(inheritance_tree_lock_cache_key(self.course), True)
+        self.store.update_metadata(self.location('chapter', 'a'), {'graded': True})
+        assert_not_in(metadata_cache_key(self.course), cache.data)
+        assert_not_in(course_structure_cache_key(self.course), cache.data)
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, self.inherited('problem', 'p'))
+        assert_equals([], self.store.check_cached_metadata_inheritance_tree(self.course))
+
+    def test_contended_write_drops_cached_tree(self):
+        cache = self.store.metadata_inheritance_cache_subsystem
+        # another write came in while this one held the lock
+        cache.set(inheritance_tree_contended_cache_key(self.course), True)
+        self.store.update_metadata(self.location('chapter', 'a'), {'graded': True})
+        assert_not_in(metadata_cache_key(self.course), cache.data)
+        assert_not_in(inheritance_tree_contended_cache_key(self.course), cache.data)
+        assert_not_in(inheritance_tree_lock_cache_key(self.course), cache.data)
+        assert_equals({'start': '2014-01-01T00:00:00Z', 'graded': True}, self.inherited('problem', 'p'))
+
 
 class TestMongoKeyValueStore(object):
     """
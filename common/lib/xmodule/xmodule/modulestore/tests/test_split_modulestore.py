@@ -8,6 +8,7 @@ import subprocess
 import unittest
 import uuid
 from importlib import import_module
+from mock import Mock, patch
 
 from xblock.fields import Scope
 from xmodule.course_module import CourseDescriptor
@@ -15,6 +16,7 @@ from xmodule.modulestore.exceptions import InsufficientSpecificationError, ItemN
     DuplicateItemError
 from xmodule.modulestore.locator import CourseLocator, BlockUsageLocator, VersionTree, DefinitionLocator
 from xmodule.modulestore.inheritance import InheritanceMixin
+from xmodule.modulestore.split_mongo.definition_lazy_loader import DefinitionBatch, DefinitionLazyLoader
 from xmodule.x_module import XModuleMixin
 from pytz import UTC
 from path import path
@@ -1124,6 +1126,53 @@ class TestInheritance(SplitModuleTest):
         self.assertEqual(node.graceperiod, datetime.timedelta(hours=4))
 
 
+class TestDefinitionLoading(SplitModuleTest):
+    """
+    Test the batched loading of lazily loaded definitions
+    """
+    def test_batched_fetch(self):
+        store = Mock()
+        store.find_definitions.side_effect = lambda ids: [{'_id': def_id} for def_id in ids if def_id != 'missing']
+        batch = DefinitionBatch(store, 2)
+        loaders = [DefinitionLazyLoader(store, def_id, batch) for def_id in ('a', 'b', 'missing')]
+
+        self.assertEqual(loaders[1].fetch(), {'_id': 'b'})
+        store.find_definitions.assert_called_once_with(['b', 'a'])
+        self.assertEqual(loaders[0].fetch(), {'_id': 'a'})
+        self.assertEqual(store.find_definitions.call_count, 1)
+        self.assertIsNone(loaders[2].fetch())
+        self.assertEqual(store.find_definitions.call_count, 2)
+        self.assertFalse(store.get_definition.called)
+
+    def test_one_query_per_system(self):
+        modulestore()._clear_cache()
+        locator = BlockUsageLocator(package_id='GreekHero', block_id='head12345', branch='draft')
+        # don't let definitions cached by other tests hide the queries
+        with patch.object(modulestore(), 'definition_cache', None):
+            before = modulestore().definition_query_count()
+            course = modulestore().get_item(locator, depth=None)
+            for chapter in course.get_children():
+                chapter.get_explicitly_set_fields_by_scope(Scope.content)
+                for child in chapter.get_children():
+                    child.get_explicitly_set_fields_by_scope(Scope.content)
+            self.assertEqual(modulestore().definition_query_count() - before, 1)
+
+    def test_document_cache(self):
+        store = modulestore()
+        locator = CourseLocator(version_guid=self.GUID_D1)
+        store.structure_cache.delete(locator.as_object_id(self.GUID_D1))
+        misses = store.structure_cache.misses
+        hits = store.structure_cache.hits
+
+        first = store._lookup_course(locator)['structure']
+        self.assertEqual(store.structure_cache.misses, misses + 1)
+        first['blocks'].clear()
+        second = store._lookup_course(locator)['structure']
+        self.assertEqual(store.structure_cache.hits, hits + 1)
+        # each fetch gets its own copy
+        self.assertNotEqual(second['blocks'], {})
+
+
 class TestPublish(SplitModuleTest):
     """
     Test the publishing api
@@ -21,6 +21,26 @@ log = logging.getLogger(__name__)
 class_priority = ['video', 'problem']
 
 
+def _priority_icon_class(child_classes):
+    """
+    Return the icon class of a container whose children have child_classes
+    """
+    child_classes = set(child_classes)
+    new_class = 'other'
+    for c in class_priority:
+        if c in child_classes:
+            new_class = c
+    return new_class
+
+
+def _descriptor_icon_class(descriptor):
+    """
+    Return the icon class of the module of descriptor, without loading the
+    module (so ignoring any module whose icon class depends on its data)
+    """
+    return getattr(getattr(descriptor, 'module_class', descriptor), 'icon_class', 'other')
+
+
 class SequenceFields(object):
     has_children = True
 
@@ -70,6 +90,20 @@ class SequenceModule(SequenceFields, XModule):
         if dispatch == 'goto_position':
             self.position = int(data['position'])
             return json.dumps({'success': True})
+        elif dispatch == 'render_unit':
+            # render a unit that student_view left out (see `sequence_prefetch_units`)
+            items = self.get_display_items()
+            position = int(data['position'])
+            if not 1 <= position <= len(items):
+                raise NotFoundError('Invalid position {0}'.format(position))
+            rendered_child, childinfo = self._render_unit(items[position - 1], None)
+            return json.dumps({
+                'success': True,
+                'content': childinfo['content'],
+                'resources': rendered_child.head_html() + rendered_child.foot_html(),
+                'title': childinfo['title'],
+                'progress_status': childinfo['progress_status'],
+            })
         raise NotFoundError('Unexpected dispatch type')
 
     def student_view(self, context):
@@ -83,31 +117,24 @@ class SequenceModule(SequenceFields, XModule):
 
         fragment = Fragment()
 
-        for child in self.get_display_items():
-            progress = child.get_progress()
-            rendered_child = child.render('student_view', context)
-            fragment.add_frag_resources(rendered_child)
-
-            childinfo = {
-                'content': rendered_child.content,
-                'title': "\n".join(
-                    grand_child.display_name
-                    for grand_child in child.get_children()
-                    if grand_child.display_name is not None
-                ),
-                'progress_status': Progress.to_js_status_str(progress),
-                'progress_detail': Progress.to_js_detail_str(progress),
-                'type': child.get_icon_class(),
-                'id': child.id,
-            }
-            if childinfo['title'] == '':
-                childinfo['title'] = child.display_name_with_default
+        # If the runtime sets sequence_prefetch_units, only the units that many
+        # positions or fewer from the current one are rendered; the others are
+        # rendered by the 'render_unit' ajax dispatch when they are shown.
+        prefetch_units = getattr(self.system, 'sequence_prefetch_units', None)
+
+        for index, child in enumerate(self.get_display_items()):
+            if prefetch_units is None or abs(index + 1 - self.position) <= prefetch_units:
+                rendered_child, childinfo = self._render_unit(child, context)
+                fragment.add_frag_resources(rendered_child)
+            else:
+                childinfo = self._unrendered_unit_info(child)
             contents.append(childinfo)
 
         params = {'items': contents,
                   'element_id': self.location.html_id(),
                   'item_id': self.id,
                   'position': self.position,
+                  'prefetch_units': prefetch_units or 0,
                   'tag': self.location.category,
                   'ajax_url': self.system.ajax_url,
                   }
@@ -116,14 +143,61 @@ class SequenceModule(SequenceFields, XModule):
 
         return fragment
 
+    def _render_unit(self, child, context):
+        """
+        Render the unit child, returning its fragment and its info for the
+        sequence's template.
+
+        If the runtime sets cache_descendent_state, it is first called with the
+        unit's descriptor, so that the state of the unit's descendents can be
+        loaded before they are.
+        """
+        cache_descendent_state = getattr(self.system, 'cache_descendent_state', None)
+        if cache_descendent_state is not None:
+            cache_descendent_state(getattr(child, 'descriptor', child))
+
+        progress = child.get_progress()
+        rendered_child = child.render('student_view', context)
+
+        childinfo = {
+            'content': rendered_child.content,
+            'title': "\n".join(
+                grand_child.display_name
+                for grand_child in child.get_children()
+                if grand_child.display_name is not None
+            ),
+            'progress_status': Progress.to_js_status_str(progress),
+            'progress_detail': Progress.to_js_detail_str(progress),
+            'type': child.get_icon_class(),
+            'id': child.id,
+        }
+        if childinfo['title'] == '':
+            childinfo['title'] = child.display_name_with_default
+        return rendered_child, childinfo
+
+    def _unrendered_unit_info(self, child):
+        """
+        Return the info for the sequence's template of a unit that isn't
+        rendered, found without loading the unit's children: its title is its
+        own display name, its type is found from its children's descriptors,
+        and its progress is unknown until it is rendered.
+        """
+        child_descriptors = getattr(child, 'descriptor', child).get_children()
+        if child_descriptors:
+            icon_class = _priority_icon_class(_descriptor_icon_class(descriptor) for descriptor in child_descriptors)
+        else:
+            icon_class = child.get_icon_class()
+        return {
+            'content': None,
+            'title': child.display_name_with_default,
+            'progress_status': Progress.to_js_status_str(None),
+            'progress_detail': Progress.to_js_detail_str(None),
+            'type': icon_class,
+            'id': child.id,
+        }
+
     def get_icon_class(self):
-        child_classes = set(child.get_icon_class()
-                            for child in self.get_children())
-        new_class = 'other'
-        for c in class_priority:
-            if c in child_classes:
-                new_class = c
-        return new_class
+        return _priority_icon_class(child.get_icon_class() for child in self.get_children())
 
 
 class SequenceDescriptor(SequenceFields, MakoModuleDescriptor, XmlDescriptor):
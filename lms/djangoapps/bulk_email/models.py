@@ -12,6 +12,10 @@ file and check it in at the same time as your model changes. To do that,
 
 """
 import logging
+import re
+from string import Formatter
+from uuid import uuid4
+
 from django.db import models, transaction
 from django.contrib.auth.models import User
 from html_to_text import html_to_text
@@ -136,6 +140,9 @@ class Optout(models.Model):
 # the location where the email message body is to be inserted.
 COURSE_EMAIL_MESSAGE_BODY_TAG = '{{message_body}}'
 
+# Fields of the context used to render course emails that differ from recipient to recipient.
+COURSE_EMAIL_RECIPIENT_FIELDS = ('name', 'email')
+
 
 class CourseEmailTemplate(models.Model):
     """
@@ -195,6 +202,50 @@ class CourseEmailTemplate(models.Model):
         # finally, return the result, without converting to an encoded byte array.
         return result
 
+    @staticmethod
+    def _prepare(format_string, message_body, context):
+        """
+        Render a message for many recipients at once.
+
+        Returns a function that, given a context that differs from `context` only in the
+        recipient-specific fields (COURSE_EMAIL_RECIPIENT_FIELDS), returns the same output
+        as `_render` would for it.
+
+        The template is rendered once, with unique markers in place of the recipient fields,
+        and the result is split around the markers, so that each recipient's message just joins
+        strings.  Templates that format the recipient fields (e.g. "{name:>20}") can't be
+        split this way, and are rendered in full for each recipient.
+        """
+        for _literal, field_name, format_spec, conversion in Formatter().parse(format_string):
+            if field_name is None:
+                continue
+            field_root = re.split(r'[.\[]', field_name, 1)[0]
+            if field_root in COURSE_EMAIL_RECIPIENT_FIELDS and (field_name != field_root or format_spec or conversion):
+                return lambda recipient_context: CourseEmailTemplate._render(format_string, message_body, recipient_context)
+
+        marker_id = uuid4().hex
+        markers = dict(
+            (u'\x00{}:{}\x00'.format(marker_id, field), field) for field in COURSE_EMAIL_RECIPIENT_FIELDS
+        )
+        marked_context = dict(context)
+        marked_context.update((field, marker) for marker, field in markers.iteritems())
+        rendered = CourseEmailTemplate._render(format_string, message_body, marked_context)
+
+        # parts alternate between static text and markers:
+        parts = re.split(u'({})'.format(u'|'.join(re.escape(marker) for marker in markers)), rendered)
+        recipient_fields = [(index, markers[parts[index]]) for index in xrange(1, len(parts), 2)]
+
+        def render(recipient_context):
+            """
+            Return the message for the recipient described by recipient_context
+            """
+            message_parts = list(parts)
+            for index, field in recipient_fields:
+                message_parts[index] = unicode(recipient_context[field])
+            return u''.join(message_parts)
+
+        return render
+
     def render_plaintext(self, plaintext, context):
         """
         Create plain text message.
@@ -213,6 +264,24 @@ class CourseEmailTemplate(models.Model):
         """
         return CourseEmailTemplate._render(self.html_template, htmltext, context)
 
+    def prepare_plaintext(self, plaintext, context):
+        """
+        Prepare plain text messages for many recipients.
+
+        Like `render_plaintext`, but returns a function that, given a recipient's context,
+        returns their message.  See `_prepare`.
+        """
+        return CourseEmailTemplate._prepare(self.plain_template, plaintext, context)
+
+    def prepare_htmltext(self, htmltext, context):
+        """
+        Prepare HTML text messages for many recipients.
+
+        Like `render_htmltext`, but returns a function that, given a recipient's context,
+        returns their message.  See `_prepare`.
+        """
+        return CourseEmailTemplate._prepare(self.html_template, htmltext, context)
+
 
 class CourseAuthorization(models.Model):
     """
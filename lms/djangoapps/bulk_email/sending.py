@@ -0,0 +1,145 @@
+"""
+Helpers for sending the messages of bulk email tasks: a pool of mail connections kept
+open between tasks, and the pacing of sends according to the mail server's throttling.
+"""
+import threading
+from time import sleep, time
+
+from django.core.mail import EmailMultiAlternatives
+
+from celery.utils.log import get_task_logger
+
+log = get_task_logger(__name__)
+
+
+class CourseEmailMessage(EmailMultiAlternatives):
+    """
+    An email message that records whether a mail backend has built it for sending.
+
+    Backends send the messages passed to `send_messages` in order, building each just
+    before sending it, so when `send_messages` fails the last message built is the one
+    that failed, and those before it were sent.
+    """
+    built = False
+
+    def message(self):
+        self.built = True
+        return super(CourseEmailMessage, self).message()
+
+
+def num_sent_before_failure(messages):
+    """
+    Return how many of the CourseEmailMessages passed to a failed `send_messages` call were sent.
+    """
+    num_sent = 0
+    for index, message in enumerate(messages):
+        if message.built:
+            num_sent = index
+    return num_sent
+
+
+class EmailConnectionPool(object):
+    """
+    Keeps a worker's mail connection open between bulk email tasks, so that each task
+    doesn't have to connect, negotiate TLS and authenticate again.
+
+    A connection is only handed out again if it was released less than `max_idle` seconds
+    ago (mail servers drop idle clients), and was made by the same connection factory.
+    The server may still have dropped it in the meantime, in which case the caller should
+    `reconnect` and send again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = None
+
+    def acquire(self, connection_factory, max_idle):
+        """
+        Return a tuple of an open connection and whether it was reused: the pooled
+        connection, if it can be reused, or else a new one.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, None
+
+        if idle is not None:
+            factory, connection, released_at = idle
+            if factory is connection_factory and time() - released_at < max_idle:
+                return connection, True
+            self._close(connection)
+
+        return self._open(connection_factory), False
+
+    def reconnect(self, connection_factory, connection):
+        """
+        Close connection (e.g. a reused one that the server has dropped), and return a new one
+        """
+        self._close(connection)
+        return self._open(connection_factory)
+
+    def release(self, connection_factory, connection, max_idle, reusable=True):
+        """
+        Return connection to the pool, or close it if it shouldn't be reused (e.g. after an error)
+        """
+        if not reusable or max_idle <= 0:
+            self._close(connection)
+            return
+
+        with self._lock:
+            previous, self._idle = self._idle, (connection_factory, connection, time())
+        if previous is not None:
+            self._close(previous[1])
+
+    def _open(self, connection_factory):
+        """
+        Return a new, open connection
+        """
+        connection = connection_factory()
+        connection.open()
+        return connection
+
+    def _close(self, connection):
+        """
+        Close connection, which may well have been dropped by the server already
+        """
+        try:
+            connection.close()
+        except Exception:  # pylint: disable=broad-except
+            log.warning("Failed to close pooled email connection", exc_info=True)
+
+
+class SendRateLimiter(object):
+    """
+    Paces the sends of a bulk email task according to the mail server's throttling responses.
+
+    Sends aren't delayed until the server throttles them.  Each throttling response doubles
+    the delay between sends (starting from `initial_delay`), and each successful send shortens
+    it by `initial_delay` again.  A task that has been retried because of throttling starts
+    out at `initial_delay`.
+    """
+    def __init__(self, initial_delay, max_delay, throttled=False):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.delay = initial_delay if throttled else 0
+
+    def wait(self):
+        """
+        Sleep for the current delay between sends
+        """
+        if self.delay > 0:
+            sleep(self.delay)
+
+    def succeeded(self):
+        """
+        Record a successful send
+        """
+        self.delay = max(self.delay - self.initial_delay, 0)
+
+    def throttled(self):
+        """
+        Record a throttling response.  Returns whether to try again after the (longer) delay;
+        if not, the server is throttling too hard, and the task should be retried later.
+        """
+        delay = max(self.delay * 2, self.initial_delay)
+        if delay <= 0 or delay > self.max_delay:
+            return False
+        self.delay = delay
+        return True
@@ -5,7 +5,6 @@ to a course.
 import re
 import random
 import json
-from time import sleep
 
 from dogapi import dog_stats_api
 from smtplib import SMTPServerDisconnected, SMTPDataError, SMTPConnectError, SMTPException
@@ -29,13 +28,19 @@ from celery.exceptions import RetryTaskError
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail import get_connection
 from django.core.urlresolvers import reverse
 
 from bulk_email.models import (
     CourseEmail, Optout, CourseEmailTemplate,
     SEND_TO_MYSELF, SEND_TO_ALL, TO_OPTIONS,
 )
+from bulk_email.sending import (
+    CourseEmailMessage,
+    EmailConnectionPool,
+    SendRateLimiter,
+    num_sent_before_failure,
+)
 from courseware.courses import get_course, course_image_url
 from student.roles import CourseStaffRole, CourseInstructorRole
 from instructor_task.models import InstructorTask
@@ -48,6 +53,9 @@ from instructor_task.subtasks import (
 
 log = get_task_logger(__name__)
 
+# The mail connection kept open between the email tasks run by this worker.
+CONNECTION_POOL = EmailConnectionPool()
+
 
 # Errors that an individual email is failing to be sent, and should just
 # be treated as a fail.
@@ -432,82 +440,106 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
     from_addr = _get_source_address(course_email.course_id, course_title)
 
     course_email_template = CourseEmailTemplate.get_template()
+    connection = None
+    connection_reusable = False
     try:
-        connection = get_connection()
-        connection.open()
+        # A connection reused from an earlier task may have been dropped by the server
+        # since; that is only found out when sending on it.
+        connection, connection_reused = CONNECTION_POOL.acquire(get_connection, settings.BULK_EMAIL_CONNECTION_MAX_IDLE)
 
         # Define context values to use in all course emails:
         email_context = {'name': '', 'email': ''}
         email_context.update(global_email_context)
 
-        while to_list:
-            # Update context with user-specific values from the user at the end of the list.
-            # At the end of processing this user, they will be popped off of the to_list.
-            # That way, the to_list will always contain the recipients remaining to be emailed.
-            # This is convenient for retries, which will need to send to those who haven't
-            # yet been emailed, but not send to those who have already been sent to.
-            current_recipient = to_list[-1]
-            email = current_recipient['email']
-            email_context['email'] = email
-            email_context['name'] = current_recipient['profile__name']
-
-            # Construct message content using templates and context:
-            plaintext_msg = course_email_template.render_plaintext(course_email.text_message, email_context)
-            html_msg = course_email_template.render_htmltext(course_email.html_message, email_context)
-
-            # Create email:
-            email_msg = EmailMultiAlternatives(
-                subject,
-                plaintext_msg,
-                from_addr,
-                [email],
-                connection=connection
-            )
-            email_msg.attach_alternative(html_msg, 'text/html')
+        # Render the parts of the messages that are the same for all recipients just once:
+        render_plaintext = course_email_template.prepare_plaintext(course_email.text_message, email_context)
+        render_htmltext = course_email_template.prepare_htmltext(course_email.html_message, email_context)
 
-            # Throttle if we have gotten the rate limiter.  This is not very high-tech,
-            # but if a task has been retried for rate-limiting reasons, then we sleep
-            # for a period of time between all emails within this task.  Choice of
-            # the value depends on the number of workers that might be sending email in
-            # parallel, and what the SES throttle rate is.
-            if subtask_status.retried_nomax > 0:
-                sleep(settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
-
-            try:
-                log.debug('Email with id %s to be sent to %s', email_id, email)
+        # Sends are only delayed once the mail server starts throttling them.  If this task
+        # has been retried for rate-limiting reasons, then it starts out slowly.
+        rate_limiter = SendRateLimiter(
+            settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS,
+            settings.BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS,
+            throttled=subtask_status.retried_nomax > 0,
+        )
 
-                with dog_stats_api.timer('course_email.single_send.time.overall', tags=[_statsd_tag(course_title)]):
-                    connection.send_messages([email_msg])
+        while to_list:
+            # Send to a batch of the users at the end of the list.  As they are processed,
+            # they will be popped off of the to_list.  That way, the to_list will always
+            # contain the recipients remaining to be emailed.  This is convenient for retries,
+            # which will need to send to those who haven't yet been emailed, but not send to
+            # those who have already been sent to.
+            recipients = list(reversed(to_list[-settings.BULK_EMAIL_MESSAGES_PER_SEND:]))
+            email_msgs = []
+            for recipient in recipients:
+                # Update context with user-specific values:
+                email_context['email'] = recipient['email']
+                email_context['name'] = recipient['profile__name']
+
+                # Create email:
+                email_msg = CourseEmailMessage(
+                    subject,
+                    render_plaintext(email_context),
+                    from_addr,
+                    [recipient['email']],
+                    connection=connection
+                )
+                email_msg.attach_alternative(render_htmltext(email_context), 'text/html')
+                email_msgs.append(email_msg)
+
+            rate_limiter.wait()
 
-            except SMTPDataError as exc:
-                # According to SMTP spec, we'll retry error codes in the 4xx range.  5xx range indicates hard failure.
-                if exc.smtp_code >= 400 and exc.smtp_code < 500:
-                    # This will cause the outer handler to catch the exception and retry the entire task.
-                    raise exc
-                else:
+            try:
+                log.debug('Email with id %s to be sent to %s', email_id, [recipient['email'] for recipient in recipients])
+
+                with dog_stats_api.timer('course_email.batch_send.time.overall', tags=[_statsd_tag(course_title)]):
+                    connection.send_messages(email_msgs)
+
+            except Exception as exc:
+                num_sent = num_sent_before_failure(email_msgs)
+                if connection_reused and num_sent == 0 and isinstance(exc, SMTPServerDisconnected):
+                    # The server dropped the connection while it was pooled.  Send the
+                    # batch again on a new connection, just once (the new connection isn't
+                    # reused), rather than spending one of the task's retries on it.
+                    log.info('Task %s: reused email connection was disconnected (%s), reconnecting', task_id, exc)
+                    connection = CONNECTION_POOL.reconnect(get_connection, connection)
+                    connection_reused = False
+                    continue
+                # Otherwise the server did answer on this connection.
+                connection_reused = False
+
+                # The messages before the one that failed were sent.  Pop those users off
+                # the list, but only pop the user whose message failed once they have been
+                # processed.  (That way, if there were a failure that needed to be retried,
+                # the user is still on the list.)
+                _record_sent_emails(email_id, recipients[:num_sent], course_title, subtask_status)
+                del to_list[len(to_list) - num_sent:]
+                email = recipients[num_sent]['email']
+
+                if _is_throttling_error(exc):
+                    dog_stats_api.increment('course_email.throttled', tags=[_statsd_tag(course_title)])
+                    if not rate_limiter.throttled():
+                        # This will cause the outer handler to catch the exception and retry the entire task.
+                        raise exc
+                    log.info('Task %s: email with id %s to %s throttled due to error %s, sending every %s seconds',
+                             task_id, email_id, email, exc, rate_limiter.delay)
+
+                elif isinstance(exc, SMTPDataError) or isinstance(exc, SINGLE_EMAIL_FAILURE_ERRORS):
+                    # According to SMTP spec, 5xx range indicates hard failure.
                     # This will fall through and not retry the message.
-                    log.warning('Task %s: email with id %s not delivered to %s due to error %s', task_id, email_id, email, exc.smtp_error)
+                    log.warning('Task %s: email with id %s not delivered to %s due to error %s', task_id, email_id, email, exc)
                     dog_stats_api.increment('course_email.error', tags=[_statsd_tag(course_title)])
                     subtask_status.increment(failed=1)
+                    to_list.pop()
 
-            except SINGLE_EMAIL_FAILURE_ERRORS as exc:
-                # This will fall through and not retry the message.
-                log.warning('Task %s: email with id %s not delivered to %s due to error %s', task_id, email_id, email, exc)
-                dog_stats_api.increment('course_email.error', tags=[_statsd_tag(course_title)])
-                subtask_status.increment(failed=1)
-
-            else:
-                dog_stats_api.increment('course_email.sent', tags=[_statsd_tag(course_title)])
-                if settings.BULK_EMAIL_LOG_SENT_EMAILS:
-                    log.info('Email with id %s sent to %s', email_id, email)
                 else:
-                    log.debug('Email with id %s sent to %s', email_id, email)
-                subtask_status.increment(succeeded=1)
+                    raise exc
 
-            # Pop the user that was emailed off the end of the list only once they have
-            # successfully been processed.  (That way, if there were a failure that
-            # needed to be retried, the user is still on the list.)
-            to_list.pop()
+            else:
+                connection_reused = False
+                rate_limiter.succeeded()
+                _record_sent_emails(email_id, recipients, course_title, subtask_status)
+                del to_list[len(to_list) - len(recipients):]
 
     except INFINITE_RETRY_ERRORS as exc:
         dog_stats_api.increment('course_email.infinite_retry', tags=[_statsd_tag(course_title)])
@@ -559,11 +591,42 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # All went well.  Update counters with progress to date,
         # and set the state to SUCCESS:
         subtask_status.increment(state=SUCCESS)
+        # The connection can be used by the next task:
+        connection_reusable = True
         # Successful completion is marked by an exception value of None.
         return subtask_status, None
     finally:
         # Clean up at the end.
-        connection.close()
+        if connection is not None:
+            CONNECTION_POOL.release(
+                get_connection, connection, settings.BULK_EMAIL_CONNECTION_MAX_IDLE, reusable=connection_reusable
+            )
+
+
+def _is_throttling_error(exc):
+    """
+    Return whether exc means that email is being sent too quickly, and may succeed if sent more slowly.
+
+    According to SMTP spec, we'll retry SMTPDataErrors in the 4xx range.
+    """
+    if isinstance(exc, SMTPDataError):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, INFINITE_RETRY_ERRORS)
+
+
+def _record_sent_emails(email_id, recipients, course_title, subtask_status):
+    """
+    Count the email with id email_id as sent to recipients.
+    """
+    if not recipients:
+        return
+    dog_stats_api.increment('course_email.sent', len(recipients), tags=[_statsd_tag(course_title)])
+    for recipient in recipients:
+        if settings.BULK_EMAIL_LOG_SENT_EMAILS:
+            log.info('Email with id %s sent to %s', email_id, recipient['email'])
+        else:
+            log.debug('Email with id %s sent to %s', email_id, recipient['email'])
+    subtask_status.increment(succeeded=len(recipients))
 
 
 def _get_current_task():
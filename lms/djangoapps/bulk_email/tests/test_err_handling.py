@@ -37,7 +37,11 @@ class EmailTestException(Exception):
     pass
 
 
-@override_settings(MODULESTORE=TEST_DATA_MONGO_MODULESTORE)
+@override_settings(
+    MODULESTORE=TEST_DATA_MONGO_MODULESTORE,
+    BULK_EMAIL_MESSAGES_PER_SEND=1,
+    BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS=0,
+)
 class TestEmailErrors(ModuleStoreTestCase):
     """
     Test that errors from sending email are handled properly.
@@ -103,6 +103,25 @@ class CourseEmailTemplateTest(TestCase):
         context = self._get_sample_plain_context()
         template.render_plaintext("My new plain text.", context)
 
+    def test_prepare_plain_and_html(self):
+        template = CourseEmailTemplate.get_template()
+        context = self._get_sample_html_context()
+        context['name'] = ''
+        render_plaintext = template.prepare_plaintext("My new plain text.", context)
+        render_htmltext = template.prepare_htmltext("My new html text.", context)
+        for name, email in [(u'Me', 'me@test.com'), (u'{email} {0}', 'braces@test.com'), (u'\u00e9\u00e9', 'e@test.com')]:
+            context['name'] = name
+            context['email'] = email
+            self.assertEquals(render_plaintext(context), template.render_plaintext("My new plain text.", context))
+            self.assertEquals(render_htmltext(context), template.render_htmltext("My new html text.", context))
+
+    def test_prepare_formatted_recipient_fields(self):
+        template = CourseEmailTemplate(plain_template=u"Dear {name:>8},\n{{message_body}}\nSent to {email!r}")
+        context = {'name': '', 'email': ''}
+        render_plaintext = template.prepare_plaintext("My new plain text.", context)
+        context = {'name': u'Me', 'email': u'me@test.com'}
+        self.assertEquals(render_plaintext(context), template.render_plaintext("My new plain text.", context))
+        self.assertEquals(render_plaintext(context), u"Dear       Me,\nMy new plain text.\nSent to u'me@test.com'")
 
 class CourseAuthorizationTest(TestCase):
     """Test the CourseAuthorization model."""
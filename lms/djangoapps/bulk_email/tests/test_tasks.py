@@ -27,6 +27,7 @@ from celery.states import SUCCESS, FAILURE
 
 from django.conf import settings
 from django.core.management import call_command
+from django.test.utils import override_settings
 
 from bulk_email.models import CourseEmail, Optout, SEND_TO_ALL
 
@@ -70,6 +71,7 @@ def my_update_subtask_status(entry_id, current_task_id, new_subtask_status):
         update_subtask_status(entry_id, current_task_id, new_subtask_status)
 
 
+@override_settings(BULK_EMAIL_MESSAGES_PER_SEND=1, BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS=0)
 class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
     """Tests instructor task that send bulk email."""
 
@@ -211,6 +213,25 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
         self.assertEquals(parent_status.get('succeeded'), num_emails)
         self.assertEquals(parent_status.get('failed'), 0)
 
+    def test_reused_connection_disconnected(self):
+        # Select number of emails to fit into a single subtask.
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self.assertEquals(get_conn.call_count, 1)
+
+            # The second task reuses the connection, which the server has dropped in
+            # the meantime: the batch is sent again on a new connection, without a retry.
+            get_conn.return_value.send_messages.side_effect = chain(
+                [SMTPServerDisconnected("Connection unexpectedly closed")], cycle([None])
+            )
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+        self.assertEquals(get_conn.call_count, 2)
+        self.assertTrue(get_conn.return_value.close.called)
+
     def test_unactivated_user(self):
         # Select number of emails to fit into a single subtask.
         num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
@@ -239,6 +260,66 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
             get_conn.return_value.send_messages.side_effect = cycle([None])
             self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, expected_succeeds, skipped=expected_skipped)
 
+    @override_settings(BULK_EMAIL_MESSAGES_PER_SEND=10)
+    def test_batched_sends(self):
+        # Select number of emails to fit into a single subtask.
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+        self.assertEquals(get_conn.return_value.send_messages.call_count, num_emails / 10)
+
+    @override_settings(BULK_EMAIL_MESSAGES_PER_SEND=10)
+    def test_batched_send_failure(self):
+        # Select number of emails to fit into a single subtask.
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor:
+        students = self._create_students(num_emails - 1)
+        bad_email = students[15].email
+        sent = []
+
+        def send_messages(messages):
+            """Send messages in order, as mail backends do, failing to send to bad_email"""
+            for message in messages:
+                message.message()
+                if message.to == [bad_email]:
+                    raise SMTPDataError(554, "Email address is blacklisted")
+                sent.extend(message.to)
+
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = send_messages
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails - 1, failed=1)
+        # everyone else was sent the email exactly once:
+        self.assertEquals(len(sent), num_emails - 1)
+        self.assertEquals(len(set(sent)), num_emails - 1)
+        self.assertNotIn(bad_email, sent)
+
+    @override_settings(BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS=1)
+    def test_throttling_slows_sends(self):
+        num_emails = 8
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        exception = SMTPDataError(455, "Throttling: Sending rate exceeded")
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            # Throttle two sends in every five.
+            get_conn.return_value.send_messages.side_effect = cycle(chain(repeat(exception, 2), repeat(None, 3)))
+            with patch('bulk_email.sending.sleep') as mock_sleep:
+                # The task is not retried: the sends just slow down, and then speed up again.
+                self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+        delays = [args[0] for args, _kwargs in mock_sleep.call_args_list]
+        self.assertEquals(delays[:4], [0.02, 0.04, 0.02, 0.02])
+
+    def test_connection_reused_between_tasks(self):
+        self._create_students(3)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            self._test_run_with_task(send_bulk_course_email, 'emailed', 4, 4)
+            self._test_run_with_task(send_bulk_course_email, 'emailed', 4, 4)
+        self.assertEquals(get_conn.call_count, 1)
+        self.assertFalse(get_conn.return_value.close.called)
+
     def _test_email_address_failures(self, exception):
         """Test that celery handles bad address errors by failing and not retrying."""
         # Select number of emails to fit into a single subtask.
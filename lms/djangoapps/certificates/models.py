@@ -131,14 +131,39 @@ def certificate_status_for_student(student, course_id):
     try:
         generated_certificate = GeneratedCertificate.objects.get(
             user=student, course_id=course_id)
-        d = {'status': generated_certificate.status,
-             'mode': generated_certificate.mode}
-        if generated_certificate.grade:
-            d['grade'] = generated_certificate.grade
-        if generated_certificate.status == CertificateStatuses.downloadable:
-            d['download_url'] = generated_certificate.download_url
-
-        return d
+        return _certificate_status(generated_certificate)
     except GeneratedCertificate.DoesNotExist:
         pass
-    return {'status': CertificateStatuses.unavailable, 'mode': GeneratedCertificate.MODES.honor}
+    return _certificate_status(None)
+
+
+def certificate_statuses_for_student(student, course_ids):
+    '''
+    Returns a dictionary mapping each of course_ids to the dictionary that
+    certificate_status_for_student returns for the course, using a single query.
+    '''
+    generated_certificates = dict(
+        (generated_certificate.course_id, generated_certificate)
+        for generated_certificate in GeneratedCertificate.objects.filter(user=student, course_id__in=course_ids)
+    )
+    return dict(
+        (course_id, _certificate_status(generated_certificates.get(course_id)))
+        for course_id in course_ids
+    )
+
+
+def _certificate_status(generated_certificate):
+    '''
+    Returns the status dictionary of certificate_status_for_student for the
+    generated_certificate, or for a student without one if it is None.
+    '''
+    if generated_certificate is None:
+        return {'status': CertificateStatuses.unavailable, 'mode': GeneratedCertificate.MODES.honor}
+
+    d = {'status': generated_certificate.status,
+         'mode': generated_certificate.mode}
+    if generated_certificate.grade:
+        d['grade'] = generated_certificate.grade
+    if generated_certificate.status == CertificateStatuses.downloadable:
+        d['download_url'] = generated_certificate.download_url
+    return d
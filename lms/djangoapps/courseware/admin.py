@@ -2,7 +2,7 @@
 django admin pages for courseware model
 '''
 
-from courseware.models import StudentModule, OfflineComputedGrade, OfflineComputedGradeLog
+from courseware.models import StudentModule, OfflineComputedGrade, OfflineComputedGradeLog, PersistentCourseGrade
 from ratelimitbackend import admin
 from django.contrib.auth.models import User
 
@@ -11,3 +11,5 @@ admin.site.register(StudentModule)
 admin.site.register(OfflineComputedGrade)
 
 admin.site.register(OfflineComputedGradeLog)
+
+admin.site.register(PersistentCourseGrade)
@@ -1,29 +1,41 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 from collections import defaultdict
+import hashlib
 import json
 import random
 import logging
 
 from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
 from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.test.client import RequestFactory
+from django.utils.timezone import UTC
 
 from dogapi import dog_stats_api
 
 from courseware import courses
-from courseware.model_data import FieldDataCache
+from courseware.access import has_access
+from courseware.model_data import FieldDataCache, MultiUserFieldDataCache
 from xmodule import graders
+from xmodule.course_module import CourseDescriptor
 from xmodule.graders import Score
+from xmodule.modulestore import Location
 from xmodule.modulestore.django import modulestore
-from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.util.duedate import get_extended_due_date
-from .models import StudentModule
+from .models import StudentModule, StudentModuleAnswerCount, PersistentCourseGrade
 from .module_render import get_module_for_descriptor
 
 log = logging.getLogger("edx.courseware")
 
+# Number of students whose module state iterate_grades_for loads at once
+GRADING_BATCH_SIZE = 100
+
+# Number of StudentModules whose state answer_distributions loads at once
+ANSWER_DISTRIBUTION_CHUNK_SIZE = 1000
+
 
 def yield_dynamic_descriptor_descendents(descriptor, module_creator):
     """
@@ -76,45 +88,65 @@ def answer_distributions(course_id):
     generate the report.
 
     This method will try to use a read-replica database if one is available.
+    The StudentModules are read a chunk at a time (see
+    `iterate_submitted_problem_states`), so they needn't all fit in memory;
+    for large courses, use the instructor task which splits the work among
+    subtasks instead.
+
+    If FEATURES['ENABLE_ANSWER_DISTRIBUTION_COUNTS'] is set, the counts are
+    instead read from the course's StudentModuleAnswerCounts, which are kept
+    up to date as answers are submitted.
     """
-    # dict: { module.module_state_key : (url_name, display_name) }
-    state_keys_to_problem_info = {}  # For caching, used by url_and_display_name
-
-    def url_and_display_name(module_state_key):
-        """
-        For a given module_state_key, return the problem's url and display_name.
-        Handle modulestore access and caching. This method ignores permissions.
-        May throw an ItemNotFoundError if there is no content that corresponds
-        to this module_state_key.
-        """
-        problem_store = modulestore()
-        if module_state_key not in state_keys_to_problem_info:
-            problems = problem_store.get_items(module_state_key, course_id=course_id, depth=1)
-            if not problems:
-                # Likely means that the problem was deleted from the course
-                # after the student had answered. We log this suspicion where
-                # this exception is caught.
-                raise ItemNotFoundError(
-                    "Answer Distribution: Module {} not found for course {}"
-                    .format(module_state_key, course_id)
-                )
-            problem = problems[0]
-            problem_info = (problem.url_name, problem.display_name_with_default)
-            state_keys_to_problem_info[module_state_key] = problem_info
+    if settings.FEATURES.get('ENABLE_ANSWER_DISTRIBUTION_COUNTS'):
+        answer_counts = StudentModuleAnswerCount.answer_counts(course_id)
+    else:
+        answer_counts = count_answers(course_id, iterate_submitted_problem_states(course_id))
+    return name_answer_counts(course_id, answer_counts)
+
 
-        return state_keys_to_problem_info[module_state_key]
+def iterate_submitted_problem_states(course_id, student_module_ids=None, chunk_size=ANSWER_DISTRIBUTION_CHUNK_SIZE):
+    """
+    Yield a dict of the 'id', 'module_state_key', 'student_id' and 'state' of
+    each submitted problem StudentModule in the course (see
+    `StudentModule.all_submitted_problems_read_only`), or only of those with
+    the given ids.
+
+    The StudentModules are fetched in chunks of `chunk_size`, in order of id,
+    each chunk picking up after the last id of the one before, so that no
+    query has to skip over the rows already read.
+    """
+    submitted = StudentModule.all_submitted_problems_read_only(course_id)
+    if student_module_ids is not None:
+        submitted = submitted.filter(id__in=student_module_ids)
+    submitted = submitted.order_by('id').values('id', 'module_state_key', 'student_id', 'state')
+
+    last_id = None
+    while True:
+        chunk = submitted if last_id is None else submitted.filter(id__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        for module in chunk:
+            yield module
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]['id']
+
+
+def count_answers(course_id, modules):
+    """
+    Count the student answers in the state of each of `modules` (dicts as
+    yielded by `iterate_submitted_problem_states`), returning a dict mapping:
 
-    # Iterate through all problems submitted for this course in no particular
-    # order, and build up our answer_counts dict that we will eventually return
+      (problem module_state_key, problem_id) -> {dict: answer -> count}
+    """
     answer_counts = defaultdict(lambda: defaultdict(int))
-    for module in StudentModule.all_submitted_problems_read_only(course_id):
+    for module in modules:
         try:
-            state_dict = json.loads(module.state) if module.state else {}
+            state_dict = json.loads(module['state']) if module['state'] else {}
             raw_answers = state_dict.get("student_answers", {})
         except ValueError:
             log.error(
                 "Answer Distribution: Could not parse module state for " +
-                "StudentModule id={}, course={}".format(module.id, course_id)
+                "StudentModule id={}, course={}".format(module['id'], course_id)
             )
             continue
 
@@ -126,35 +158,225 @@ def answer_distributions(course_id):
             # unicode and not str -- state comes from the json decoder, and that
             # always returns unicode for strings.
             answer = unicode(raw_answer)
+            answer_counts[(module['module_state_key'], problem_part_id)][answer] += 1
 
-            try:
-                url, display_name = url_and_display_name(module.module_state_key)
-            except ItemNotFoundError:
-                msg = "Answer Distribution: Item {} referenced in StudentModule {} " + \
-                      "for user {} in course {} not found; " + \
-                      "This can happen if a student answered a question that " + \
-                      "was later deleted from the course. This answer will be " + \
-                      "omitted from the answer distribution CSV."
-                log.warning(
-                    msg.format(module.module_state_key, module.id, module.student_id, course_id)
-                )
-                continue
+    return answer_counts
 
-            answer_counts[(url, display_name, problem_part_id)][answer] += 1
 
-    return answer_counts
+def problem_url_and_display_names(course_id, module_state_keys):
+    """
+    Return a dict mapping each of `module_state_keys` to the (url_name,
+    display_name) of its problem in the course. Keys are looked up with a
+    single modulestore query for all of the course's problems; those it
+    doesn't find (e.g. problems in other categories) are then looked up one
+    at a time. Keys whose problem can't be found at all are left out.
+    """
+    module_state_keys = set(module_state_keys)
+    problem_store = modulestore()
+    problem_info = {}
+    if module_state_keys:
+        course_location = CourseDescriptor.id_to_location(course_id)
+        problems_location = Location('i4x', course_location.org, course_location.course, 'problem', None)
+        for problem in problem_store.get_items(problems_location, course_id=course_id):
+            module_state_key = problem.location.replace(revision=None).url()
+            if module_state_key in module_state_keys and module_state_key not in problem_info:
+                problem_info[module_state_key] = (problem.url_name, problem.display_name_with_default)
+
+    for module_state_key in module_state_keys - set(problem_info):
+        problems = problem_store.get_items(module_state_key, course_id=course_id, depth=1)
+        if problems:
+            problem_info[module_state_key] = (problems[0].url_name, problems[0].display_name_with_default)
+
+    return problem_info
+
+
+def name_answer_counts(course_id, answer_counts):
+    """
+    Given the answer counts returned by `count_answers`, return them keyed by
+    (problem url_name, problem display_name, problem_id) instead, as returned
+    by `answer_distributions`.
+    """
+    problem_info = problem_url_and_display_names(course_id, (key for key, __ in answer_counts))
+
+    named_counts = {}
+    for (module_state_key, problem_part_id), counts in answer_counts.iteritems():
+        if module_state_key not in problem_info:
+            # Likely means that the problem was deleted from the course
+            # after the student had answered.
+            log.warning(
+                "Answer Distribution: Item {} referenced in StudentModules for course {} not found; "
+                "This can happen if a student answered a question that was later deleted from "
+                "the course. Its answers will be omitted from the answer distribution CSV."
+                .format(module_state_key, course_id)
+            )
+            continue
+        url, display_name = problem_info[module_state_key]
+        named_counts[(url, display_name, problem_part_id)] = counts
+
+    return named_counts
+
 
 @transaction.commit_manually
-def grade(student, request, course, keep_raw_scores=False):
+def grade(student, request, course, keep_raw_scores=False, multi_user_cache=None):
     """
     Wraps "_grade" with the manual_transaction context manager just in case
     there are unanticipated errors.
+
+    If persistent grades are enabled for this course, the grade summary is
+    read from (and written back to) the PersistentCourseGrade table instead
+    of being recomputed on every call.
+
+    `multi_user_cache` is an optional MultiUserFieldDataCache that has been
+    set up to load the state of the course's graded modules for `student`
+    (and usually other students), in which case no per-student queries are
+    made for that state.
     """
     with manual_transaction():
-        return _grade(student, request, course, keep_raw_scores)
+        if not keep_raw_scores and _use_persistent_grades(course):
+            return _persistent_grade(student, request, course, multi_user_cache)
+        return _grade(student, request, course, keep_raw_scores, multi_user_cache)
 
 
-def _grade(student, request, course, keep_raw_scores):
+def _use_persistent_grades(course):
+    """
+    Returns True if grade summaries for `course` may be served from the
+    PersistentCourseGrade table.
+
+    Courses containing problems that always need to be rescored (their state
+    changes outside of the LMS, e.g. foldit) are never cached.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES', False) or settings.GENERATE_PROFILE_SCORES:
+        return False
+    return not any(
+        descriptor.always_recalculate_grades
+        for descriptor in course.grading_context['all_descriptors']
+    )
+
+
+def grading_version(course):
+    """
+    Returns a hash identifying everything about `course` that a cached grade
+    summary depends on besides the student's own scores: the grading policy,
+    the location, weight and maximum score of every graded module, by section,
+    and the next start date of a graded module (modules that haven't started
+    yet aren't scored, so the version changes as each of them is released).
+
+    The maximum score of an unattempted module comes from its definition (see
+    `get_score`), so that is covered too: by the maximum score computed from
+    its xml where there is one, or else by a hash of its data.
+    """
+    now = datetime.now(UTC())
+    upcoming_starts = [
+        descriptor.start for descriptor in course.grading_context['all_descriptors']
+        if descriptor.start is not None and descriptor.start > now
+    ]
+    next_start = min(upcoming_starts).isoformat() if upcoming_starts else None
+    sections = []
+    for section_format, section_list in sorted(course.grading_context['graded_sections'].iteritems()):
+        for section in section_list:
+            sections.append((
+                section_format,
+                section['section_descriptor'].location.url(),
+                [
+                    (descriptor.location.url(), descriptor.weight, _max_score_signature(descriptor))
+                    for descriptor in section['xmoduledescriptors']
+                ],
+            ))
+    signature = json.dumps([course.grading_policy, sections, next_start], sort_keys=True)
+    return hashlib.md5(signature).hexdigest()
+
+
+def _max_score_signature(descriptor):
+    """
+    Return what identifies the maximum score of `descriptor` for
+    `grading_version`: its maximum score computed from its xml if it has
+    one, or else a hash of its data (if it has any).
+    """
+    get_max_score_from_xml = getattr(descriptor, 'get_max_score_from_xml', None)
+    max_score = get_max_score_from_xml() if get_max_score_from_xml is not None else None
+    if max_score is not None:
+        return max_score
+    data = getattr(descriptor, 'data', None)
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    if isinstance(data, str):
+        return hashlib.md5(data).hexdigest()
+    return None
+
+
+def _persistent_grade(student, request, course, multi_user_cache=None):
+    """
+    Return the grade summary for `student` from the PersistentCourseGrade
+    table, computing and storing it first if it is missing, stale, or was
+    computed against a different version of the course's grading structure.
+
+    A missing row is created (stale) and committed before the grade is
+    computed, so that invalidations made meanwhile have a row to mark; the
+    computed grade is then only stored if none was (see
+    PersistentCourseGrade.store).
+    """
+    version = grading_version(course)
+    try:
+        cached = PersistentCourseGrade.objects.get(user=student, course_id=course.id)
+    except PersistentCourseGrade.DoesNotExist:
+        cached = _create_persistent_grade(student, course.id)
+
+    if not cached.stale and cached.grading_version == version:
+        dog_stats_api.increment('lms.grades.persistent', tags=['result:hit'])
+        return _load_gradeset(cached.gradeset)
+
+    dog_stats_api.increment('lms.grades.persistent', tags=['result:miss'])
+    grade_summary = _grade(student, request, course, False, multi_user_cache)
+
+    if not cached.store(version, _dump_gradeset(grade_summary)):
+        # invalidated while being computed: leave the row stale for the next read
+        dog_stats_api.increment('lms.grades.persistent', tags=['result:conflict'])
+    return grade_summary
+
+
+def _create_persistent_grade(student, course_id):
+    """
+    Create and commit an (empty, stale) PersistentCourseGrade row for
+    `student` in `course_id`, returning it, or the row a concurrent request
+    created first.
+    """
+    try:
+        cached, _ = PersistentCourseGrade.objects.get_or_create(
+            user=student, course_id=course_id, defaults={'stale': True}
+        )
+    except IntegrityError:
+        # the concurrent insert isn't visible to this transaction's reads: start another
+        transaction.rollback()
+        cached = PersistentCourseGrade.objects.get(user=student, course_id=course_id)
+    transaction.commit()
+    return cached
+
+
+def _dump_gradeset(grade_summary):
+    """
+    Serialize a grade summary (as returned by _grade) to JSON.
+    """
+    gradeset = dict(grade_summary)
+    gradeset['totaled_scores'] = dict(
+        (section_format, [score._asdict() for score in scores])
+        for section_format, scores in grade_summary['totaled_scores'].iteritems()
+    )
+    return json.dumps(gradeset)
+
+
+def _load_gradeset(serialized):
+    """
+    Inverse of _dump_gradeset: turns stored JSON back into a grade summary.
+    """
+    gradeset = json.loads(serialized)
+    gradeset['totaled_scores'] = dict(
+        (section_format, [Score(**score) for score in scores])
+        for section_format, scores in gradeset['totaled_scores'].iteritems()
+    )
+    return gradeset
+
+
+def _grade(student, request, course, keep_raw_scores, multi_user_cache=None):
     """
     Unwrapped version of "grade"
 
@@ -195,7 +417,12 @@ def _grade(student, request, course, keep_raw_scores):
             )
 
             # If we haven't seen a single problem in the section, we don't have to grade it at all! We can assume 0%
-            if not should_grade_section:
+            if not should_grade_section and multi_user_cache is not None:
+                should_grade_section = multi_user_cache.has_student_module(
+                    student,
+                    [descriptor.location for descriptor in section['xmoduledescriptors']]
+                )
+            elif not should_grade_section:
                 with manual_transaction():
                     should_grade_section = StudentModule.objects.filter(
                         student=student,
@@ -212,12 +439,17 @@ def _grade(student, request, course, keep_raw_scores):
                     # TODO: We need the request to pass into here. If we could forego that, our arguments
                     # would be simpler
                     with manual_transaction():
-                        field_data_cache = FieldDataCache([descriptor], course.id, student)
+                        if multi_user_cache is not None:
+                            field_data_cache = multi_user_cache.cache_for_user(student, [descriptor])
+                        else:
+                            field_data_cache = FieldDataCache([descriptor], course.id, student)
                     return get_module_for_descriptor(student, request, descriptor, field_data_cache, course.id)
 
                 for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
 
-                    (correct, total) = get_score(course.id, student, module_descriptor, create_module)
+                    (correct, total) = get_score(
+                        course.id, student, module_descriptor, create_module, multi_user_cache
+                    )
                     if correct is None and total is None:
                         continue
 
@@ -383,7 +615,7 @@ def _progress_summary(student, request, course):
 
     return chapters
 
-def get_score(course_id, user, problem_descriptor, module_creator):
+def get_score(course_id, user, problem_descriptor, module_creator, multi_user_cache=None):
     """
     Return the score for a user on a problem, as a tuple (correct, total).
     e.g. (5,7) if you got 5 out of 7 points.
@@ -395,7 +627,8 @@ def get_score(course_id, user, problem_descriptor, module_creator):
     problem_descriptor: an XModuleDescriptor
     module_creator: a function that takes a descriptor, and returns the corresponding XModule for this user.
            Can return None if user doesn't have access, or if something else went wrong.
-    cache: A FieldDataCache
+    multi_user_cache: an optional MultiUserFieldDataCache to look up the
+           user's StudentModule in, instead of querying for it.
     """
     if not user.is_authenticated():
         return (None, None)
@@ -416,28 +649,39 @@ def get_score(course_id, user, problem_descriptor, module_creator):
         # These are not problems, and do not have a score
         return (None, None)
 
-    try:
-        student_module = StudentModule.objects.get(
-            student=user,
-            course_id=course_id,
-            module_state_key=problem_descriptor.location
-        )
-    except StudentModule.DoesNotExist:
-        student_module = None
+    if multi_user_cache is not None and multi_user_cache.covers([problem_descriptor]):
+        student_module = multi_user_cache.get_student_module(user, problem_descriptor.location)
+    else:
+        try:
+            student_module = StudentModule.objects.get(
+                student=user,
+                course_id=course_id,
+                module_state_key=problem_descriptor.location
+            )
+        except StudentModule.DoesNotExist:
+            student_module = None
 
     if student_module is not None and student_module.max_grade is not None:
         correct = student_module.grade if student_module.grade is not None else 0
         total = student_module.max_grade
     else:
         # If the problem was not in the cache, or hasn't been graded yet,
-        # we need to instantiate the problem.
-        # Otherwise, the max score (cached in student_module) won't be available
-        problem = module_creator(problem_descriptor)
-        if problem is None:
-            return (None, None)
-
+        # the max score (cached in student_module) won't be available.
+        # Problems that can compute it from their definition (e.g. capa) don't
+        # need to be instantiated, as long as the user has access to them.
         correct = 0.0
-        total = problem.max_score()
+        total = None
+        get_max_score_from_xml = getattr(problem_descriptor, 'get_max_score_from_xml', None)
+        if get_max_score_from_xml is not None and has_access(user, problem_descriptor, 'load', course_id):
+            total = get_max_score_from_xml()
+
+        # Otherwise, we need to instantiate the problem.
+        if total is None:
+            problem = module_creator(problem_descriptor)
+            if problem is None:
+                return (None, None)
+
+            total = problem.max_score()
 
         # Problem may be an error module (if something in the problem builder failed)
         # In which case total might be None
@@ -494,25 +738,37 @@ def iterate_grades_for(course_id, students):
     # grading that student.
     request = RequestFactory().get('/')
 
-    for student in students:
-        with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=['action:{}'.format(course_id)]):
-            try:
-                request.user = student
-                # Grading calls problem rendering, which calls masquerading,
-                # which checks session vars -- thus the empty session dict below.
-                # It's not pretty, but untangling that is currently beyond the
-                # scope of this feature.
-                request.session = {}
-                gradeset = grade(student, request, course)
-                yield student, gradeset, ""
-            except Exception as exc:  # pylint: disable=broad-except
-                # Keep marching on even if this student couldn't be graded for
-                # some reason, but log it for future reference.
-                log.exception(
-                    'Cannot grade student %s (%s) in course %s because of exception: %s',
-                    student.username,
-                    student.id,
-                    course_id,
-                    exc.message
-                )
-                yield student, {}, exc.message
+    # Students are graded in batches: the module state of every student in a
+    # batch is loaded with a handful of queries, rather than a few queries per
+    # student per section.
+    students = iter(students)
+    while True:
+        batch = list(islice(students, GRADING_BATCH_SIZE))
+        if not batch:
+            break
+        multi_user_cache = MultiUserFieldDataCache(
+            course.grading_context['all_descriptors'], course_id, batch
+        )
+
+        for student in batch:
+            with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=['action:{}'.format(course_id)]):
+                try:
+                    request.user = student
+                    # Grading calls problem rendering, which calls masquerading,
+                    # which checks session vars -- thus the empty session dict below.
+                    # It's not pretty, but untangling that is currently beyond the
+                    # scope of this feature.
+                    request.session = {}
+                    gradeset = grade(student, request, course, multi_user_cache=multi_user_cache)
+                    yield student, gradeset, ""
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Keep marching on even if this student couldn't be graded for
+                    # some reason, but log it for future reference.
+                    log.exception(
+                        'Cannot grade student %s (%s) in course %s because of exception: %s',
+                        student.username,
+                        student.id,
+                        course_id,
+                        exc.message
+                    )
+                    yield student, {}, exc.message
@@ -0,0 +1,69 @@
+"""
+Command to fill in the StudentModuleGradeCounts of StudentModules that existed
+before the counts were kept up to date, or to rebuild counts that have drifted.
+"""
+from optparse import make_option
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from courseware.models import StudentModule, StudentModuleGradeCount
+
+
+class Command(BaseCommand):
+    """
+    Recompute the grade counts of every problem with StudentModules (or only those
+    in the course with the given course_id) from the StudentModules themselves.
+
+    The counts of each batch of problems are replaced in a single transaction.
+    Counts are only kept up to date while ENABLE_GRADE_HISTOGRAM_COUNTS is set,
+    so run this just after enabling it; grades that change while their
+    problem's counts are being recomputed may be miscounted, so pick a time
+    when a course is quiet.
+    """
+    help = dedent(__doc__).strip()
+    args = '[course_id]'
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    dest='batch_size',
+                    default=100,
+                    help='Number of modules whose counts are recomputed at a time'),
+    )
+
+    def handle(self, *args, **options):
+        student_modules = StudentModule.objects.filter(module_type='problem')
+        if args:
+            student_modules = student_modules.filter(course_id=args[0])
+        module_state_keys = list(
+            student_modules.order_by().values_list('module_state_key', flat=True).distinct()
+        )
+
+        batch_size = options['batch_size']
+        for start in xrange(0, len(module_state_keys), batch_size):
+            self.backfill_modules(module_state_keys[start:start + batch_size])
+
+        self.stdout.write("Recomputed grade counts of {} modules\n".format(len(module_state_keys)))
+
+    @transaction.commit_on_success
+    def backfill_modules(self, module_state_keys):
+        """
+        Replace the grade counts of each of module_state_keys
+        """
+        grades = StudentModule.objects.filter(
+            module_state_key__in=module_state_keys, module_type='problem'
+        ).order_by().values('module_state_key', 'grade').annotate(num_modules=Count('id'))
+
+        StudentModuleGradeCount.objects.filter(module_state_key__in=module_state_keys).delete()
+        StudentModuleGradeCount.objects.bulk_create([
+            StudentModuleGradeCount(
+                module_state_key=row['module_state_key'],
+                grade=row['grade'] or 0,
+                ungraded=row['grade'] is None,
+                count=row['num_modules'],
+            )
+            for row in grades
+        ])
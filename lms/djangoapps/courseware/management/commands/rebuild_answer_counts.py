@@ -0,0 +1,69 @@
+"""
+Command to fill in the StudentModuleAnswerCounts of StudentModules that existed
+before the counts were kept up to date, or to rebuild counts that have drifted.
+"""
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courseware.grades import count_answers
+from courseware.models import StudentModule, StudentModuleAnswerCount
+
+
+class Command(BaseCommand):
+    """
+    Recompute the answer counts of every course with submitted problems (or only
+    of the course with the given course_id) from the StudentModules themselves.
+
+    The counts of each course are replaced in a single transaction. Counts are
+    only kept up to date while ENABLE_ANSWER_DISTRIBUTION_COUNTS is set, so run
+    this just after enabling it; answers that change while their course's
+    counts are being recomputed may be miscounted, so pick a time when a course
+    is quiet.
+    """
+    help = dedent(__doc__).strip()
+    args = '[course_id]'
+
+    def handle(self, *args, **options):
+        if args:
+            course_ids = [args[0]]
+        else:
+            course_ids = list(
+                StudentModule.objects.filter(module_type='problem').order_by().values_list(
+                    'course_id', flat=True
+                ).distinct()
+            )
+
+        for course_id in course_ids:
+            num_answers = self.rebuild_course(course_id)
+            self.stdout.write("Recomputed {} answer counts of {}\n".format(num_answers, course_id))
+
+    @transaction.commit_on_success
+    def rebuild_course(self, course_id):
+        """
+        Replace the answer counts of the course, returning the number of
+        distinct answers counted.
+        """
+        # Read from the default database, not a read replica, so that the
+        # counts match the StudentModules as of this transaction.
+        submitted = StudentModule.objects.filter(
+            course_id=course_id, module_type='problem', grade__isnull=False
+        ).values('id', 'module_state_key', 'state')
+        answer_counts = count_answers(course_id, submitted.iterator())
+
+        StudentModuleAnswerCount.objects.filter(course_id=course_id).delete()
+        rows = [
+            StudentModuleAnswerCount(
+                course_id=course_id,
+                module_state_key=module_state_key,
+                problem_part_id=problem_part_id,
+                answer_hash=StudentModuleAnswerCount.hash_answer(course_id, module_state_key, problem_part_id, answer),
+                answer=answer,
+                count=count,
+            )
+            for (module_state_key, problem_part_id), counts in answer_counts.iteritems()
+            for answer, count in counts.iteritems()
+        ]
+        StudentModuleAnswerCount.objects.bulk_create(rows)
+        return len(rows)
@@ -0,0 +1,56 @@
+"""
+Middleware that holds back the changes to the per-module counts of
+StudentModules (see `courseware.tasks`) made by a request until the request's
+transaction has been committed.
+
+The counts are updated by celery tasks, outside of the request's transaction.
+Were the changes sent as StudentModules are saved, the changes of a request
+that is then rolled back would still be counted. Instead, they are queued on
+the request, and sent once the response has made it back through
+TransactionMiddleware (so this middleware has to come before it in
+MIDDLEWARE_CLASSES). Changes made outside of a request (e.g. by management
+commands or instructor tasks) are sent right away.
+"""
+import threading
+from collections import Counter, OrderedDict
+
+_pending = threading.local()
+
+
+def queue_count_changes(count_task, changes):
+    """
+    Queue the changes (a list of tuples whose last item is the delta to a
+    count, and whose other items identify the count) to be applied by the
+    celery task count_task once the current request has committed.
+    """
+    pending = getattr(_pending, 'changes', None)
+    if pending is None:
+        count_task.delay(changes)
+        return
+    deltas = pending.setdefault(count_task, Counter())
+    for change in changes:
+        deltas[change[:-1]] += change[-1]
+
+
+class CountChangesMiddleware(object):
+    """
+    Sends the count changes queued during a request once the request's
+    transaction has been committed, and drops them if it was rolled back.
+    """
+    def process_request(self, request):  # pylint: disable=unused-argument
+        """Start queueing the request's count changes"""
+        _pending.changes = OrderedDict()
+
+    def process_exception(self, request, exception):  # pylint: disable=unused-argument
+        """Drop the count changes of a request whose transaction is rolled back"""
+        _pending.changes = OrderedDict()
+
+    def process_response(self, request, response):  # pylint: disable=unused-argument
+        """Send the count changes of the committed request"""
+        pending = getattr(_pending, 'changes', None)
+        _pending.changes = None
+        for count_task, deltas in (pending or {}).iteritems():
+            changes = [key + (delta,) for key, delta in deltas.iteritems() if delta]
+            if changes:
+                count_task.delay(changes)
+        return response
@@ -81,33 +81,53 @@ class FieldDataCache(object):
             should be cached
         select_for_update: Flag indicating whether the rows should be locked until end of transaction
         """
+        descriptors = cls._get_child_descriptors(descriptor, depth, descriptor_filter)
 
-        def get_child_descriptors(descriptor, depth, descriptor_filter):
-            """
-            Return a list of all child descriptors down to the specified depth
-            that match the descriptor filter. Includes `descriptor`
-
-            descriptor: The parent to search inside
-            depth: The number of levels to descend, or None for infinite depth
-            descriptor_filter(descriptor): A function that returns True
-                if descriptor should be included in the results
-            """
-            if descriptor_filter(descriptor):
-                descriptors = [descriptor]
-            else:
-                descriptors = []
+        return FieldDataCache(descriptors, course_id, user, select_for_update)
 
-            if depth is None or depth > 0:
-                new_depth = depth - 1 if depth is not None else depth
+    @staticmethod
+    def _get_child_descriptors(descriptor, depth, descriptor_filter):
+        """
+        Return a list of all child descriptors down to the specified depth
+        that match the descriptor filter. Includes `descriptor`
 
-                for child in descriptor.get_children() + descriptor.get_required_module_descriptors():
-                    descriptors.extend(get_child_descriptors(child, new_depth, descriptor_filter))
+        descriptor: The parent to search inside
+        depth: The number of levels to descend, or None for infinite depth
+        descriptor_filter(descriptor): A function that returns True
+            if descriptor should be included in the results
+        """
+        if descriptor_filter(descriptor):
+            descriptors = [descriptor]
+        else:
+            descriptors = []
 
-            return descriptors
+        if depth is None or depth > 0:
+            new_depth = depth - 1 if depth is not None else depth
 
-        descriptors = get_child_descriptors(descriptor, depth, descriptor_filter)
+            for child in descriptor.get_children() + descriptor.get_required_module_descriptors():
+                descriptors.extend(FieldDataCache._get_child_descriptors(child, new_depth, descriptor_filter))
 
-        return FieldDataCache(descriptors, course_id, user, select_for_update)
+        return descriptors
+
+    def add_descriptor_descendents(self, descriptor, depth=None):
+        """
+        Add the data of descriptor and its descendents down to depth (as for
+        `cache_for_descriptor_descendents`) to this cache, querying only for
+        the descriptors that it doesn't already cover. Data already in the
+        cache is kept.
+        """
+        covered = set(cached.location for cached in self.descriptors)
+        descriptors = [
+            child for child in self._get_child_descriptors(descriptor, depth, lambda descriptor: True)
+            if child.location not in covered
+        ]
+        if not descriptors:
+            return
+
+        added = FieldDataCache(descriptors, self.course_id, self.user, self.select_for_update)
+        for key, field_object in added.cache.iteritems():
+            self.cache.setdefault(key, field_object)
+        self.descriptors = list(self.descriptors) + descriptors
 
     def _query(self, model_class, **kwargs):
         """
@@ -264,6 +284,166 @@ class FieldDataCache(object):
         return field_object
 
 
+class MultiUserFieldDataCache(object):
+    """
+    Loads the data for a set of descriptors for many users at once, in a
+    fixed number of queries per scope, and hands out per-user FieldDataCaches
+    built from the loaded rows.
+
+    Nothing is loaded until the data is first needed.
+    """
+    def __init__(self, descriptors, course_id, users, chunk_size=500):
+        """
+        Arguments
+        descriptors: A list of XModuleDescriptors.
+        course_id: The id of the current course
+        users: The users for which to cache data
+        chunk_size: The maximum number of descriptors to put in a single query
+        """
+        self.descriptors = list(descriptors)
+        self.course_id = course_id
+        self.users = [user for user in users if user.is_authenticated()]
+        self.chunk_size = chunk_size
+        self.usage_ids = set(str(descriptor.scope_ids.usage_id) for descriptor in self.descriptors)
+        self._index = None
+
+    def _load(self):
+        """
+        Query the database for all of the fields of all descriptors for all
+        users, and index the results by scope:
+
+        Scope.user_state: {(student id, module_state_key): StudentModule}
+        Scope.user_state_summary: {usage_id: [XModuleUserStateSummaryField]}
+        Scope.preferences: {student id: [XModuleStudentPrefsField]}
+        Scope.user_info: {student id: [XModuleStudentInfoField]}
+        """
+        user_ids = [user.pk for user in self.users]
+        scope_map = defaultdict(set)
+        for descriptor in self.descriptors:
+            for field in descriptor.fields.values():
+                scope_map[field.scope].add(field)
+
+        index = {
+            Scope.user_state: {},
+            Scope.user_state_summary: defaultdict(list),
+            Scope.preferences: defaultdict(list),
+            Scope.user_info: defaultdict(list),
+        }
+        if not user_ids:
+            return index
+
+        for scope, fields in scope_map.items():
+            field_names = set(field.name for field in fields)
+            if scope == Scope.user_state:
+                for usage_ids in chunks(self.usage_ids, self.chunk_size):
+                    for student_module in StudentModule.objects.filter(
+                            course_id=self.course_id,
+                            student__in=user_ids,
+                            module_state_key__in=usage_ids):
+                        index[scope][(student_module.student_id, student_module.module_state_key)] = student_module
+            elif scope == Scope.user_state_summary:
+                for usage_ids in chunks(self.usage_ids, self.chunk_size):
+                    for field_object in XModuleUserStateSummaryField.objects.filter(
+                            usage_id__in=usage_ids,
+                            field_name__in=field_names):
+                        index[scope][field_object.usage_id].append(field_object)
+            elif scope == Scope.preferences:
+                for field_object in XModuleStudentPrefsField.objects.filter(
+                        module_type__in=set(descriptor.scope_ids.block_type for descriptor in self.descriptors),
+                        student__in=user_ids,
+                        field_name__in=field_names):
+                    index[scope][field_object.student_id].append(field_object)
+            elif scope == Scope.user_info:
+                for field_object in XModuleStudentInfoField.objects.filter(
+                        student__in=user_ids,
+                        field_name__in=field_names):
+                    index[scope][field_object.student_id].append(field_object)
+        return index
+
+    @property
+    def index(self):
+        """
+        The loaded field objects, indexed by scope as described in `_load`.
+        """
+        if self._index is None:
+            self._index = self._load()
+        return self._index
+
+    def covers(self, descriptors):
+        """
+        Returns True if the data for all of `descriptors` has been (or will
+        be) loaded by this cache.
+        """
+        return all(str(descriptor.scope_ids.usage_id) in self.usage_ids for descriptor in descriptors)
+
+    def get_student_module(self, user, location):
+        """
+        Return the StudentModule of `user` for the module at `location`, or
+        None if there isn't one. `location` must belong to one of the
+        descriptors this cache was constructed with.
+        """
+        return self.index[Scope.user_state].get((user.pk, location.url()))
+
+    def has_student_module(self, user, locations):
+        """
+        Returns True if `user` has a StudentModule for any of `locations`.
+        """
+        student_modules = self.index[Scope.user_state]
+        return any((user.pk, location.url()) in student_modules for location in locations)
+
+    def cache_for_user(self, user, descriptors):
+        """
+        Return a FieldDataCache for `user` and `descriptors`, populated from
+        the data loaded by this cache. If some of `descriptors` are not
+        covered, the FieldDataCache queries the database as usual.
+        """
+        if not self.covers(descriptors):
+            return FieldDataCache(descriptors, self.course_id, user)
+        return PrefetchedFieldDataCache(descriptors, self.course_id, user, self)
+
+
+class PrefetchedFieldDataCache(FieldDataCache):
+    """
+    A FieldDataCache that takes its initial contents from a
+    MultiUserFieldDataCache, rather than querying the database.
+    """
+    def __init__(self, descriptors, course_id, user, multi_user_cache):
+        self.multi_user_cache = multi_user_cache
+        super(PrefetchedFieldDataCache, self).__init__(descriptors, course_id, user)
+
+    def _retrieve_fields(self, scope, fields):
+        """
+        Return the prefetched field objects in the specified scope that
+        belong to this user and these descriptors.
+        """
+        usage_ids = set(str(descriptor.scope_ids.usage_id) for descriptor in self.descriptors)
+        field_names = set(field.name for field in fields)
+        index = self.multi_user_cache.index
+        if scope == Scope.user_state:
+            student_modules = (index[scope].get((self.user.pk, usage_id)) for usage_id in usage_ids)
+            return [student_module for student_module in student_modules if student_module is not None]
+        elif scope == Scope.user_state_summary:
+            return [
+                field_object
+                for usage_id in usage_ids
+                for field_object in index[scope].get(usage_id, [])
+                if field_object.field_name in field_names
+            ]
+        elif scope == Scope.preferences:
+            block_types = set(descriptor.scope_ids.block_type for descriptor in self.descriptors)
+            return [
+                field_object for field_object in index[scope].get(self.user.pk, [])
+                if field_object.module_type in block_types and field_object.field_name in field_names
+            ]
+        elif scope == Scope.user_info:
+            return [
+                field_object for field_object in index[scope].get(self.user.pk, [])
+                if field_object.field_name in field_names
+            ]
+        else:
+            return []
+
+
 class DjangoKeyValueStore(KeyValueStore):
     """
     This KeyValueStore will read and write data in the following scopes to django models
@@ -12,12 +12,19 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+from collections import Counter, defaultdict
+import hashlib
+import json
+
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 
+from courseware.middleware import queue_count_changes
+
 
 class StudentModule(models.Model):
     """
@@ -249,3 +256,382 @@ class OfflineComputedGradeLog(models.Model):
 
     def __unicode__(self):
         return "[OCGLog] %s: %s" % (self.course_id, self.created)
+
+
+class PersistentCourseGrade(models.Model):
+    """
+    Cached grade summary (the output of grades.grade) for a user in a course.
+
+    Rows are marked stale whenever one of the user's StudentModule grades in
+    the course changes, and are recomputed the next time the grade is read.
+    `grading_version` identifies the course grading structure the gradeset
+    was computed against, so a change to the grading policy or to the set of
+    graded problems also causes a recompute.
+
+    Every invalidation also increments `generation`, and a recomputed
+    gradeset is only written back if the generation is still the one read
+    before computing it (see `store`), so that an invalidation made while
+    the grade was being computed is never overwritten by a stale gradeset.
+    """
+    class Meta:
+        unique_together = (('user', 'course_id'), )
+
+    user = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+
+    grading_version = models.CharField(max_length=32)
+    gradeset = models.TextField(null=True, blank=True)  # grades, stored as JSON
+    stale = models.BooleanField(default=False)
+    generation = models.IntegerField(default=0)
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    @classmethod
+    def invalidate(cls, user_id, course_id):
+        """
+        Mark the cached grade for `user_id` in `course_id` (if any) as stale.
+        """
+        cls.objects.filter(user__id=user_id, course_id=course_id).update(
+            stale=True, generation=F('generation') + 1
+        )
+
+    @classmethod
+    def invalidate_for_users(cls, user_ids, course_id):
+        """
+        Mark the cached grades for each of `user_ids` in `course_id` as stale.
+        For use when StudentModules are updated in bulk, which bypasses the
+        signals that otherwise call `invalidate`.
+        """
+        cls.objects.filter(user__id__in=user_ids, course_id=course_id).update(
+            stale=True, generation=F('generation') + 1
+        )
+
+    def store(self, grading_version, gradeset):
+        """
+        Write back a gradeset computed after this row was read, unless the
+        row has been invalidated since. Returns whether it was written.
+        """
+        stored = PersistentCourseGrade.objects.filter(id=self.id, generation=self.generation).update(
+            grading_version=grading_version, gradeset=gradeset, stale=False
+        )
+        return stored == 1
+
+    def __unicode__(self):
+        return u"[PersistentCourseGrade] {}: {} (stale={})".format(self.user_id, self.course_id, self.stale)
+
+
+class StudentModuleGradeCount(models.Model):
+    """
+    The number of StudentModules for a module with a given grade.
+
+    While FEATURES['ENABLE_GRADE_HISTOGRAM_COUNTS'] is set, the counts of
+    problems are kept up to date as their StudentModules are created, regraded
+    and deleted (once the change has been committed, by
+    `courseware.tasks.add_grade_counts`), so that the histogram of a problem's
+    grades shown to staff is read from a few rows rather than aggregated over
+    all of the problem's StudentModules.
+
+    The counts are best-effort: a change lost between the commit and the task
+    (e.g. if the broker is down) is never counted. Counts for StudentModules
+    saved while the feature was off, or that have drifted, are recomputed by
+    the `backfill_grade_counts` management command.
+
+    StudentModules without a grade are counted in a separate bucket (with
+    `ungraded` set), as a nullable grade couldn't be part of a unique key.
+    """
+    class Meta:
+        unique_together = (('module_state_key', 'grade', 'ungraded'), )
+
+    module_state_key = models.CharField(max_length=255, db_column='module_id')
+    grade = models.FloatField(default=0)
+    ungraded = models.BooleanField(default=False)
+    count = models.IntegerField(default=0)
+
+    @classmethod
+    def add(cls, module_state_key, grade, delta=1):
+        """
+        Add `delta` to the number of StudentModules for `module_state_key` with `grade`.
+        """
+        bucket = {'grade': grade or 0, 'ungraded': grade is None}
+        if not cls.objects.filter(module_state_key=module_state_key, **bucket).update(count=F('count') + delta):
+            counter, __ = cls.objects.get_or_create(module_state_key=module_state_key, **bucket)
+            cls.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+    @staticmethod
+    def counts_module(module_type):
+        """
+        Return whether StudentModules of module_type are being counted.
+        """
+        return module_type == 'problem' and settings.FEATURES.get('ENABLE_GRADE_HISTOGRAM_COUNTS', False)
+
+    @classmethod
+    def remove_student_modules(cls, student_modules):
+        """
+        Stop counting each of `student_modules`. For use when StudentModules are
+        deleted in bulk, which bypasses the signals that otherwise keep the counts.
+        """
+        removed = Counter(
+            (module.module_state_key, module.grade) for module in student_modules
+            if cls.counts_module(module.module_type)
+        )
+        for (module_state_key, grade), num_removed in removed.iteritems():
+            cls.add(module_state_key, grade, -num_removed)
+
+    @classmethod
+    def histogram(cls, module_state_key):
+        """
+        Return a sorted list of (grade, number of StudentModules) for `module_state_key`,
+        or an empty list if any of its StudentModules is ungraded.
+        """
+        counts = cls.objects.filter(module_state_key=module_state_key, count__gt=0)
+        histogram = []
+        for grade, ungraded, count in counts.values_list('grade', 'ungraded', 'count'):
+            if ungraded:
+                return []
+            histogram.append((grade, count))
+        return sorted(histogram)
+
+    def __unicode__(self):
+        grade = None if self.ungraded else self.grade
+        return u"[StudentModuleGradeCount] {}: {} x {}".format(self.module_state_key, grade, self.count)
+
+
+class StudentModuleAnswerCount(models.Model):
+    """
+    The number of submitted StudentModules for a problem whose student answer
+    to one of the problem's parts is a given answer.
+
+    As for `courseware.grades.answer_distributions`, only problem
+    StudentModules with a grade are counted. While
+    FEATURES['ENABLE_ANSWER_DISTRIBUTION_COUNTS'] is set, the counts are kept
+    up to date as StudentModules are saved and deleted (once the change has
+    been committed, by `courseware.tasks.add_answer_counts`), so that a
+    course's answer distribution is read from one row per distinct answer
+    rather than computed from the state of all of its StudentModules.
+
+    The counts are best-effort: a change lost between the commit and the task
+    (e.g. if the broker is down) is never counted. Counts are rebuilt from the
+    StudentModules by the `rebuild_answer_counts` management command.
+
+    Answers can be long (and a unique index over the course, module, part and
+    answer columns too wide for MySQL), so rows are unique by a hash of them.
+    The course is included as runs of a course share module_state_keys.
+    """
+    course_id = models.CharField(max_length=255, db_index=True)
+    module_state_key = models.CharField(max_length=255, db_column='module_id')
+    problem_part_id = models.CharField(max_length=255)
+    answer_hash = models.CharField(max_length=40, unique=True)
+    answer = models.TextField()
+    count = models.IntegerField(default=0)
+
+    @staticmethod
+    def hash_answer(course_id, module_state_key, problem_part_id, answer):
+        """
+        Return the hash that identifies the row of answer to the problem part
+        """
+        return hashlib.sha1(
+            u'\n'.join([course_id, module_state_key, problem_part_id, answer]).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def counts_module(module_type):
+        """
+        Return whether the answers of StudentModules of module_type are being counted.
+        """
+        return module_type == 'problem' and settings.FEATURES.get('ENABLE_ANSWER_DISTRIBUTION_COUNTS', False)
+
+    @staticmethod
+    def counted_answers(module_type, state, grade):
+        """
+        Return a dict mapping the ids of the problem parts that a StudentModule
+        with the given module_type, state and grade has answers to (and that
+        are counted) to its answer, as unicode.
+        """
+        if module_type != 'problem' or grade is None or not state:
+            return {}
+        try:
+            raw_answers = json.loads(state).get('student_answers', {})
+        except (ValueError, AttributeError):
+            return {}
+        return dict((part_id, unicode(raw_answer)) for part_id, raw_answer in raw_answers.items())
+
+    @classmethod
+    def add(cls, course_id, module_state_key, problem_part_id, answer, delta=1):
+        """
+        Add `delta` to the number of StudentModules with `answer` to the problem part.
+        """
+        answer_hash = cls.hash_answer(course_id, module_state_key, problem_part_id, answer)
+        if not cls.objects.filter(answer_hash=answer_hash).update(count=F('count') + delta):
+            counter, __ = cls.objects.get_or_create(
+                answer_hash=answer_hash,
+                defaults={
+                    'course_id': course_id,
+                    'module_state_key': module_state_key,
+                    'problem_part_id': problem_part_id,
+                    'answer': answer,
+                },
+            )
+            cls.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+    @staticmethod
+    def answer_changes(course_id, module_state_key, old_answers, new_answers):
+        """
+        Return the list of (course_id, module_state_key, problem_part_id, answer,
+        delta) changes to the counts of a StudentModule whose counted answers (as
+        returned by `counted_answers`) have changed from old_answers to new_answers.
+        """
+        changes = []
+        for problem_part_id in set(old_answers) | set(new_answers):
+            old_answer = old_answers.get(problem_part_id)
+            new_answer = new_answers.get(problem_part_id)
+            if old_answer == new_answer:
+                continue
+            if old_answer is not None:
+                changes.append((course_id, module_state_key, problem_part_id, old_answer, -1))
+            if new_answer is not None:
+                changes.append((course_id, module_state_key, problem_part_id, new_answer, 1))
+        return changes
+
+    @classmethod
+    def remove_student_modules(cls, student_modules):
+        """
+        Stop counting the answers of each of `student_modules`. For use when
+        StudentModules are deleted in bulk, which bypasses the signals that
+        otherwise keep the counts.
+        """
+        removed = Counter()
+        for module in student_modules:
+            if not cls.counts_module(module.module_type):
+                continue
+            for problem_part_id, answer in cls.counted_answers(module.module_type, module.state, module.grade).iteritems():
+                removed[(module.course_id, module.module_state_key, problem_part_id, answer)] += 1
+        for (course_id, module_state_key, problem_part_id, answer), num_removed in removed.iteritems():
+            cls.add(course_id, module_state_key, problem_part_id, answer, -num_removed)
+
+    @classmethod
+    def answer_counts(cls, course_id):
+        """
+        Return the counts of the course's answers in the form returned by
+        `courseware.grades.count_answers`:
+
+          (problem module_state_key, problem_id) -> {dict: answer -> count}
+        """
+        answer_counts = defaultdict(dict)
+        counts = cls.objects.filter(course_id=course_id, count__gt=0)
+        for module_state_key, problem_part_id, answer, count in counts.values_list(
+                'module_state_key', 'problem_part_id', 'answer', 'count'):
+            answer_counts[(module_state_key, problem_part_id)][answer] = count
+        return answer_counts
+
+    def __unicode__(self):
+        return u"[StudentModuleAnswerCount] {} {}: {} x {}".format(
+            self.module_state_key, self.problem_part_id, self.answer, self.count
+        )
+
+
+@receiver(post_init, sender=StudentModule)
+def remember_loaded_grade(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Record the grade a StudentModule was loaded with, so that saves which do
+    not change the grade leave the user's PersistentCourseGrade and the
+    module's StudentModuleGradeCounts alone. (The state is only parsed for
+    its answers if a save changes it; see `count_answers_on_save`.)
+    """
+    instance._loaded_grade = (instance.grade, instance.max_grade)  # pylint: disable=protected-access
+    instance._counted_grade = instance.grade  # pylint: disable=protected-access
+    instance._counted_answers_state = (instance.state, instance.grade)  # pylint: disable=protected-access
+
+
+@receiver(post_save, sender=StudentModule)
+def invalidate_grade_on_save(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the cached course grade when a StudentModule is created or its
+    grade changes. (A newly created module can change the grade even without
+    a score, since sections the student has never touched are not graded.)
+    """
+    current_grade = (instance.grade, instance.max_grade)
+    if created or current_grade != getattr(instance, '_loaded_grade', None):
+        PersistentCourseGrade.invalidate(instance.student_id, instance.course_id)
+    instance._loaded_grade = current_grade  # pylint: disable=protected-access
+
+
+@receiver(post_delete, sender=StudentModule)
+def invalidate_grade_on_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the cached course grade when a StudentModule is deleted.
+    """
+    PersistentCourseGrade.invalidate(instance.student_id, instance.course_id)
+
+
+@receiver(post_save, sender=StudentModule)
+def count_grade_on_save(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Update the module's StudentModuleGradeCounts when a problem StudentModule is
+    created or its grade changes.
+    """
+    counted_grade = getattr(instance, '_counted_grade', None)
+    instance._counted_grade = instance.grade  # pylint: disable=protected-access
+    if not StudentModuleGradeCount.counts_module(instance.module_type):
+        return
+    if created:
+        changes = [(instance.module_state_key, instance.grade, 1)]
+    elif instance.grade != counted_grade:
+        changes = [(instance.module_state_key, counted_grade, -1), (instance.module_state_key, instance.grade, 1)]
+    else:
+        return
+    from courseware.tasks import add_grade_counts
+    queue_count_changes(add_grade_counts, changes)
+
+
+@receiver(post_delete, sender=StudentModule)
+def count_grade_on_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Stop counting a problem StudentModule's grade when it is deleted.
+    """
+    if not StudentModuleGradeCount.counts_module(instance.module_type):
+        return
+    from courseware.tasks import add_grade_counts
+    queue_count_changes(
+        add_grade_counts, [(instance.module_state_key, getattr(instance, '_counted_grade', instance.grade), -1)]
+    )
+
+
+@receiver(post_save, sender=StudentModule)
+def count_answers_on_save(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Update the problem's StudentModuleAnswerCounts when a problem StudentModule
+    is created, or its state or grade changes.
+    """
+    counted_state, counted_grade = getattr(instance, '_counted_answers_state', (None, None))
+    instance._counted_answers_state = (instance.state, instance.grade)  # pylint: disable=protected-access
+    if not StudentModuleAnswerCount.counts_module(instance.module_type):
+        return
+    if created:
+        old_answers = {}
+    elif (instance.state, instance.grade) == (counted_state, counted_grade):
+        return
+    else:
+        old_answers = StudentModuleAnswerCount.counted_answers(instance.module_type, counted_state, counted_grade)
+    new_answers = StudentModuleAnswerCount.counted_answers(instance.module_type, instance.state, instance.grade)
+    changes = StudentModuleAnswerCount.answer_changes(
+        instance.course_id, instance.module_state_key, old_answers, new_answers
+    )
+    if changes:
+        from courseware.tasks import add_answer_counts
+        queue_count_changes(add_answer_counts, changes)
+
+
+@receiver(post_delete, sender=StudentModule)
+def count_answers_on_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Stop counting a problem StudentModule's answers when it is deleted.
+    """
+    if not StudentModuleAnswerCount.counts_module(instance.module_type):
+        return
+    counted_state, counted_grade = getattr(instance, '_counted_answers_state', (instance.state, instance.grade))
+    old_answers = StudentModuleAnswerCount.counted_answers(instance.module_type, counted_state, counted_grade)
+    changes = StudentModuleAnswerCount.answer_changes(instance.course_id, instance.module_state_key, old_answers, {})
+    if changes:
+        from courseware.tasks import add_answer_counts
+        queue_count_changes(add_answer_counts, changes)
@@ -40,6 +40,7 @@ from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.util.duedate import get_extended_due_date
 from xmodule_modifiers import replace_course_urls, replace_jump_to_id_urls, replace_static_urls, add_histogram, wrap_xblock
 from xmodule.lti_module import LTIModule
+from xmodule.seq_module import SequenceDescriptor
 from xmodule.x_module import XModuleDescriptor
 
 
@@ -58,6 +59,16 @@ xqueue_interface = XQueueInterface(
 )
 
 
+def renders_children_lazily(descriptor):
+    """
+    Return whether the module of descriptor renders only some of its children
+    up front (see FEATURES['ENABLE_LAZY_SEQUENCE_RENDERING']), loading the state
+    of the others' descendents only when it renders them. A FieldDataCache
+    for it need only cover the descriptor and its children.
+    """
+    return settings.FEATURES.get('ENABLE_LAZY_SEQUENCE_RENDERING') and isinstance(descriptor, SequenceDescriptor)
+
+
 def make_track_function(request):
     '''
     Make a tracking function that logs what happened.
@@ -438,6 +449,10 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
 
     # pass position specified in URL to module through ModuleSystem
     system.set('position', position)
+    if settings.FEATURES.get('ENABLE_LAZY_SEQUENCE_RENDERING'):
+        # sequences render the units around the active one, loading their state as they do
+        system.set('sequence_prefetch_units', settings.SEQUENCE_PREFETCH_UNITS)
+        system.set('cache_descendent_state', field_data_cache.add_descriptor_descendents)
     if settings.FEATURES.get('ENABLE_PSYCHOMETRICS'):
         system.set(
             'psychometrics_handler',  # set callback for updating PsychometricsData
@@ -577,7 +592,8 @@ def _invoke_xblock_handler(request, course_id, usage_id, handler, suffix, user):
     field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
         course_id,
         user,
-        descriptor
+        descriptor,
+        depth=1 if renders_children_lazily(descriptor) else None,
     )
     instance = get_module(user, request, location, field_data_cache, course_id, grade_bucket_type='ajax')
     if instance is None:
@@ -0,0 +1,37 @@
+"""
+Tasks that keep the per-module counts of StudentModules up to date.
+
+StudentModules are saved within the transaction of the request that changes
+them, so updating a module's shared count rows there would hold their locks
+(serializing every submission to the module) until the request commits.
+Instead, the changes to the counts are sent here once the request has
+committed (see `courseware.middleware`), and each is applied in its own short
+transaction. The tasks are acknowledged late, so that a worker lost while
+applying changes doesn't drop them.
+"""
+from celery import task
+from django.db import transaction
+
+from courseware.models import StudentModuleAnswerCount, StudentModuleGradeCount
+
+
+@task(acks_late=True)  # pylint: disable=E1102
+@transaction.commit_on_success
+def add_grade_counts(changes):
+    """
+    Apply a list of (module_state_key, grade, delta) changes to the
+    StudentModuleGradeCounts.
+    """
+    for module_state_key, grade, delta in changes:
+        StudentModuleGradeCount.add(module_state_key, grade, delta)
+
+
+@task(acks_late=True)  # pylint: disable=E1102
+@transaction.commit_on_success
+def add_answer_counts(changes):
+    """
+    Apply a list of (course_id, module_state_key, problem_part_id, answer,
+    delta) changes to the StudentModuleAnswerCounts.
+    """
+    for course_id, module_state_key, problem_part_id, answer, delta in changes:
+        StudentModuleAnswerCount.add(course_id, module_state_key, problem_part_id, answer, delta)
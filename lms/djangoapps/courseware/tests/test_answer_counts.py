@@ -0,0 +1,128 @@
+"""
+Tests of the answer counts kept for answer distributions.
+"""
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+from mock import patch
+
+from courseware.grades import count_answers, iterate_submitted_problem_states
+from courseware.models import StudentModule, StudentModuleAnswerCount
+from courseware.tests.factories import StudentModuleFactory
+
+COURSE_ID = 'MITx/999/Robot_Super_Course'
+OTHER_COURSE_ID = 'MITx/999/Other_Course'
+PROBLEM_ID = 'i4x://MITx/999/problem/counted'
+PART_ID = 'i4x-MITx-999-problem-counted_2_1'
+OTHER_PART_ID = 'i4x-MITx-999-problem-counted_3_1'
+
+
+def answers_state(**answers):
+    """Return the state of a problem with the given student answers"""
+    return json.dumps({'attempts': 1, 'student_answers': answers})
+
+
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_ANSWER_DISTRIBUTION_COUNTS': True})
+class TestAnswerCounts(TestCase):
+    """
+    Test that answer counts follow the answers in the StudentModules' state.
+    """
+    def counts(self, course_id=COURSE_ID):
+        """Return the answer counts read for the course, as plain dicts"""
+        return dict(
+            (key, dict(answers)) for key, answers in StudentModuleAnswerCount.answer_counts(course_id).items()
+        )
+
+    def create_module(self, grade=1, course_id=COURSE_ID, **answers):
+        """Create a problem StudentModule with the given answers"""
+        return StudentModuleFactory.create(
+            course_id=course_id, module_state_key=PROBLEM_ID, grade=grade, state=answers_state(**answers)
+        )
+
+    def test_submitted_answers_counted(self):
+        self.create_module(**{PART_ID: 'choice_1', OTHER_PART_ID: 3})
+        self.create_module(**{PART_ID: 'choice_1'})
+        self.create_module(**{PART_ID: u'\u00e9'})
+        self.create_module(course_id=OTHER_COURSE_ID, **{PART_ID: 'choice_1'})
+        self.assertEqual(self.counts(), {
+            (PROBLEM_ID, PART_ID): {u'choice_1': 2, u'\u00e9': 1},
+            (PROBLEM_ID, OTHER_PART_ID): {u'3': 1},
+        })
+        self.assertEqual(self.counts(OTHER_COURSE_ID), {(PROBLEM_ID, PART_ID): {u'choice_1': 1}})
+
+    def test_changed_answers_move_counts(self):
+        module = self.create_module(**{PART_ID: 'choice_1', OTHER_PART_ID: 'same'})
+        module = StudentModule.objects.get(pk=module.pk)
+        module.state = answers_state(**{PART_ID: 'choice_2', OTHER_PART_ID: 'same'})
+        module.save()
+        self.assertEqual(self.counts(), {
+            (PROBLEM_ID, PART_ID): {u'choice_2': 1},
+            (PROBLEM_ID, OTHER_PART_ID): {u'same': 1},
+        })
+
+        # saves which leave the state and grade alone don't touch the counts:
+        module.done = 'f'
+        with patch.object(StudentModuleAnswerCount, 'add') as mock_add:
+            module.save()
+        self.assertFalse(mock_add.called)
+
+    def test_ungraded_modules_not_counted(self):
+        module = self.create_module(grade=None, **{PART_ID: 'choice_1'})
+        self.create_module(grade=None, **{PART_ID: 'choice_1'}).delete()
+        StudentModuleFactory.create(module_type='sequential', grade=1, state=answers_state(**{PART_ID: 'choice_1'}))
+        self.assertEqual(self.counts(), {})
+
+        module.grade = 0
+        module.save()
+        self.assertEqual(self.counts(), {(PROBLEM_ID, PART_ID): {u'choice_1': 1}})
+
+    def test_deleted_modules_uncounted(self):
+        module = self.create_module(**{PART_ID: 'choice_1'})
+        self.create_module(**{PART_ID: 'choice_2'})
+        module.delete()
+        self.assertEqual(self.counts(), {(PROBLEM_ID, PART_ID): {u'choice_2': 1}})
+
+        StudentModuleAnswerCount.remove_student_modules(list(StudentModule.objects.all()))
+        self.assertEqual(self.counts(), {})
+
+    def test_unchanged_answers_not_sent(self):
+        module = self.create_module(**{PART_ID: 'choice_1'})
+        state = json.loads(module.state)
+        state['input_state'] = {PART_ID: {}}
+        module.state = json.dumps(state)
+        with patch('courseware.tasks.add_answer_counts.delay') as mock_delay:
+            module.save()
+        self.assertFalse(mock_delay.called)
+
+    def test_disabled_counts_not_kept(self):
+        with patch.dict('django.conf.settings.FEATURES', {'ENABLE_ANSWER_DISTRIBUTION_COUNTS': False}):
+            with patch.object(StudentModuleAnswerCount, 'counted_answers') as mock_counted_answers:
+                module = self.create_module(**{PART_ID: 'choice_1'})
+                module.state = answers_state(**{PART_ID: 'choice_2'})
+                module.save()
+                module.delete()
+        self.assertFalse(mock_counted_answers.called)
+        self.assertEqual(self.counts(), {})
+
+    def test_counts_match_state(self):
+        for answer in ('choice_1', 'choice_1', 'choice_2', None, 4.5):
+            self.create_module(**{PART_ID: answer})
+        self.create_module(**{OTHER_PART_ID: 'choice_1'})
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1, state='not json')
+        self.assertEqual(self.counts(), count_answers(COURSE_ID, iterate_submitted_problem_states(COURSE_ID)))
+
+    def test_rebuild(self):
+        self.create_module(**{PART_ID: 'choice_1'})
+        self.create_module(**{PART_ID: 'choice_2'})
+        self.create_module(course_id=OTHER_COURSE_ID, **{PART_ID: 'choice_1'})
+        # lose the counts, and add a wrong one:
+        StudentModuleAnswerCount.objects.all().delete()
+        StudentModuleAnswerCount.add(COURSE_ID, PROBLEM_ID, PART_ID, u'choice_3')
+
+        call_command('rebuild_answer_counts', COURSE_ID)
+        self.assertEqual(self.counts(), {(PROBLEM_ID, PART_ID): {u'choice_1': 1, u'choice_2': 1}})
+        self.assertEqual(self.counts(OTHER_COURSE_ID), {})
+
+        call_command('rebuild_answer_counts')
+        self.assertEqual(self.counts(OTHER_COURSE_ID), {(PROBLEM_ID, PART_ID): {u'choice_1': 1}})
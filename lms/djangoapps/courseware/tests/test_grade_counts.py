@@ -0,0 +1,116 @@
+"""
+Tests of the grade counts kept for staff grade histograms.
+"""
+from django.core.management import call_command
+from django.test import TestCase
+from mock import patch
+
+from courseware.middleware import CountChangesMiddleware
+from courseware.models import StudentModule, StudentModuleGradeCount
+from courseware.tests.factories import StudentModuleFactory
+from xmodule_modifiers import grade_histogram
+
+PROBLEM_ID = 'i4x://MITx/999/problem/counted'
+OTHER_PROBLEM_ID = 'i4x://MITx/999/problem/other'
+
+
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_GRADE_HISTOGRAM_COUNTS': True})
+class TestGradeCounts(TestCase):
+    """
+    Test that grade counts follow the StudentModules' grades.
+    """
+    def histogram(self, module_id=PROBLEM_ID):
+        """Return the histogram read from the grade counts"""
+        return StudentModuleGradeCount.histogram(module_id)
+
+    def test_created_modules_counted(self):
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1)
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1)
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=0)
+        StudentModuleFactory.create(module_state_key=OTHER_PROBLEM_ID, grade=1)
+        self.assertEqual(self.histogram(), [(0, 1), (1, 2)])
+        self.assertEqual(self.histogram(OTHER_PROBLEM_ID), [(1, 1)])
+
+    def test_regrade_moves_count(self):
+        module = StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=0)
+        module = StudentModule.objects.get(pk=module.pk)
+        module.grade = 2
+        module.save()
+        self.assertEqual(self.histogram(), [(2, 1)])
+
+        # saves which leave the grade alone don't touch the counts:
+        module.state = '{"attempts": 1}'
+        with patch.object(StudentModuleGradeCount, 'add') as mock_add:
+            module.save()
+        self.assertFalse(mock_add.called)
+
+    def test_ungraded_modules_hide_histogram(self):
+        module = StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=None)
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1)
+        self.assertEqual(self.histogram(), [])
+
+        module.grade = 0
+        module.save()
+        self.assertEqual(self.histogram(), [(0, 1), (1, 1)])
+
+    def test_deleted_modules_uncounted(self):
+        module = StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1)
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=0)
+        module.delete()
+        self.assertEqual(self.histogram(), [(0, 1)])
+
+        StudentModuleGradeCount.remove_student_modules(list(StudentModule.objects.all()))
+        self.assertEqual(self.histogram(), [])
+
+    def test_only_problems_counted(self):
+        with patch.object(StudentModuleGradeCount, 'add') as mock_add:
+            StudentModuleFactory.create(module_type='sequential', module_state_key=PROBLEM_ID, grade=1)
+            with patch.dict('django.conf.settings.FEATURES', {'ENABLE_GRADE_HISTOGRAM_COUNTS': False}):
+                StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1).delete()
+        self.assertFalse(mock_add.called)
+
+    def test_changes_sent_after_commit(self):
+        middleware = CountChangesMiddleware()
+        middleware.process_request(None)
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1)
+        module = StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=0)
+        module.grade = 1
+        module.save()
+        # nothing is counted until the response has passed through TransactionMiddleware
+        self.assertEqual(self.histogram(), [])
+        with patch.object(StudentModuleGradeCount, 'add', wraps=StudentModuleGradeCount.add) as mock_add:
+            middleware.process_response(None, None)
+        self.assertEqual(self.histogram(), [(1, 2)])
+        # the changes to the grade 0 count cancelled out
+        self.assertEqual(mock_add.call_count, 1)
+
+    def test_rolled_back_changes_dropped(self):
+        middleware = CountChangesMiddleware()
+        middleware.process_request(None)
+        StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=1)
+        middleware.process_exception(None, Exception())
+        middleware.process_response(None, None)
+        self.assertEqual(self.histogram(), [])
+
+    def test_histogram_matches_aggregate(self):
+        for grade in (0, 0.5, 1, 1, 1):
+            StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=grade)
+        with patch.dict('django.conf.settings.FEATURES', {'ENABLE_GRADE_HISTOGRAM_COUNTS': False}):
+            aggregate = grade_histogram(PROBLEM_ID)
+        with self.assertNumQueries(1):
+            self.assertEqual(grade_histogram(PROBLEM_ID), aggregate)
+
+    def test_backfill(self):
+        for grade in (0, 1, 1):
+            StudentModuleFactory.create(module_state_key=PROBLEM_ID, grade=grade)
+        StudentModuleFactory.create(module_state_key=OTHER_PROBLEM_ID, grade=None, course_id='edX/other/course')
+        # lose the counts, and add a wrong one:
+        StudentModuleGradeCount.objects.all().delete()
+        StudentModuleGradeCount.add(PROBLEM_ID, 3)
+
+        call_command('backfill_grade_counts', 'MITx/999/Robot_Super_Course', batch_size=1)
+        self.assertEqual(self.histogram(), [(0, 1), (1, 2)])
+        self.assertFalse(StudentModuleGradeCount.objects.filter(module_state_key=OTHER_PROBLEM_ID).exists())
+
+        call_command('backfill_grade_counts')
+        self.assertTrue(StudentModuleGradeCount.objects.filter(module_state_key=OTHER_PROBLEM_ID, ungraded=True).exists())
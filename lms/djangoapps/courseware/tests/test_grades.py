@@ -1,19 +1,27 @@
 """
 Test grade calculation.
 """
+import textwrap
+from datetime import datetime, timedelta
+
 from django.http import Http404
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
+from django.utils.timezone import UTC
 from mock import patch
 
+from courseware.models import PersistentCourseGrade, StudentModule
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from student.tests.factories import UserFactory
-from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
-from courseware.grades import grade, iterate_grades_for
+from courseware import grades
+from courseware.grades import grade, grading_version, iterate_grades_for
 
 
-def _grade_with_errors(student, request, course, keep_raw_scores=False):
+def _grade_with_errors(student, request, course, keep_raw_scores=False, multi_user_cache=None):
     """This fake grade method will throw exceptions for student3 and
     student4, but allow any other students to go through normal grading.
 
@@ -24,7 +32,7 @@ def _grade_with_errors(student, request, course, keep_raw_scores=False):
     if student.username in ['student3', 'student4']:
         raise Exception("I don't like {}".format(student.username))
 
-    return grade(student, request, course, keep_raw_scores=keep_raw_scores)
+    return grade(student, request, course, keep_raw_scores=keep_raw_scores, multi_user_cache=multi_user_cache)
 
 
 @override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
@@ -120,3 +128,175 @@ class TestGradeIteration(ModuleStoreTestCase):
                 students_to_errors[student] = err_msg
 
         return students_to_gradesets, students_to_errors
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_GRADES': True})
+class TestPersistentGrades(ModuleStoreTestCase):
+    """
+    Test that grade summaries are stored and invalidated when scores change.
+    """
+    def setUp(self):
+        self.course = CourseFactory.create(display_name="persistent_grades_course", number="1001")
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter')
+        section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(parent_location=section.location, category='problem')
+        self.course = modulestore().get_instance(self.course.id, self.course.location, depth=None)
+        self.student = UserFactory.create()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+    def _set_score(self, earned, possible):
+        """Give self.student a score on self.problem."""
+        module, _ = StudentModule.objects.get_or_create(
+            student=self.student,
+            course_id=self.course.id,
+            module_state_key=self.problem.location.url(),
+        )
+        module.grade = earned
+        module.max_grade = possible
+        module.save()
+
+    def test_grade_is_stored(self):
+        grade_summary = grade(self.student, self.request, self.course)
+        cached = PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id)
+        self.assertFalse(cached.stale)
+
+        with patch('courseware.grades._grade') as mock_grade:
+            cached_summary = grade(self.student, self.request, self.course)
+        self.assertFalse(mock_grade.called)
+        self.assertEqual(cached_summary['percent'], grade_summary['percent'])
+        self.assertEqual(cached_summary['section_breakdown'], grade_summary['section_breakdown'])
+        self.assertEqual(cached_summary['totaled_scores'], grade_summary['totaled_scores'])
+
+    def test_score_change_invalidates(self):
+        self.assertEqual(grade(self.student, self.request, self.course)['percent'], 0.0)
+        self._set_score(1, 1)
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).stale)
+        self.assertEqual(grade(self.student, self.request, self.course)['percent'], 1.0)
+
+    def test_unchanged_score_keeps_cache(self):
+        self._set_score(1, 1)
+        grade(self.student, self.request, self.course)
+        module = StudentModule.objects.get(student=self.student, module_state_key=self.problem.location.url())
+        module.state = '{"position": 1}'
+        module.save()
+        self.assertFalse(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).stale)
+
+    def test_deleted_state_invalidates(self):
+        self._set_score(1, 1)
+        grade(self.student, self.request, self.course)
+        StudentModule.objects.get(student=self.student, module_state_key=self.problem.location.url()).delete()
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).stale)
+
+    def test_raw_scores_bypass_cache(self):
+        grade(self.student, self.request, self.course, keep_raw_scores=True)
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student).exists())
+
+    def test_invalidation_while_grading_kept(self):
+        real_grade = grades._grade  # pylint: disable=protected-access
+
+        def grade_and_invalidate(*args, **kwargs):
+            """Compute the grade, with a score change landing meanwhile"""
+            grade_summary = real_grade(*args, **kwargs)
+            PersistentCourseGrade.invalidate(self.student.id, self.course.id)
+            return grade_summary
+
+        # both when the grade is first computed, and when it is recomputed
+        for _ in range(2):
+            with patch('courseware.grades._grade', side_effect=grade_and_invalidate):
+                grade(self.student, self.request, self.course)
+            self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).stale)
+
+    def test_max_score_changes_version(self):
+        version = grading_version(self.course)
+        descriptor = self.course.grading_context['graded_sections']['Homework'][0]['xmoduledescriptors'][0]
+        descriptor.data = textwrap.dedent("""
+            <problem>
+                <choiceresponse><checkboxgroup><choice correct="true">A</choice></checkboxgroup></choiceresponse>
+                <choiceresponse><checkboxgroup><choice correct="true">B</choice></checkboxgroup></choiceresponse>
+            </problem>
+        """)
+        self.assertNotEqual(grading_version(self.course), version)
+
+    def test_release_changes_version(self):
+        descriptor = self.course.grading_context['all_descriptors'][0]
+        descriptor.start = datetime.now(UTC()) + timedelta(days=1)
+        version = grading_version(self.course)
+        self.assertEqual(grading_version(self.course), version)
+        with patch('courseware.grades.datetime') as mock_datetime:
+            mock_datetime.now.return_value = descriptor.start + timedelta(seconds=1)
+            self.assertNotEqual(grading_version(self.course), version)
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+@patch.dict('django.conf.settings.FEATURES', {'DISABLE_START_DATES': True})
+class TestScoreWithoutModule(ModuleStoreTestCase):
+    """
+    Test that grading doesn't build the problems a student hasn't attempted.
+    """
+    PROBLEM_XML = textwrap.dedent("""
+        <problem>
+            <stringresponse answer="a">
+                <textline points="2"/>
+            </stringresponse>
+            <stringresponse answer="b">
+                <textline/>
+            </stringresponse>
+        </problem>
+    """)
+
+    def setUp(self):
+        self.course = CourseFactory.create(display_name="score_without_module_course", number="1002")
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter')
+        self.section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.attempted = ItemFactory.create(parent_location=self.section.location, category='problem', data=self.PROBLEM_XML)
+        self.unattempted = ItemFactory.create(parent_location=self.section.location, category='problem', data=self.PROBLEM_XML)
+        self.course = modulestore().get_instance(self.course.id, self.course.location, depth=None)
+        self.student = UserFactory.create()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+        StudentModule.objects.create(
+            student=self.student,
+            course_id=self.course.id,
+            module_state_key=self.attempted.location.url(),
+            module_type='problem',
+            grade=3,
+            max_grade=3,
+        )
+
+    def test_unattempted_problem_not_built(self):
+        with patch('courseware.grades.get_module_for_descriptor') as mock_get_module:
+            grade_summary = grade(self.student, self.request, self.course, keep_raw_scores=True)
+        self.assertFalse(mock_get_module.called)
+        scores = sorted((score.earned, score.possible) for score in grade_summary['raw_scores'])
+        self.assertEqual(scores, [(0, 3), (3, 3)])
+
+    def test_unbuildable_problem_excluded(self):
+        # a problem whose script fails is built as an ErrorModule, which has no maximum score
+        ItemFactory.create(
+            parent_location=self.section.location,
+            category='problem',
+            data=textwrap.dedent("""
+                <problem>
+                    <script type="loncapa/python">raise ValueError()</script>
+                    <stringresponse answer="a">
+                        <textline/>
+                    </stringresponse>
+                </problem>
+            """)
+        )
+        self.course = modulestore().get_instance(self.course.id, self.course.location, depth=None)
+        grade_summary = grade(self.student, self.request, self.course, keep_raw_scores=True)
+        scores = sorted((score.earned, score.possible) for score in grade_summary['raw_scores'])
+        self.assertEqual(scores, [(0, 3), (3, 3)])
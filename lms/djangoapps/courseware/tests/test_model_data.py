@@ -6,7 +6,7 @@ from mock import Mock, patch
 from functools import partial
 
 from courseware.model_data import DjangoKeyValueStore
-from courseware.model_data import InvalidScopeError, FieldDataCache
+from courseware.model_data import InvalidScopeError, FieldDataCache, MultiUserFieldDataCache
 from courseware.models import StudentModule, XModuleUserStateSummaryField
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
@@ -189,6 +189,44 @@ class TestMissingStudentModule(TestCase):
         self.assertFalse(self.kvs.has(user_state_key('a_field')))
 
 
+class TestMultiUserFieldDataCache(TestCase):
+    """
+    Tests loading module state for many users at once.
+    """
+    def setUp(self):
+        self.users = [
+            StudentModuleFactory(state=json.dumps({'a_field': 'value_{}'.format(index)})).student
+            for index in range(3)
+        ]
+        self.user_without_state = UserFactory.create()
+        self.descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+        self.multi_user_cache = MultiUserFieldDataCache(
+            [self.descriptor], course_id, self.users + [self.user_without_state]
+        )
+
+    def test_loads_all_users_in_one_query(self):
+        with self.assertNumQueries(1):
+            for index, user in enumerate(self.users):
+                kvs = DjangoKeyValueStore(self.multi_user_cache.cache_for_user(user, [self.descriptor]))
+                self.assertEquals('value_{}'.format(index), kvs.get(user_state_key('a_field')))
+            kvs = DjangoKeyValueStore(self.multi_user_cache.cache_for_user(self.user_without_state, [self.descriptor]))
+            self.assertFalse(kvs.has(user_state_key('a_field')))
+
+    def test_get_student_module(self):
+        student_module = self.multi_user_cache.get_student_module(self.users[1], location('usage_id'))
+        self.assertEquals(self.users[1].id, student_module.student_id)
+        self.assertIsNone(self.multi_user_cache.get_student_module(self.user_without_state, location('usage_id')))
+        self.assertTrue(self.multi_user_cache.has_student_module(self.users[0], [location('usage_id')]))
+        self.assertFalse(self.multi_user_cache.has_student_module(self.user_without_state, [location('usage_id')]))
+
+    def test_uncovered_descriptor_queries(self):
+        other_descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+        other_descriptor.scope_ids = ScopeIds('user1', 'mock_problem', location('def_id'), location('other_id'))
+        self.assertFalse(self.multi_user_cache.covers([other_descriptor]))
+        with self.assertNumQueries(1):
+            self.multi_user_cache.cache_for_user(self.users[0], [other_descriptor])
+
+
 class StorageTestBase(object):
     """
     A base class for that gets subclassed when testing each of the scopes.
@@ -15,6 +15,7 @@ from django.test.utils import override_settings
 from xblock.field_data import FieldData
 from xblock.runtime import Runtime
 from xblock.fields import ScopeIds
+from xmodule.exceptions import NotFoundError
 from xmodule.lti_module import LTIDescriptor
 from xmodule.modulestore import Location
 from xmodule.modulestore.django import modulestore
@@ -522,6 +523,55 @@ class TestHtmlModifiers(ModuleStoreTestCase):
             result_fragment.content
         )
 
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_LAZY_SEQUENCE_RENDERING': True})
+@override_settings(SEQUENCE_PREFETCH_UNITS=0)
+class TestLazySequenceRendering(ModuleStoreTestCase):
+    """
+    Test that sequences render only their active units up front, when
+    ENABLE_LAZY_SEQUENCE_RENDERING is set
+    """
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = {}
+        self.course = CourseFactory.create()
+        self.sequence = ItemFactory.create(parent_location=self.course.location, category='sequential')
+        for index in range(3):
+            vertical = ItemFactory.create(
+                parent_location=self.sequence.location, category='vertical', display_name='Unit {0}'.format(index)
+            )
+            ItemFactory.create(
+                parent_location=vertical.location, category='html', data='<p>Content {0}</p>'.format(index)
+            )
+
+    def get_sequence(self):
+        """Return the sequence module, with a cache scoped as the LMS scopes it"""
+        descriptor = modulestore().get_instance(self.course.id, self.sequence.location)
+        self.assertTrue(render.renders_children_lazily(descriptor))
+        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+            self.course.id, self.user, descriptor, depth=1
+        )
+        return render.get_module(self.user, self.request, self.sequence.location, field_data_cache, self.course.id)
+
+    def test_only_active_unit_rendered(self):
+        content = self.get_sequence().render('student_view').content
+        self.assertIn('Content 0', content)
+        self.assertNotIn('Content 1', content)
+        self.assertNotIn('Content 2', content)
+        # the units left out are still listed:
+        self.assertIn('Unit 2', content)
+        self.assertIn('data-loaded="false"', content)
+
+    def test_render_unit(self):
+        response = json.loads(self.get_sequence().handle_ajax('render_unit', {'position': '3'}))
+        self.assertIn('Content 2', response['content'])
+        self.assertNotIn('Content 0', response['content'])
+
+        with self.assertRaises(NotFoundError):
+            self.get_sequence().handle_ajax('render_unit', {'position': '4'})
+
+
 PER_COURSE_ANONYMIZED_DESCRIPTORS = (LTIDescriptor, )
 
 PER_STUDENT_ANONYMIZED_DESCRIPTORS = [
@@ -25,7 +25,7 @@ from courseware.courses import (get_courses, get_course_with_access,
 import courseware.tabs as tabs
 from courseware.masquerade import setup_masquerade
 from courseware.model_data import FieldDataCache
-from .module_render import toc_for_course, get_module_for_descriptor, get_module
+from .module_render import toc_for_course, get_module_for_descriptor, get_module, renders_children_lazily
 from courseware.models import StudentModule, StudentModuleHistory
 from course_modes.models import CourseMode
 
@@ -311,9 +311,11 @@ def index(request, course_id, chapter=None, section=None,
             section_descriptor = modulestore().get_instance(course.id, section_descriptor.location, depth=None)
 
             # Load all descendants of the section, because we're going to display its
-            # html, which in general will need all of its children
+            # html, which in general will need all of its children. (Sequences that
+            # render their units lazily load the state of those they render themselves.)
             section_field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
-                course_id, user, section_descriptor, depth=None)
+                course_id, user, section_descriptor,
+                depth=1 if renders_children_lazily(section_descriptor) else None)
 
             section_module = get_module_for_descriptor(request.user,
                 request,
@@ -5,23 +5,78 @@ Module for checking permissions with the comment_client backend
 import logging
 from django.core import cache
 
+from django_comment_common.models import Permission, FORUM_ROLE_STUDENT
+from request_cache.middleware import RequestCache
+from xmodule.course_module import CourseDescriptor
+from xmodule.modulestore.django import modulestore
+
 
 CACHE = cache.get_cache('default')
 CACHE_LIFESPAN = 60
 
+# Permissions that students lose in courses which don't allow forum posts
+STUDENT_POSTING_PERMISSION_PREFIXES = ('edit', 'update', 'create')
+
 
 def cached_has_permission(user, permission, course_id=None):
     """
-    Call has_permission if it's not cached. A change in a user's role or
+    Return whether user has permission in the course, from the user's
+    permissions (see get_user_permissions). A change in a user's role or
     a role's permissions will only become effective after CACHE_LIFESPAN seconds.
     """
-    key = u"permission_{user_id:d}_{course_id}_{permission}".format(
-        user_id=user.id, course_id=course_id, permission=permission)
-    val = CACHE.get(key, None)
-    if val not in [True, False]:
-        val = has_permission(user, permission, course_id=course_id)
-        CACHE.set(key, val, CACHE_LIFESPAN)
-    return val
+    return permission in get_user_permissions(user, course_id)
+
+
+def get_user_permissions(user, course_id=None):
+    """
+    Return the set of names of the permissions that the user's roles give it
+    in the course, as has_permission checks them one by one.
+
+    The set is computed (with a single query) at most once per request, and
+    is cached for CACHE_LIFESPAN seconds, so that checking any number of
+    permissions costs a single cache lookup.
+    """
+    key = u"permissions_{user_id:d}_{course_id}".format(user_id=user.id, course_id=course_id)
+    request_cache = RequestCache.get_request_cache().data.setdefault('forum_permissions', {})
+    permissions = request_cache.get(key)
+    if permissions is None:
+        permissions = CACHE.get(key, None)
+        if permissions is None:
+            permissions = _compute_user_permissions(user, course_id)
+            CACHE.set(key, permissions, CACHE_LIFESPAN)
+        request_cache[key] = permissions
+    return permissions
+
+
+def _compute_user_permissions(user, course_id):
+    """
+    Return the frozenset of names of the permissions that the user's roles
+    give it in the course
+    """
+    role_permissions = Permission.roles.through.objects.filter(
+        role__users=user, role__course_id=course_id
+    ).values_list('role__name', 'permission_id')
+
+    permissions = set()
+    student_posting_permissions = set()
+    for role_name, permission in role_permissions:
+        if role_name == FORUM_ROLE_STUDENT and permission.startswith(STUDENT_POSTING_PERMISSION_PREFIXES):
+            student_posting_permissions.add(permission)
+        else:
+            permissions.add(permission)
+
+    # only look the course up if its students' posting permissions matter
+    if not student_posting_permissions.issubset(permissions) and _forum_posts_allowed(course_id):
+        permissions.update(student_posting_permissions)
+    return frozenset(permissions)
+
+
+def _forum_posts_allowed(course_id):
+    """
+    Return whether the course allows students to post in its forums
+    """
+    course_loc = CourseDescriptor.id_to_location(course_id)
+    return modulestore().get_instance(course_id, course_loc).forum_posts_allowed
 
 
 def has_permission(user, permission, course_id=None):
@@ -63,11 +118,13 @@ def check_conditions_permissions(user, permissions, course_id, **kwargs):
     a list.
     """
 
+    user_permissions = get_user_permissions(user, course_id)
+
     def test(user, per, operator="or"):
         if isinstance(per, basestring):
             if per in CONDITIONS:
                 return check_condition(user, per, course_id, kwargs)
-            return cached_has_permission(user, per, course_id=course_id)
+            return per in user_permissions
         elif isinstance(per, list) and operator in ["and", "or"]:
             results = [test(user, x, operator="and") for x in per]
             if operator == "or":
@@ -2,10 +2,13 @@ import string       # pylint: disable=W0402
 import random
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from mock import patch
 
+from request_cache.middleware import RequestCache
 from student.models import CourseEnrollment
-from django_comment_client.permissions import has_permission
+from django_comment_client.permissions import cached_has_permission, get_user_permissions, has_permission
 from django_comment_common.models import Role
 
 
@@ -48,3 +51,37 @@ class PermissionsTestCase(TestCase):
 
         self.student_role.add_permission(name)
         self.assertTrue(has_permission(self.student, name, self.course_id))
+
+    def testUserPermissions(self):
+        name = self.random_str()
+        self.student_role.add_permission(name)
+        self.moderator_role.add_permission('see_all_cohorts')
+        cache.clear()
+        RequestCache().clear_request_cache()
+
+        with self.assertNumQueries(1):
+            permissions = get_user_permissions(self.student, self.course_id)
+            # further checks in the request use the same permissions:
+            self.assertTrue(cached_has_permission(self.student, name, self.course_id))
+            self.assertFalse(cached_has_permission(self.student, 'see_all_cohorts', self.course_id))
+        self.assertEqual(permissions, frozenset([name]))
+        self.assertEqual(get_user_permissions(self.moderator, self.course_id), frozenset(['see_all_cohorts']))
+        for permission in permissions:
+            self.assertTrue(has_permission(self.student, permission, self.course_id))
+
+        # a new request reads the permissions from the cache:
+        RequestCache().clear_request_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_permissions(self.student, self.course_id), permissions)
+
+    def testUserPermissionsWithoutForumPosts(self):
+        name = 'create_' + self.random_str()
+        self.student_role.add_permission(name)
+        self.moderator_role.add_permission(name)
+        cache.clear()
+        RequestCache().clear_request_cache()
+
+        with patch('django_comment_client.permissions._forum_posts_allowed', return_value=False):
+            self.assertNotIn(name, get_user_permissions(self.student, self.course_id))
+            # the restriction only applies to the student role:
+            self.assertIn(name, get_user_permissions(self.moderator, self.course_id))
@@ -296,10 +296,13 @@ def get_annotated_content_infos(course_id, thread, user, user_info):
 
 
 def get_metadata_for_threads(course_id, threads, user, user_info):
-    def infogetter(thread):
-        return get_annotated_content_infos(course_id, thread, user, user_info)
-
-    metadata = reduce(merge_dict, map(infogetter, threads), {})
+    """
+    Get metadata for threads and their children, checking the user's
+    permissions against the permissions computed once for the request
+    """
+    metadata = {}
+    for thread in threads:
+        metadata.update(get_annotated_content_infos(course_id, thread, user, user_info))
     return metadata
 
 # put this method in utils.py to avoid circular import dependency between helpers and mustache_helpers
@@ -51,4 +51,6 @@ urlpatterns = patterns('',  # nopep8
         'instructor.views.api.list_grade_downloads', name="list_grade_downloads"),
     url(r'calculate_grades_csv$',
         'instructor.views.api.calculate_grades_csv', name="calculate_grades_csv"),
+    url(r'calculate_answer_distribution_csv$',
+        'instructor.views.api.calculate_answer_distribution_csv', name="calculate_answer_distribution_csv"),
 )
@@ -50,8 +50,10 @@ from instructor_task.api import (
     submit_rescore_problem_for_all_students,
     submit_rescore_problem_for_student,
     submit_reset_problem_attempts_for_all_students,
-    submit_bulk_course_email
+    submit_bulk_course_email,
+    submit_calculate_answer_distribution_csv,
 )
+from instructor_task.api_helper import AlreadyRunningError
 from instructor_task.views import get_task_completion_info
 from edxmako.shortcuts import render_to_response, render_to_string
 from psychometrics import psychoanalyze
@@ -254,7 +256,23 @@ def instructor_dashboard(request, course_id):
 
     elif 'Download CSV of answer distributions' in action:
         track.views.server_track(request, "dump-answer-dist-csv", {}, page="idashboard")
-        return return_csv('answer_dist_{0}.csv'.format(course_id), get_answers_distribution(request, course_id))
+        # With the answer counts, the distribution is read without scanning
+        # the course's StudentModules, so it can be returned right away.
+        if (settings.FEATURES.get('ENABLE_ANSWER_DISTRIBUTION_COUNTS') or
+                not settings.FEATURES.get('ENABLE_S3_GRADE_DOWNLOADS')):
+            return return_csv('answer_dist_{0}.csv'.format(course_id), get_answers_distribution(request, course_id))
+
+        # Computing the distribution can take longer than a request for large
+        # courses, so it is done in the background, like the grade reports.
+        try:
+            submit_calculate_answer_distribution_csv(request, course_id)
+            msg += _u("The answer distribution report is being generated in the background. "
+                      "When it is ready, it can be downloaded from the Data Download section "
+                      "of the instructor dashboard.")
+        except AlreadyRunningError:
+            msg += '<font color="red">{text}</font>'.format(
+                text=_u("An answer distribution report is already being generated.")
+            )
 
     elif 'Dump description of graded assignments configuration' in action:
         # what is "graded assignments configuration"?
@@ -298,7 +298,8 @@ class S3GradesStore(GradesStore):
         """
         Given a `course_id`, `filename`, and `rows` (each row is an iterable of
         strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        that buffer. `rows` may be any iterable, including a generator, so
+        only the compressed output is held in memory.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
@@ -310,6 +311,24 @@ class S3GradesStore(GradesStore):
 
         self.store(course_id, filename, output_buffer)
 
+    def rows_for(self, course_id, filename):
+        """
+        Return an iterator over the rows of the gzip'd csv file previously
+        written by `store_rows()` for `course_id` and `filename`.
+        """
+        key = self.key_for(course_id, filename)
+        gzip_file = GzipFile(fileobj=StringIO(key.get_contents_as_string()), mode="rb")
+        return csv.reader(gzip_file)
+
+    def delete(self, course_id, filename):
+        """Remove the stored file `filename` for `course_id`."""
+        self.key_for(course_id, filename).delete()
+
+    def filenames_for(self, course_id):
+        """Return a sorted list of the names of all files stored for `course_id`."""
+        course_dir = self.key_for(course_id, '')
+        return sorted(key.key.split("/")[-1] for key in self.bucket.list(prefix=course_dir.key))
+
     def links_for(self, course_id):
         """
         For a given `course_id`, return a list of `(filename, url)` tuples. `url`
@@ -380,12 +399,34 @@ class LocalFSGradesStore(GradesStore):
     def store_rows(self, course_id, filename, rows):
         """
         Given a course_id, filename, and rows (each row is an iterable of strings),
-        write this data out.
+        write this data out. `rows` may be any iterable, including a generator.
         """
         output_buffer = StringIO()
         csv.writer(output_buffer).writerows(rows)
         self.store(course_id, filename, output_buffer)
 
+    def rows_for(self, course_id, filename):
+        """
+        Return an iterator over the rows of the csv file previously written by
+        `store_rows()` for `course_id` and `filename`.
+        """
+        with open(self.path_to(course_id, filename), "rb") as f:
+            for row in csv.reader(f):
+                yield row
+
+    def delete(self, course_id, filename):
+        """Remove the stored file `filename` for `course_id`."""
+        full_path = self.path_to(course_id, filename)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+
+    def filenames_for(self, course_id):
+        """Return a sorted list of the names of all files stored for `course_id`."""
+        course_dir = self.path_to(course_id, '')
+        if not os.path.exists(course_dir):
+            return []
+        return sorted(os.listdir(course_dir))
+
     def links_for(self, course_id):
         """
         For a given `course_id`, return a list of `(filename, url)` tuples. `url`
@@ -29,6 +29,14 @@ class DuplicateTaskException(Exception):
     pass
 
 
+class SubtaskLockedException(DuplicateTaskException):
+    """
+    Exception indicating that a subtask is already being worked on by another worker
+    (or was being worked on by a worker that died before releasing its lock).
+    """
+    pass
+
+
 def _get_number_of_subtasks(total_num_items, items_per_query, items_per_task):
     """
     Determines number of subtasks that would be generated by _generate_items_for_subtask.
@@ -364,7 +372,8 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
     so that we can detect if another worker has started work but has not yet completed that work.
     The other worker is allowed to finish, and this raises an exception.
 
-    Raises a DuplicateTaskException exception if it's not a task that should be run.
+    Raises a DuplicateTaskException exception if it's not a task that should be run, or
+    more specifically a SubtaskLockedException if another worker holds the lock on it.
 
     If this succeeds, it requires that update_subtask_status() is called to release the lock on the
     task.
@@ -421,13 +430,16 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
         msg = format_str.format(current_task_id, entry)
         TASK_LOG.warning(msg)
         dog_stats_api.increment('instructor_task.subtask.duplicate.locked', tags=[entry.course_id])
-        raise DuplicateTaskException(msg)
+        raise SubtaskLockedException(msg)
 
 
-def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0):
+def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0, complete_parent=True):
     """
     Update the status of the subtask in the parent InstructorTask object tracking its progress.
 
+    If `complete_parent` is False, the parent is left in progress when its last subtask
+    is done, for the caller to complete (e.g. once it has merged the subtasks' results).
+
     Because select_for_update is used to lock the InstructorTask object while it is being updated,
     multiple subtasks updating at the same time may time out while waiting for the lock.
     The actual update operation is surrounded by a try/except/else that permits the update to be
@@ -437,7 +449,7 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
     the attempting of retries has concluded.
     """
     try:
-        _update_subtask_status(entry_id, current_task_id, new_subtask_status)
+        _update_subtask_status(entry_id, current_task_id, new_subtask_status, complete_parent)
     except DatabaseError:
         # If we fail, try again recursively.
         retry_count += 1
@@ -445,7 +457,7 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
             TASK_LOG.info("Retrying to update status for subtask %s of instructor task %d with status %s:  retry %d",
                           current_task_id, entry_id, new_subtask_status, retry_count)
             dog_stats_api.increment('instructor_task.subtask.retry_after_failed_update')
-            update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count)
+            update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count, complete_parent)
         else:
             TASK_LOG.info("Failed to update status after %d retries for subtask %s of instructor task %d with status %s",
                           retry_count, current_task_id, entry_id, new_subtask_status)
@@ -459,7 +471,7 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
 
 
 @transaction.commit_manually
-def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
+def _update_subtask_status(entry_id, current_task_id, new_subtask_status, complete_parent=True):
     """
     Update the status of the subtask in the parent InstructorTask object tracking its progress.
 
@@ -479,7 +491,7 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     subtasks.  'Total' is expected to have been set at the time the subtasks were created.
     The other three counters are incremented depending on the value of `status`.  Once the counters
     for 'succeeded' and 'failed' match the 'total', the subtasks are done and the InstructorTask's
-    "status" is changed to SUCCESS.
+    "status" is changed to SUCCESS (unless `complete_parent` is False).
 
     The "subtasks" field also contains a 'status' key, that contains a dict that stores status
     information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
@@ -535,7 +547,7 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
         # At present, we mark the task as having succeeded.  In future, we should see
         # if there was a catastrophic failure that occurred, and figure out how to
         # report that here.
-        if num_remaining <= 0:
+        if num_remaining <= 0 and complete_parent:
             entry.task_state = SUCCESS
         entry.subtasks = json.dumps(subtask_dict)
         entry.task_output = InstructorTask.create_output_for_success(task_progress)
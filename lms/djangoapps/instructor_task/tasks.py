@@ -16,7 +16,9 @@ The task definition then calls the traversal function, passing in the three argu
 above, along with the id value for an InstructorTask object.  The InstructorTask
 object contains a 'task_input' row which is a JSON-encoded dict containing
 a problem URL and optionally a student.  These are used to set up the initial value
-of the query for traversing StudentModule objects.
+of the query for traversing StudentModule objects.  When there are many StudentModule
+objects to visit, the traversal is split among "chunk" subtasks, each of which visits
+a fixed list of them.
 
 """
 from django.conf import settings
@@ -27,10 +29,16 @@ from instructor_task.tasks_helper import (
     run_main_task,
     BaseInstructorTask,
     perform_module_state_update,
+    perform_module_state_update_chunk,
     rescore_problem_module_state,
     reset_attempts_module_state,
+    reset_attempts_module_states,
     delete_problem_module_state,
+    delete_problem_module_states,
     push_grades_to_s3,
+    push_grades_chunk_to_s3,
+    push_answer_distribution_to_s3,
+    push_answer_distribution_chunk_to_s3,
 )
 from bulk_email.tasks import perform_delegate_email_batches
 
@@ -62,7 +70,8 @@ def rescore_problem(entry_id, xmodule_instance_args):
         """Filter that matches problems which are marked as being done"""
         return modules_to_update.filter(state__contains='"done": true')
 
-    visit_fcn = partial(perform_module_state_update, update_fcn, filter_fcn)
+    visit_fcn = partial(perform_module_state_update, update_fcn, filter_fcn,
+                        chunk_task=rescore_problem_chunk, xmodule_instance_args=xmodule_instance_args)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -84,7 +93,10 @@ def reset_problem_attempts(entry_id, xmodule_instance_args):
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('reset')
     update_fcn = partial(reset_attempts_module_state, xmodule_instance_args)
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    bulk_update_fcn = partial(reset_attempts_module_states, xmodule_instance_args)
+    visit_fcn = partial(perform_module_state_update, update_fcn, None,
+                        chunk_task=reset_problem_attempts_chunk, xmodule_instance_args=xmodule_instance_args,
+                        bulk_update_fcn=bulk_update_fcn)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -106,10 +118,60 @@ def delete_problem_state(entry_id, xmodule_instance_args):
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('deleted')
     update_fcn = partial(delete_problem_module_state, xmodule_instance_args)
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    bulk_update_fcn = partial(delete_problem_module_states, xmodule_instance_args)
+    visit_fcn = partial(perform_module_state_update, update_fcn, None,
+                        chunk_task=delete_problem_state_chunk, xmodule_instance_args=xmodule_instance_args,
+                        bulk_update_fcn=bulk_update_fcn)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
+@task(acks_late=True)  # pylint: disable=E1102
+def rescore_problem_chunk(entry_id, xmodule_instance_args, action_name, module_ids, subtask_status_dict):
+    """
+    Rescore the StudentModules with ids `module_ids` as a subtask of `rescore_problem`.
+
+    `entry_id` is the id value of the InstructorTask entry for the parent task, and
+    `subtask_status_dict` the dict representation of this subtask's SubtaskStatus.
+    """
+    update_fcn = partial(rescore_problem_module_state, xmodule_instance_args)
+    return perform_module_state_update_chunk(
+        rescore_problem_chunk, update_fcn, entry_id, action_name, module_ids, subtask_status_dict
+    )
+
+
+@task(acks_late=True)  # pylint: disable=E1102
+def reset_problem_attempts_chunk(entry_id, xmodule_instance_args, action_name, module_ids, subtask_status_dict):
+    """
+    Reset attempts for the StudentModules with ids `module_ids` as a subtask of
+    `reset_problem_attempts`.
+
+    `entry_id` is the id value of the InstructorTask entry for the parent task, and
+    `subtask_status_dict` the dict representation of this subtask's SubtaskStatus.
+    """
+    update_fcn = partial(reset_attempts_module_state, xmodule_instance_args)
+    bulk_update_fcn = partial(reset_attempts_module_states, xmodule_instance_args)
+    return perform_module_state_update_chunk(
+        reset_problem_attempts_chunk, update_fcn, entry_id, action_name, module_ids, subtask_status_dict,
+        bulk_update_fcn=bulk_update_fcn
+    )
+
+
+@task(acks_late=True)  # pylint: disable=E1102
+def delete_problem_state_chunk(entry_id, xmodule_instance_args, action_name, module_ids, subtask_status_dict):
+    """
+    Delete the StudentModules with ids `module_ids` as a subtask of `delete_problem_state`.
+
+    `entry_id` is the id value of the InstructorTask entry for the parent task, and
+    `subtask_status_dict` the dict representation of this subtask's SubtaskStatus.
+    """
+    update_fcn = partial(delete_problem_module_state, xmodule_instance_args)
+    bulk_update_fcn = partial(delete_problem_module_states, xmodule_instance_args)
+    return perform_module_state_update_chunk(
+        delete_problem_state_chunk, update_fcn, entry_id, action_name, module_ids, subtask_status_dict,
+        bulk_update_fcn=bulk_update_fcn
+    )
+
+
 @task(base=BaseInstructorTask)  # pylint: disable=E1102
 def send_bulk_course_email(entry_id, _xmodule_instance_args):
     """Sends emails to recipients enrolled in a course.
@@ -135,7 +197,47 @@ def send_bulk_course_email(entry_id, _xmodule_instance_args):
 def calculate_grades_csv(entry_id, xmodule_instance_args):
     """
     Grade a course and push the results to an S3 bucket for download.
+
+    The grading itself is done by `calculate_grades_csv_chunk` subtasks.
     """
     action_name = ugettext_noop('graded')
-    task_fn = partial(push_grades_to_s3, xmodule_instance_args)
+    task_fn = partial(push_grades_to_s3, calculate_grades_csv_chunk, xmodule_instance_args)
+    return run_main_task(entry_id, task_fn, action_name)
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_grades_csv_chunk(entry_id, course_id, student_ids, subtask_status_dict):
+    """
+    Grade one range of enrolled students as a subtask of `calculate_grades_csv`.
+
+    `entry_id` is the id value of the InstructorTask entry for the parent task,
+    `student_ids` the ids of the users to grade, and `subtask_status_dict` the
+    dict representation of this subtask's SubtaskStatus.
+    """
+    return push_grades_chunk_to_s3(entry_id, course_id, student_ids, subtask_status_dict)
+
+
+@task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_answer_distribution_csv(entry_id, xmodule_instance_args):
+    """
+    Compute the distribution of the answers submitted to a course's problems
+    and push the results to an S3 bucket for download.
+
+    The answers are counted by `calculate_answer_distribution_csv_chunk` subtasks.
+    """
+    action_name = ugettext_noop('counted')
+    task_fn = partial(push_answer_distribution_to_s3, calculate_answer_distribution_csv_chunk, xmodule_instance_args)
     return run_main_task(entry_id, task_fn, action_name)
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_answer_distribution_csv_chunk(entry_id, course_id, student_module_ids, subtask_status_dict):
+    """
+    Count the answers in one range of submitted problem StudentModules as a
+    subtask of `calculate_answer_distribution_csv`.
+
+    `entry_id` is the id value of the InstructorTask entry for the parent task,
+    `student_module_ids` the ids of the StudentModules, and `subtask_status_dict`
+    the dict representation of this subtask's SubtaskStatus.
+    """
+    return push_answer_distribution_chunk_to_s3(entry_id, course_id, student_module_ids, subtask_status_dict)
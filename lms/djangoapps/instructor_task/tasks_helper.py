@@ -5,25 +5,38 @@ running state of a course.
 """
 import json
 import urllib
-from datetime import datetime
+from collections import defaultdict
 from time import time
 
 from celery import Task, current_task
 from celery.utils.log import get_task_logger
-from celery.states import SUCCESS, FAILURE
+from celery.states import SUCCESS, FAILURE, READY_STATES
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction, reset_queries
+from django.core.cache import cache
+from django.db import connections, router, transaction, reset_queries
+from django.db.models.sql import DeleteQuery
+from django.utils import timezone
 from dogapi import dog_stats_api
-from pytz import UTC
 
 from xmodule.modulestore.django import modulestore
-from track.views import task_track
+from track.views import task_track, task_track_many
 
-from courseware.grades import iterate_grades_for
-from courseware.models import StudentModule
+from courseware.grades import count_answers, iterate_grades_for, iterate_submitted_problem_states, name_answer_counts
+from courseware.models import (
+    PersistentCourseGrade, StudentModule, StudentModuleAnswerCount, StudentModuleGradeCount, StudentModuleHistory
+)
 from courseware.model_data import FieldDataCache
 from courseware.module_render import get_module_for_descriptor_internal
 from instructor_task.models import GradesStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    SubtaskLockedException,
+    SUBTASK_LOCK_EXPIRE,
+    queue_subtasks_for_query,
+    check_subtask_is_valid,
+    update_subtask_status,
+)
 from student.models import CourseEnrollment
 
 # define different loggers for use within tasks and on client side
@@ -37,6 +50,12 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# suffix of the chunk recording what a failed report subtask was to cover
+FAILED_CHUNK_SUFFIX = u"_failed_err.csv"
+
+# How long to keep the saved progress of a module state update subtask, so that it can be resumed.
+MODULE_STATE_UPDATE_CURSOR_EXPIRE = 60 * 60 * 24
+
 
 class BaseInstructorTask(Task):
     """
@@ -207,7 +226,8 @@ def run_main_task(entry_id, task_fcn, action_name):
     return task_progress
 
 
-def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name):
+def perform_module_state_update(update_fcn, filter_fcn, entry_id, course_id, task_input, action_name,
+                                chunk_task=None, xmodule_instance_args=None, bulk_update_fcn=None):
     """
     Performs generic update by visiting StudentModule instances with the update_fcn provided.
 
@@ -225,6 +245,15 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     the update is successful; False indicates the update on the particular student module failed.
     A raised exception indicates a fatal condition -- that no other student modules should be considered.
 
+    If a `bulk_update_fcn` is given, and bulk updates are enabled (by the ENABLE_BULK_MODULE_STATE_UPDATES
+    feature), it is called instead of `update_fcn`, on lists of up to settings.MODULE_STATE_BULK_UPDATE_SIZE
+    StudentModules at a time, and returns a list of their update statuses.
+
+    If a `chunk_task` is given and there are more than settings.MODULE_STATE_UPDATES_PER_TASK
+    StudentModules to update, they are instead split among `chunk_task` subtasks, which are
+    passed `xmodule_instance_args` (see `perform_module_state_update_chunk`), and the
+    InstructorTask's progress is updated as those subtasks complete.
+
     The return value is a dict containing the task's results, with the following keys:
 
           'attempted': number of attempts made
@@ -244,6 +273,16 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     # get start time for task:
     start_time = time()
 
+    if chunk_task is not None:
+        # If subtasks have already been defined, this task has been requeued (e.g.
+        # after a loss of connection to the broker); the subtasks that were queued
+        # the first time around are already doing the work.
+        entry = InstructorTask.objects.get(pk=entry_id)
+        if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+            TASK_LOG.warning("Task %s has already been processed for %s!  InstructorTask = %s",
+                             entry.task_id, action_name, entry)
+            return json.loads(entry.task_output)
+
     module_state_key = task_input.get('problem_url')
     student_identifier = task_input.get('student')
 
@@ -271,50 +310,202 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     if filter_fcn is not None:
         modules_to_update = filter_fcn(modules_to_update)
 
-    # perform the main loop
-    num_attempted = 0
-    num_succeeded = 0
-    num_skipped = 0
-    num_failed = 0
     num_total = modules_to_update.count()
 
+    if chunk_task is not None and num_total > settings.MODULE_STATE_UPDATES_PER_TASK:
+        def _create_module_state_update_subtask(module_list, initial_subtask_status):
+            """Creates a subtask to update a given list of StudentModules."""
+            return chunk_task.subtask(
+                (
+                    entry_id,
+                    xmodule_instance_args,
+                    action_name,
+                    [module['pk'] for module in module_list],
+                    initial_subtask_status.to_dict(),
+                ),
+                task_id=initial_subtask_status.task_id,
+            )
+
+        return queue_subtasks_for_query(
+            entry,
+            action_name,
+            _create_module_state_update_subtask,
+            modules_to_update,
+            [],
+            settings.MODULE_STATE_UPDATES_PER_QUERY,
+            settings.MODULE_STATE_UPDATES_PER_TASK,
+        )
+
+    # perform the main loop
+    counts = {'attempted': 0, 'succeeded': 0, 'skipped': 0, 'failed': 0}
+
     def get_task_progress():
         """Return a dict containing info about current task"""
         current_time = time()
         progress = {'action_name': action_name,
-                    'attempted': num_attempted,
-                    'succeeded': num_succeeded,
-                    'skipped': num_skipped,
-                    'failed': num_failed,
+                    'attempted': counts['attempted'],
+                    'succeeded': counts['succeeded'],
+                    'skipped': counts['skipped'],
+                    'failed': counts['failed'],
                     'total': num_total,
                     'duration_ms': int((current_time - start_time) * 1000),
                     }
         return progress
 
-    task_progress = get_task_progress()
-    _get_current_task().update_state(state=PROGRESS, meta=task_progress)
-    for module_to_update in modules_to_update:
-        num_attempted += 1
-        # There is no try here:  if there's an error, we let it throw, and the task will
-        # be marked as FAILED, with a stack trace.
-        with dog_stats_api.timer('instructor_tasks.module.time.step', tags=['action:{name}'.format(name=action_name)]):
-            update_status = update_fcn(module_descriptor, module_to_update)
-            if update_status == UPDATE_STATUS_SUCCEEDED:
-                # If the update_fcn returns true, then it performed some kind of work.
-                # Logging of failures is left to the update_fcn itself.
-                num_succeeded += 1
-            elif update_status == UPDATE_STATUS_FAILED:
-                num_failed += 1
-            elif update_status == UPDATE_STATUS_SKIPPED:
-                num_skipped += 1
-            else:
-                raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+    def update_task_progress(_last_pk):
+        """Update the task's status with its current progress"""
+        _get_current_task().update_state(state=PROGRESS, meta=get_task_progress())
 
-        # update task status:
-        task_progress = get_task_progress()
-        _get_current_task().update_state(state=PROGRESS, meta=task_progress)
+    update_task_progress(None)
+    _update_module_states(
+        update_fcn, module_descriptor, modules_to_update, action_name, counts, update_task_progress, bulk_update_fcn
+    )
 
-    return task_progress
+    return get_task_progress()
+
+
+def _update_module_states(update_fcn, module_descriptor, modules_to_update, action_name, counts, progress_fcn,
+                          bulk_update_fcn=None):
+    """
+    Call `update_fcn` on each of the StudentModules in `modules_to_update`, in order of pk,
+    counting the results in the 'attempted', 'succeeded', 'failed' and 'skipped' keys of `counts`.
+    If `bulk_update_fcn` is given and bulk updates are enabled, call it on lists of
+    StudentModules instead (see `perform_module_state_update`).
+
+    Progress is reported by calling `progress_fcn` with the pk of the last StudentModule updated,
+    at most every settings.MODULE_STATE_UPDATE_PROGRESS_INTERVAL seconds, rather than after
+    every StudentModule.
+    """
+    modules_to_update = modules_to_update.select_related('student').order_by('pk')
+    if bulk_update_fcn is not None and settings.FEATURES.get('ENABLE_BULK_MODULE_STATE_UPDATES'):
+        def update_module_batches():
+            """Update the modules a batch at a time, yielding the last one of each batch"""
+            last_pk = None
+            while True:
+                batch = modules_to_update if last_pk is None else modules_to_update.filter(pk__gt=last_pk)
+                batch = list(batch[:settings.MODULE_STATE_BULK_UPDATE_SIZE])
+                if not batch:
+                    return
+                # There is no try here:  if there's an error, we let it throw, and the task will
+                # be marked as FAILED, with a stack trace.
+                with dog_stats_api.timer('instructor_tasks.module.time.batch', tags=['action:{name}'.format(name=action_name)]):
+                    for update_status in bulk_update_fcn(module_descriptor, batch):
+                        _count_update_status(counts, update_status)
+                last_pk = batch[-1].pk
+                yield batch[-1]
+        updated_modules = update_module_batches()
+    else:
+        def update_modules():
+            """Update the modules one at a time, yielding each"""
+            for module_to_update in modules_to_update:
+                # There is no try here:  if there's an error, we let it throw, and the task will
+                # be marked as FAILED, with a stack trace.
+                with dog_stats_api.timer('instructor_tasks.module.time.step', tags=['action:{name}'.format(name=action_name)]):
+                    _count_update_status(counts, update_fcn(module_descriptor, module_to_update))
+                yield module_to_update
+        updated_modules = update_modules()
+
+    last_progress_time = time()
+    for updated_module in updated_modules:
+        # update task status, if it hasn't been for a while:
+        if time() - last_progress_time >= settings.MODULE_STATE_UPDATE_PROGRESS_INTERVAL:
+            progress_fcn(updated_module.pk)
+            last_progress_time = time()
+
+
+def _count_update_status(counts, update_status):
+    """
+    Count a StudentModule's `update_status` (as returned by an update function) in `counts`.
+    """
+    counts['attempted'] += 1
+    if update_status == UPDATE_STATUS_SUCCEEDED:
+        # If the update_fcn returns true, then it performed some kind of work.
+        # Logging of failures is left to the update_fcn itself.
+        counts['succeeded'] += 1
+    elif update_status == UPDATE_STATUS_FAILED:
+        counts['failed'] += 1
+    elif update_status == UPDATE_STATUS_SKIPPED:
+        counts['skipped'] += 1
+    else:
+        raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+
+
+def _module_state_update_cursor_key(subtask_id):
+    """Return the cache key under which the progress of a module state update subtask is saved."""
+    return u"module-state-update-cursor-{}".format(subtask_id)
+
+
+def perform_module_state_update_chunk(chunk_task, update_fcn, entry_id, action_name, module_ids, subtask_status_dict,
+                                      bulk_update_fcn=None):
+    """
+    Visit the StudentModules with ids `module_ids` with `update_fcn` (or `bulk_update_fcn`),
+    as a `chunk_task` subtask of `perform_module_state_update`, then record the outcome on
+    the parent InstructorTask.
+
+    Progress through the StudentModules is saved in the cache (at most every
+    settings.MODULE_STATE_UPDATE_PROGRESS_INTERVAL seconds), so if the worker running
+    the subtask dies, the subtask resumes where it left off when it is run again.
+
+    Returns the subtask status, as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    try:
+        check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+    except SubtaskLockedException as exc:
+        # Either another worker is running this subtask, or one died while running it and
+        # its lock has yet to expire.  Try again once it has: by then the subtask will
+        # either be complete (and rejected as a duplicate) or ready to be resumed.
+        raise chunk_task.retry(exc=exc, countdown=SUBTASK_LOCK_EXPIRE)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    task_input = json.loads(entry.task_input)
+
+    cursor_key = _module_state_update_cursor_key(current_task_id)
+    cursor = cache.get(cursor_key)
+    modules_to_update = StudentModule.objects.filter(pk__in=module_ids)
+    if cursor is None:
+        counts = {'attempted': 0, 'succeeded': 0, 'skipped': 0, 'failed': 0}
+    else:
+        TASK_LOG.info("Subtask %s of instructor task %d: resuming after StudentModule %s with counts %s",
+                      current_task_id, entry_id, cursor['last_pk'], cursor['counts'])
+        counts = cursor['counts']
+        modules_to_update = modules_to_update.filter(pk__gt=cursor['last_pk'])
+
+    def save_cursor(last_pk):
+        """Save how far this subtask has got, so that it can be resumed"""
+        cache.set(cursor_key, {'last_pk': last_pk, 'counts': counts}, MODULE_STATE_UPDATE_CURSOR_EXPIRE)
+
+    def final_status(state):
+        """Return the SubtaskStatus of this subtask with the final counts"""
+        return SubtaskStatus.create(
+            current_task_id,
+            retried_nomax=subtask_status.retried_nomax,
+            retried_withmax=subtask_status.retried_withmax,
+            state=state,
+            **counts
+        )
+
+    try:
+        module_descriptor = modulestore().get_instance(entry.course_id, task_input.get('problem_url'))
+        _update_module_states(
+            update_fcn, module_descriptor, modules_to_update, action_name, counts, save_cursor, bulk_update_fcn
+        )
+    except Exception:
+        # Unexpected exception. Count the remaining modules as failed, so the parent's
+        # counts stay consistent, and let Celery record the error.
+        TASK_LOG.exception("Module state update subtask %s for instructor task %d: failed unexpectedly!",
+                           current_task_id, entry_id)
+        counts['failed'] += len(module_ids) - counts['attempted']
+        counts['attempted'] = len(module_ids)
+        cache.delete(cursor_key)
+        update_subtask_status(entry_id, current_task_id, final_status(FAILURE))
+        raise
+
+    cache.delete(cursor_key)
+    subtask_status = final_status(SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    return subtask_status.to_dict()
 
 
 def _get_task_id_from_xmodule_args(xmodule_instance_args):
@@ -470,105 +661,620 @@ def delete_problem_module_state(xmodule_instance_args, _module_descriptor, stude
     return UPDATE_STATUS_SUCCEEDED
 
 
-def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+def _track_for_students(xmodule_instance_args, event_type, students_and_events, source_page='x_module_task'):
+    """
+    Log tracking events of `event_type` for many students at once.
+
+    `students_and_events` is a list of (student, event) pairs. As for the events logged
+    by `_get_track_function_for_task`, the request_info and task_info are added here.
+    """
+    request_info = xmodule_instance_args.get('request_info', {}) if xmodule_instance_args is not None else {}
+    task_id = _get_task_id_from_xmodule_args(xmodule_instance_args)
+    task_infos_and_events = [
+        ({'student': student.username, 'task_id': task_id}, event)
+        for student, event in students_and_events
+    ]
+    task_track_many(request_info, event_type, task_infos_and_events, page=source_page)
+
+
+def reset_attempts_module_states(xmodule_instance_args, _module_descriptor, student_modules):
+    """
+    Resets problem attempts to zero for each of `student_modules`, as `reset_attempts_module_state`
+    does for one, but saving them with a single UPDATE, adding their StudentModuleHistory in a single
+    INSERT and logging their tracking events as a batch.
+
+    Returns a list of the update status of each StudentModule.
+    """
+    update_statuses = []
+    reset_modules = []
+    events = []
+    for student_module in student_modules:
+        problem_state = json.loads(student_module.state) if student_module.state else {}
+        old_number_of_attempts = problem_state.get('attempts')
+        if old_number_of_attempts > 0:
+            problem_state["attempts"] = 0
+            student_module.state = json.dumps(problem_state)
+            reset_modules.append(student_module)
+            events.append((student_module.student, {"old_attempts": old_number_of_attempts, "new_attempts": 0}))
+            update_statuses.append(UPDATE_STATUS_SUCCEEDED)
+        else:
+            update_statuses.append(UPDATE_STATUS_SKIPPED)
+
+    if reset_modules:
+        using = router.db_for_write(StudentModule)
+        modified = timezone.now()
+        with transaction.commit_on_success(using=using):
+            _save_module_states(reset_modules, modified, using)
+            # Saving in bulk bypasses the signal that records history, so record it here.
+            StudentModuleHistory.objects.using(using).bulk_create([
+                StudentModuleHistory(
+                    student_module=student_module,
+                    version=None,
+                    created=modified,
+                    state=student_module.state,
+                    grade=student_module.grade,
+                    max_grade=student_module.max_grade
+                )
+                for student_module in reset_modules
+                if student_module.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES
+            ])
+        _track_for_students(xmodule_instance_args, 'problem_reset_attempts', events)
+
+    return update_statuses
+
+
+def _save_module_states(student_modules, modified, using):
+    """
+    Save the `state` of each of `student_modules`, and set their `modified` time, with a single UPDATE.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    opts = StudentModule._meta  # pylint: disable=protected-access
+    cases = []
+    params = []
+    for student_module in student_modules:
+        student_module.modified = modified
+        cases.append(u"WHEN %s THEN %s")
+        params.extend([student_module.pk, student_module.state])
+    params.append(connection.ops.value_to_db_datetime(modified))
+    params.extend(student_module.pk for student_module in student_modules)
+
+    sql = u"UPDATE {table} SET {state} = CASE {pk} {cases} END, {modified} = %s WHERE {pk} IN ({pks})".format(
+        table=quote_name(opts.db_table),
+        state=quote_name(opts.get_field('state').column),
+        modified=quote_name(opts.get_field('modified').column),
+        pk=quote_name(opts.pk.column),
+        cases=u" ".join(cases),
+        pks=u", ".join([u"%s"] * len(student_modules)),
+    )
+    connection.cursor().execute(sql, params)
+
+
+def delete_problem_module_states(xmodule_instance_args, _module_descriptor, student_modules):
+    """
+    Deletes each of `student_modules`, as `delete_problem_module_state` does for one, but
+    with batched DELETEs, and logging their tracking events as a batch.
+
+    Always returns UPDATE_STATUS_SUCCEEDED for each StudentModule, if it doesn't raise an
+    exception due to database error.
+    """
+    if not student_modules:
+        return []
+
+    module_ids = [student_module.pk for student_module in student_modules]
+    using = router.db_for_write(StudentModule)
+    with transaction.commit_on_success(using=using):
+        # Delete the rows that refer to the StudentModules (e.g. their StudentModuleHistory),
+        # which deleting them one at a time would cascade to. (Nothing refers to those rows.)
+        for related in StudentModule._meta.get_all_related_objects():  # pylint: disable=protected-access
+            DeleteQuery(related.model).delete_batch(module_ids, using, field=related.field)
+        DeleteQuery(StudentModule).delete_batch(module_ids, using)
+
+    # Deleting in bulk bypasses the signals that invalidate the students' cached grades
+    # and keep the counts of the problem's grades and answers.
+    course_id = student_modules[0].course_id
+    PersistentCourseGrade.invalidate_for_users(
+        set(student_module.student_id for student_module in student_modules), course_id
+    )
+    StudentModuleGradeCount.remove_student_modules(student_modules)
+    StudentModuleAnswerCount.remove_student_modules(student_modules)
+
+    _track_for_students(
+        xmodule_instance_args,
+        'problem_delete_state',
+        [(student_module.student, {}) for student_module in student_modules]
+    )
+    return [UPDATE_STATUS_SUCCEEDED] * len(student_modules)
+
+
+def push_grades_to_s3(chunk_task, _xmodule_instance_args, entry_id, course_id, _task_input, action_name):
     """
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `GradesStore`. Once created, the files can
     be accessed by instantiating another `GradesStore` (via
-    `GradesStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in GradesStore will be complete ones.
-
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    `GradesStore.from_config()`) and calling `link_for()` on it.
+
+    Enrolled students are split into ranges (by user id) of at most
+    settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK, and each range is graded by a
+    separate `chunk_task` subtask (see `push_grades_chunk_to_s3`), which writes
+    its part of the report to the `GradesStore`. The subtask that finishes
+    last merges the parts into the final report. Writes are buffered, so
+    we'll never write part of a CSV file to S3 -- i.e. any report files that
+    are visible in GradesStore will be complete ones.
     """
-    start_time = datetime.now(UTC)
-    status_interval = 100
+    entry = InstructorTask.objects.get(pk=entry_id)
 
-    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
-    num_total = enrolled_students.count()
-    num_attempted = 0
-    num_succeeded = 0
-    num_failed = 0
-    curr_step = "Calculating Grades"
+    # If subtasks have already been defined, this task has been requeued (e.g.
+    # after a loss of connection to the broker); the subtasks that were queued
+    # the first time around are already doing the work.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning("Task %s has already been processed for grade report!  InstructorTask = %s",
+                         entry.task_id, entry)
+        return json.loads(entry.task_output)
 
-    def update_task_progress():
-        """Return a dict containing info about current task"""
-        current_time = datetime.now(UTC)
-        progress = {
+    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
+    if not enrolled_students.exists():
+        # Nothing to fan out; write out an empty report directly.
+        _store_grade_report(GradesStore.from_config(), entry, [])
+        return {
             'action_name': action_name,
-            'attempted': num_attempted,
-            'succeeded': num_succeeded,
-            'failed': num_failed,
-            'total': num_total,
-            'duration_ms': int((current_time - start_time).total_seconds() * 1000),
-            'step': curr_step,
+            'attempted': 0,
+            'succeeded': 0,
+            'skipped': 0,
+            'failed': 0,
+            'total': 0,
+            'duration_ms': 0,
         }
-        _get_current_task().update_state(state=PROGRESS, meta=progress)
 
-        return progress
+    def _create_grade_report_subtask(student_list, initial_subtask_status):
+        """Creates a subtask to grade a given list of students."""
+        return chunk_task.subtask(
+            (
+                entry_id,
+                course_id,
+                [student['pk'] for student in student_list],
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
 
-    # Loop over all our students and build our CSV lists in memory
-    header = None
-    rows = []
-    err_rows = [["id", "username", "error_msg"]]
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if num_attempted % status_interval == 0:
-            update_task_progress()
-        num_attempted += 1
-
-        if gradeset:
-            # We were able to successfully grade this student for this course.
-            num_succeeded += 1
-            if not header:
-                # Encode the header row in utf-8 encoding in case there are unicode characters
-                header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
-                rows.append(["id", "email", "username", "grade"] + header)
-
-            percents = {
-                section['label']: section.get('percent', 0.0)
-                for section in gradeset[u'section_breakdown']
-                if 'label' in section
-            }
-
-            # Not everybody has the same gradable items. If the item is not
-            # found in the user's gradeset, just assume it's a 0. The aggregated
-            # grades for their sections and overall course will be calculated
-            # without regard for the item they didn't have access to, so it's
-            # possible for a student to have a 0.0 show up in their row but
-            # still have 100% for the course.
-            row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
-        else:
-            # An empty gradeset means we failed to grade a student.
-            num_failed += 1
-            err_rows.append([student.id, student.username, err_msg])
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_grade_report_subtask,
+        enrolled_students,
+        [],
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_QUERY,
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK,
+    )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
-    curr_step = "Uploading CSVs"
-    update_task_progress()
 
-    # Generate parts of the file name
-    timestamp_str = start_time.strftime("%Y-%m-%d-%H%M")
-    course_id_prefix = urllib.quote(course_id.replace("/", "_"))
+def push_grades_chunk_to_s3(entry_id, course_id, student_ids, subtask_status_dict):
+    """
+    Grade the students in `student_ids` and store the resulting rows of the
+    grade report as one chunk in the `GradesStore`, then record the outcome
+    on the parent InstructorTask. If this is the last subtask of the report
+    to finish, merge all chunks into the final report files.
+
+    Each chunk is a CSV whose first row is its header (or which is empty if
+    no student in the chunk could be graded). Students who could not be
+    graded (or every student in the chunk, if the subtask fails) are written
+    to a separate error chunk. Only one chunk's worth of rows is held in
+    memory at a time.
+
+    Returns the subtask status, as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    grades_store = GradesStore.from_config()
+    chunk_dir = _grade_report_chunk_dir(entry)
+    chunk_name = u"{:012d}".format(min(student_ids) if student_ids else 0)
+
+    try:
+        students = User.objects.filter(pk__in=student_ids).order_by('pk')
+        header = None
+        rows = []
+        err_rows = []
+        for student, gradeset, err_msg in iterate_grades_for(course_id, students):
+            if gradeset:
+                # We were able to successfully grade this student for this course.
+                if not header:
+                    # Encode the header row in utf-8 encoding in case there are unicode characters
+                    header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
+                    rows.append(["id", "email", "username", "grade"] + header)
+
+                percents = {
+                    section['label']: section.get('percent', 0.0)
+                    for section in gradeset[u'section_breakdown']
+                    if 'label' in section
+                }
+
+                # Not everybody has the same gradable items. If the item is not
+                # found in the user's gradeset, just assume it's a 0. The aggregated
+                # grades for their sections and overall course will be calculated
+                # without regard for the item they didn't have access to, so it's
+                # possible for a student to have a 0.0 show up in their row but
+                # still have 100% for the course.
+                row_percents = [percents.get(label, 0.0) for label in header]
+                rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
+            else:
+                # An empty gradeset means we failed to grade a student.
+                err_rows.append([student.id, student.username, err_msg])
+
+        grades_store.store_rows(chunk_dir, chunk_name + u".csv", rows)
+        if err_rows:
+            grades_store.store_rows(chunk_dir, chunk_name + u"_err.csv", err_rows)
+    except Exception:
+        # Unexpected exception. Count every student in the chunk as failed, so
+        # the parent's counts stay consistent, and let Celery record the error.
+        TASK_LOG.exception("Grade report subtask %s for instructor task %d: failed unexpectedly!",
+                           current_task_id, entry_id)
+        _store_failed_grade_report_chunk(grades_store, chunk_dir, chunk_name, student_ids)
+        subtask_status.increment(failed=len(student_ids), state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status, complete_parent=False)
+        _merge_report_if_complete(entry_id, _merge_grade_report)
+        raise
+
+    num_failed = len(err_rows)
+    subtask_status.increment(succeeded=len(student_ids) - num_failed, failed=num_failed, state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status, complete_parent=False)
+    _merge_report_if_complete(entry_id, _merge_grade_report)
+    return subtask_status.to_dict()
+
+
+def _store_failed_grade_report_chunk(grades_store, chunk_dir, chunk_name, student_ids):
+    """
+    Write an error chunk listing every student of a grade report subtask that
+    failed, so that the merged error report accounts for them. If even that
+    can't be stored, the merge notes that the report is missing students.
+    """
+    try:
+        grades_store.store_rows(
+            chunk_dir,
+            chunk_name + FAILED_CHUNK_SUFFIX,
+            [[student_id, "", "Grade report subtask failed"] for student_id in student_ids]
+        )
+    except Exception:  # pylint: disable=broad-except
+        TASK_LOG.exception("Could not store the students of failed grade report chunk %s", chunk_name)
+
+
+def _grade_report_chunk_dir(entry):
+    """
+    Return the pseudo course id under which the chunks for the grade report
+    generated by `entry` are stored, so that they don't show up among the
+    course's downloadable files.
+    """
+    return u"{}/grade_report_chunks/{}".format(entry.course_id, entry.task_id)
+
 
-    # Perform the actual upload
+@transaction.commit_manually
+def _merge_report_if_complete(entry_id, merge_fcn):
+    """
+    If every subtask of the report for `entry_id` has finished, call
+    `merge_fcn(entry, subtask_dict)` to merge their stored chunks into the
+    final report, then mark the InstructorTask as done.
+
+    The InstructorTask is locked (with select_for_update) while merging, and
+    its task_state is only set once the report is stored, so only one caller
+    merges, even if the last subtasks finish at the same time, and the task
+    is never shown as done before its report is there. If the merge fails,
+    the task is marked as failed.
+    """
+    try:
+        entry = InstructorTask.objects.select_for_update().get(pk=entry_id)
+    except Exception:
+        transaction.rollback()
+        raise
+    subtask_dict = json.loads(entry.subtasks)
+    if entry.task_state in READY_STATES or subtask_dict['succeeded'] + subtask_dict['failed'] < subtask_dict['total']:
+        transaction.commit()
+        return
+
+    try:
+        merge_fcn(entry, subtask_dict)
+        entry.task_state = SUCCESS
+        entry.save()
+    except Exception:
+        TASK_LOG.exception("Merging the report of instructor task %d failed", entry_id)
+        entry.task_state = FAILURE
+        entry.save()
+        transaction.commit()
+        raise
+    else:
+        transaction.commit()
+
+
+def _merge_grade_report(entry, subtask_dict):
+    """
+    Merge the stored chunks of the grade report generated by `entry` into the
+    final report. Failed subtasks' students are listed in the error report
+    (see `_store_failed_grade_report_chunk`).
+    """
     grades_store = GradesStore.from_config()
+    chunk_dir = _grade_report_chunk_dir(entry)
+    filenames = grades_store.filenames_for(chunk_dir)
+    grade_chunks = [filename for filename in filenames if not filename.endswith(u"_err.csv")]
+    err_chunks = [filename for filename in filenames if filename.endswith(u"_err.csv")]
+
+    def merged_rows():
+        """
+        Yield the rows of all grade chunks in order, under the header of the
+        first chunk. Chunks whose header differs are remapped onto it.
+        """
+        header = None
+        for filename in grade_chunks:
+            rows = grades_store.rows_for(chunk_dir, filename)
+            chunk_header = next(rows, None)
+            if chunk_header is None:
+                continue
+            if header is None:
+                header = chunk_header
+                yield header
+            if chunk_header == header:
+                for row in rows:
+                    yield row
+            else:
+                positions = {label: index for index, label in enumerate(chunk_header)}
+                for row in rows:
+                    yield [row[positions[label]] if label in positions else 0.0 for label in header]
+
+    # every failed subtask should have stored an error chunk listing its students
+    num_unlisted = subtask_dict['failed'] - len(
+        [filename for filename in err_chunks if filename.endswith(FAILED_CHUNK_SUFFIX)]
+    )
+
+    def merged_err_rows():
+        """Yield the rows of all error chunks, under a single header."""
+        yield ["id", "username", "error_msg"]
+        if num_unlisted > 0:
+            yield ["", "", "Report incomplete: {} failed subtask(s) could not list their students".format(num_unlisted)]
+        for filename in err_chunks:
+            for row in grades_store.rows_for(chunk_dir, filename):
+                yield row
+
+    has_errors = err_chunks or num_unlisted > 0
+    _store_grade_report(grades_store, entry, merged_rows(), merged_err_rows() if has_errors else None)
+
+    for filename in filenames:
+        grades_store.delete(chunk_dir, filename)
+
+
+def _store_grade_report(grades_store, entry, rows, err_rows=None):
+    """
+    Write the grade report (and, if `err_rows` is given, the error report)
+    for the InstructorTask `entry` to `grades_store`.
+    """
+    # Generate parts of the file name
+    timestamp_str = entry.created.strftime("%Y-%m-%d-%H%M")
+    course_id_prefix = urllib.quote(entry.course_id.replace("/", "_"))
+
     grades_store.store_rows(
-        course_id,
+        entry.course_id,
         u"{}_grade_report_{}.csv".format(course_id_prefix, timestamp_str),
         rows
     )
-
-    # If there are any error rows (don't count the header), write them out as well
-    if len(err_rows) > 1:
+    if err_rows is not None:
         grades_store.store_rows(
-            course_id,
+            entry.course_id,
             u"{}_grade_report_{}_err.csv".format(course_id_prefix, timestamp_str),
             err_rows
         )
 
-    # One last update before we close out...
-    return update_task_progress()
+
+def push_answer_distribution_to_s3(chunk_task, _xmodule_instance_args, entry_id, course_id, _task_input, action_name):
+    """
+    For a given `course_id`, generate a CSV file of the distribution of the
+    answers submitted to each part of each problem (as computed by
+    `courseware.grades.answer_distributions`), and store it using a
+    `GradesStore`, alongside the grade reports.
+
+    The course's submitted problem StudentModules are split into ranges (by
+    id) of at most settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK, and the
+    answers in each range are counted by a separate `chunk_task` subtask (see
+    `push_answer_distribution_chunk_to_s3`), which stores its counts in the
+    `GradesStore`. The subtask that finishes last adds up the counts and
+    writes the final report.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # If subtasks have already been defined, this task has been requeued (e.g.
+    # after a loss of connection to the broker); the subtasks that were queued
+    # the first time around are already doing the work.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning("Task %s has already been processed for answer distribution!  InstructorTask = %s",
+                         entry.task_id, entry)
+        return json.loads(entry.task_output)
+
+    submitted_modules = StudentModule.all_submitted_problems_read_only(course_id)
+    if not submitted_modules.exists():
+        # Nothing to fan out; write out an empty report directly.
+        _store_answer_distribution(GradesStore.from_config(), entry, {})
+        return {
+            'action_name': action_name,
+            'attempted': 0,
+            'succeeded': 0,
+            'skipped': 0,
+            'failed': 0,
+            'total': 0,
+            'duration_ms': 0,
+        }
+
+    def _create_answer_distribution_subtask(module_list, initial_subtask_status):
+        """Creates a subtask to count the answers in a given list of StudentModules."""
+        return chunk_task.subtask(
+            (
+                entry_id,
+                course_id,
+                [module['pk'] for module in module_list],
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_answer_distribution_subtask,
+        submitted_modules,
+        [],
+        settings.ANSWER_DISTRIBUTION_MODULES_PER_QUERY,
+        settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK,
+    )
+
+
+def push_answer_distribution_chunk_to_s3(entry_id, course_id, student_module_ids, subtask_status_dict):
+    """
+    Count the answers in the state of the StudentModules in
+    `student_module_ids` and store the counts as one chunk in the
+    `GradesStore`, then record the outcome on the parent InstructorTask. If
+    this is the last subtask of the report to finish, merge all chunks into
+    the final report.
+
+    Each chunk is a CSV of (problem module_state_key, problem_id, answer,
+    count) rows. If the subtask fails, a failure chunk recording the range of
+    StudentModule ids it was to count is stored instead.
+
+    Returns the subtask status, as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    grades_store = GradesStore.from_config()
+    chunk_name = u"{:012d}.csv".format(min(student_module_ids) if student_module_ids else 0)
+
+    try:
+        answer_counts = count_answers(course_id, iterate_submitted_problem_states(course_id, student_module_ids))
+        grades_store.store_rows(
+            _answer_distribution_chunk_dir(entry),
+            chunk_name,
+            (
+                [module_state_key, problem_part_id, answer.encode('utf-8'), count]
+                for (module_state_key, problem_part_id), counts in answer_counts.iteritems()
+                for answer, count in counts.iteritems()
+            )
+        )
+    except Exception:
+        # Unexpected exception. Count every StudentModule in the chunk as failed, so
+        # the parent's counts stay consistent, and let Celery record the error.
+        TASK_LOG.exception("Answer distribution subtask %s for instructor task %d: failed unexpectedly!",
+                           current_task_id, entry_id)
+        try:
+            grades_store.store_rows(
+                _answer_distribution_chunk_dir(entry),
+                chunk_name[:-len(u".csv")] + FAILED_CHUNK_SUFFIX,
+                [[min(student_module_ids), max(student_module_ids), len(student_module_ids)]]
+            )
+        except Exception:  # pylint: disable=broad-except
+            TASK_LOG.exception("Could not store the range of failed answer distribution chunk %s", chunk_name)
+        subtask_status.increment(failed=len(student_module_ids), state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status, complete_parent=False)
+        _merge_report_if_complete(entry_id, _merge_answer_distribution)
+        raise
+
+    subtask_status.increment(succeeded=len(student_module_ids), state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status, complete_parent=False)
+    _merge_report_if_complete(entry_id, _merge_answer_distribution)
+    return subtask_status.to_dict()
+
+
+def _answer_distribution_chunk_dir(entry):
+    """
+    Return the pseudo course id under which the chunks for the answer
+    distribution generated by `entry` are stored, so that they don't show up
+    among the course's downloadable files.
+    """
+    return u"{}/answer_distribution_chunks/{}".format(entry.course_id, entry.task_id)
+
+
+def _merge_answer_distribution(entry, subtask_dict):
+    """
+    Add up the answer counts in the stored chunks of the answer distribution
+    generated by `entry` and write the final report.
+
+    The answers of failed subtasks are missing from the report, so the ranges
+    of StudentModule ids they were to count are written to an error report
+    (and recorded in the task's output, as 'failed_module_ranges').
+    """
+    grades_store = GradesStore.from_config()
+    chunk_dir = _answer_distribution_chunk_dir(entry)
+    filenames = grades_store.filenames_for(chunk_dir)
+    failed_chunks = [filename for filename in filenames if filename.endswith(FAILED_CHUNK_SUFFIX)]
+
+    answer_counts = defaultdict(lambda: defaultdict(int))
+    for filename in filenames:
+        if filename in failed_chunks:
+            continue
+        for module_state_key, problem_part_id, answer, count in grades_store.rows_for(chunk_dir, filename):
+            answer_counts[(module_state_key, problem_part_id)][answer.decode('utf-8')] += int(count)
+
+    _store_answer_distribution(grades_store, entry, name_answer_counts(entry.course_id, answer_counts))
+
+    failed_ranges = [
+        [int(first_id), int(last_id), int(num_modules)]
+        for filename in failed_chunks
+        for first_id, last_id, num_modules in grades_store.rows_for(chunk_dir, filename)
+    ]
+    # every failed subtask should have stored a failure chunk recording its range
+    num_unlisted = subtask_dict['failed'] - len(failed_chunks)
+    if failed_ranges or num_unlisted > 0:
+        _store_answer_distribution_errors(grades_store, entry, failed_ranges, num_unlisted)
+        task_progress = json.loads(entry.task_output)
+        task_progress['failed_module_ranges'] = failed_ranges
+        entry.task_output = InstructorTask.create_output_for_success(task_progress)
+
+    for filename in filenames:
+        grades_store.delete(chunk_dir, filename)
+
+
+def _store_answer_distribution_errors(grades_store, entry, failed_ranges, num_unlisted):
+    """
+    Write the error report of the answer distribution for the InstructorTask
+    `entry`: the ranges of StudentModule ids whose answers are missing from it.
+    """
+    timestamp_str = entry.created.strftime("%Y-%m-%d-%H%M")
+    course_id_prefix = urllib.quote(entry.course_id.replace("/", "_"))
+
+    rows = [["first_module_id", "last_module_id", "num_modules", "error_msg"]]
+    if num_unlisted > 0:
+        rows.append(["", "", "", "Report incomplete: {} failed subtask(s) could not record their range".format(num_unlisted)])
+    for first_id, last_id, num_modules in sorted(failed_ranges):
+        rows.append([first_id, last_id, num_modules, "Answer distribution subtask failed"])
+
+    grades_store.store_rows(
+        entry.course_id,
+        u"{}_answer_distribution_{}_err.csv".format(course_id_prefix, timestamp_str),
+        rows
+    )
+
+
+def _store_answer_distribution(grades_store, entry, distributions):
+    """
+    Write the answer distribution report for the InstructorTask `entry` to
+    `grades_store`, given `distributions` in the form returned by
+    `courseware.grades.answer_distributions`.
+    """
+    timestamp_str = entry.created.strftime("%Y-%m-%d-%H%M")
+    course_id_prefix = urllib.quote(entry.course_id.replace("/", "_"))
+
+    def rows():
+        """Yield the rows of the report, under its header."""
+        yield ['url_name', 'display name', 'answer id', 'answer', 'count']
+        for (url_name, display_name, answer_id), answers in sorted(distributions.items()):
+            for answer, count in answers.iteritems():
+                yield [
+                    url_name.encode('utf-8'), display_name.encode('utf-8'), answer_id.encode('utf-8'),
+                    answer.encode('utf-8'), count
+                ]
+
+    grades_store.store_rows(
+        entry.course_id,
+        u"{}_answer_distribution_{}.csv".format(course_id_prefix, timestamp_str),
+        rows()
+    )
@@ -6,23 +6,34 @@ paths actually work.
 
 """
 import json
+import shutil
+import tempfile
 from uuid import uuid4
 
 from mock import Mock, MagicMock, patch
 
+from django.conf import settings
+from django.core.cache import cache
+from django.test.utils import override_settings
+
 from celery.states import SUCCESS, FAILURE
 
 from xmodule.modulestore.exceptions import ItemNotFoundError
 
-from courseware.models import StudentModule
+from courseware.models import PersistentCourseGrade, StudentModule, StudentModuleHistory
 from courseware.tests.factories import StudentModuleFactory
+from student.models import CourseEnrollment
 from student.tests.factories import UserFactory, CourseEnrollmentFactory
 
-from instructor_task.models import InstructorTask
+from instructor_task.models import InstructorTask, LocalFSGradesStore
 from instructor_task.tests.test_base import InstructorTaskModuleTestCase
 from instructor_task.tests.factories import InstructorTaskFactory
-from instructor_task.tasks import rescore_problem, reset_problem_attempts, delete_problem_state
-from instructor_task.tasks_helper import UpdateProblemModuleStateError
+from instructor_task.subtasks import SubtaskStatus, initialize_subtask_info
+from instructor_task.tasks import (
+    rescore_problem, reset_problem_attempts, reset_problem_attempts_chunk, delete_problem_state, calculate_grades_csv,
+    calculate_answer_distribution_csv
+)
+from instructor_task.tasks_helper import UpdateProblemModuleStateError, _module_state_update_cursor_key
 
 PROBLEM_URL_NAME = "test_urlname"
 
@@ -389,6 +400,94 @@ class TestResetAttemptsInstructorTask(TestInstructorTasks):
             else:
                 self.assertEquals(state['attempts'], initial_attempts)
 
+    @override_settings(MODULE_STATE_UPDATES_PER_TASK=3, MODULE_STATE_UPDATES_PER_QUERY=6)
+    def test_reset_with_subtasks(self):
+        initial_attempts = 3
+        input_state = json.dumps({'attempts': initial_attempts})
+        num_students = 10
+        students = self._create_students_with_state(num_students, input_state)
+        task_entry = self._create_input_entry()
+        self._run_task_with_mock_celery(reset_problem_attempts, task_entry.id, task_entry.task_id)
+        # check that the subtasks' results were collected in the table:
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        output = json.loads(entry.task_output)
+        self.assertEquals(output.get('attempted'), num_students)
+        self.assertEquals(output.get('succeeded'), num_students)
+        self.assertEquals(output.get('total'), num_students)
+        subtasks = json.loads(entry.subtasks)
+        self.assertEquals(subtasks['total'], 4)
+        self.assertEquals(subtasks['succeeded'], 4)
+        # check that entries were reset
+        self._assert_num_attempts(students, 0)
+
+    def test_reset_in_bulk(self):
+        initial_attempts = 3
+        input_state = json.dumps({'attempts': initial_attempts, 'seed': 1})
+        num_students = 10
+        students = self._create_students_with_state(num_students, input_state)
+        num_history = StudentModuleHistory.objects.count()
+        with patch('instructor_task.tasks_helper.task_track_many') as mock_track_many:
+            self._test_run_with_task(reset_problem_attempts, 'reset', num_students)
+        self._assert_num_attempts(students, 0)
+        # the rest of the state is left alone
+        for module in StudentModule.objects.filter(module_state_key=self.problem_url):
+            self.assertEquals(json.loads(module.state)['seed'], 1)
+        # history and tracking events are recorded in bulk
+        self.assertEquals(StudentModuleHistory.objects.count(), num_history + num_students)
+        self.assertEquals(mock_track_many.call_count, 1)
+        request_info, event_type, task_infos_and_events = mock_track_many.call_args[0]
+        self.assertEquals(event_type, 'problem_reset_attempts')
+        self.assertEquals(
+            sorted(task_info['student'] for task_info, _event in task_infos_and_events),
+            sorted(student.username for student in students)
+        )
+
+    def test_reset_one_at_a_time(self):
+        initial_attempts = 3
+        input_state = json.dumps({'attempts': initial_attempts})
+        num_students = 10
+        students = self._create_students_with_state(num_students, input_state)
+        with patch.dict(settings.FEATURES, {'ENABLE_BULK_MODULE_STATE_UPDATES': False}):
+            with patch('instructor_task.tasks_helper.task_track_many') as mock_track_many:
+                self._test_run_with_task(reset_problem_attempts, 'reset', num_students)
+        self.assertFalse(mock_track_many.called)
+        self._assert_num_attempts(students, 0)
+
+    def test_reset_subtask_resumes(self):
+        initial_attempts = 3
+        input_state = json.dumps({'attempts': initial_attempts})
+        num_students = 10
+        self._create_students_with_state(num_students, input_state)
+        task_entry = self._create_input_entry()
+        subtask_id = str(uuid4())
+        initialize_subtask_info(task_entry, 'reset', num_students, [subtask_id])
+        module_ids = sorted(StudentModule.objects.filter(
+            course_id=self.course.id, module_state_key=self.problem_url
+        ).values_list('pk', flat=True))
+
+        # Save progress as though a worker had got through four modules before dying.
+        cursor_key = _module_state_update_cursor_key(subtask_id)
+        cache.set(cursor_key, {
+            'last_pk': module_ids[3],
+            'counts': {'attempted': 4, 'succeeded': 4, 'skipped': 0, 'failed': 0},
+        })
+        status = reset_problem_attempts_chunk.apply((
+            task_entry.id, self._get_xmodule_instance_args(), 'reset', module_ids,
+            SubtaskStatus.create(subtask_id).to_dict(),
+        )).get()
+        self.assertEquals(status['attempted'], num_students)
+        self.assertEquals(status['succeeded'], num_students)
+        self.assertIsNone(cache.get(cursor_key))
+
+        # only the modules after the saved progress were updated this time around
+        for module in StudentModule.objects.filter(pk__in=module_ids):
+            expected_attempts = initial_attempts if module.pk <= module_ids[3] else 0
+            self.assertEquals(json.loads(module.state)['attempts'], expected_attempts)
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(json.loads(entry.task_output).get('attempted'), num_students)
+
     def test_reset_with_student_username(self):
         self._test_reset_with_student(False)
 
@@ -437,3 +536,176 @@ class TestDeleteStateInstructorTask(TestInstructorTasks):
                 StudentModule.objects.get(course_id=self.course.id,
                                           student=student,
                                           module_state_key=self.problem_url)
+
+    def test_delete_in_bulk(self):
+        num_students = 10
+        students = self._create_students_with_state(num_students)
+        for student in students:
+            PersistentCourseGrade.objects.create(user=student, course_id=self.course.id,
+                                                 grading_version='version', gradeset='{}')
+        module_ids = list(StudentModule.objects.filter(
+            module_state_key=self.problem_url
+        ).values_list('pk', flat=True))
+        self.assertTrue(StudentModuleHistory.objects.filter(student_module__id__in=module_ids).exists())
+        self._test_run_with_task(delete_problem_state, 'deleted', num_students)
+        self.assertFalse(StudentModule.objects.filter(pk__in=module_ids).exists())
+        self.assertFalse(StudentModuleHistory.objects.filter(student_module__id__in=module_ids).exists())
+        # deleting in bulk bypasses signals, so cached grades must be invalidated explicitly
+        self.assertFalse(PersistentCourseGrade.objects.filter(course_id=self.course.id, stale=False).exists())
+
+
+class TestGradeReportInstructorTask(TestInstructorTasks):
+    """Tests grade report generation split across subtasks."""
+
+    def setUp(self):
+        super(TestGradeReportInstructorTask, self).setUp()
+        self.grades_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.grades_dir)
+
+    def _run_grade_report(self, num_students, students_per_task):
+        """
+        Enroll `num_students` (in addition to the instructor), generate a
+        grade report and return the ids of all enrolled users, the task entry,
+        the grades store and the names of the files stored for the course.
+        """
+        for index in range(num_students):
+            self.create_student('student{}'.format(index))
+        enrolled_ids = sorted(user.id for user in CourseEnrollment.users_enrolled_in(self.course.id))
+        grades_download = {'STORAGE_TYPE': 'localfs', 'ROOT_PATH': self.grades_dir}
+        with override_settings(GRADES_DOWNLOAD=grades_download,
+                               GRADES_DOWNLOAD_STUDENTS_PER_TASK=students_per_task,
+                               GRADES_DOWNLOAD_STUDENTS_PER_QUERY=students_per_task * 2):
+            task_entry = self._create_input_entry(use_problem_url=False)
+            self._run_task_with_mock_celery(calculate_grades_csv, task_entry.id, task_entry.task_id)
+            grades_store = LocalFSGradesStore.from_config()
+            return enrolled_ids, task_entry, grades_store, grades_store.filenames_for(self.course.id)
+
+    def test_grade_report_merges_chunks(self):
+        enrolled_ids, task_entry, grades_store, filenames = self._run_grade_report(7, 2)
+        self.assertEquals(len(filenames), 1)
+        rows = list(grades_store.rows_for(self.course.id, filenames[0]))
+        self.assertEquals(rows[0][:4], ["id", "email", "username", "grade"])
+        self.assertEquals([int(row[0]) for row in rows[1:]], enrolled_ids)
+
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(json.loads(entry.task_output)['succeeded'], len(enrolled_ids))
+        # The chunks are cleaned up once merged
+        self.assertEquals(grades_store.filenames_for(
+            "{}/grade_report_chunks/{}".format(self.course.id, task_entry.task_id)), [])
+
+    @patch('instructor_task.tasks_helper.iterate_grades_for')
+    def test_grade_report_errors(self, mock_iterate_grades_for):
+        mock_iterate_grades_for.side_effect = lambda course_id, students: (
+            (student, {}, "Cannot grade student") for student in students
+        )
+        enrolled_ids, task_entry, grades_store, filenames = self._run_grade_report(3, 2)
+        self.assertEquals(len(filenames), 2)
+        err_filename = [filename for filename in filenames if filename.endswith('_err.csv')][0]
+        err_rows = list(grades_store.rows_for(self.course.id, err_filename))
+        self.assertEquals(err_rows[0], ["id", "username", "error_msg"])
+        self.assertEquals([int(row[0]) for row in err_rows[1:]], enrolled_ids)
+        self.assertEquals(json.loads(InstructorTask.objects.get(id=task_entry.id).task_output)['failed'], len(enrolled_ids))
+
+    @patch('instructor_task.tasks_helper.iterate_grades_for')
+    def test_grade_report_failed_chunk(self, mock_iterate_grades_for):
+        def iterate_grades_for(course_id, students):
+            """Fail to grade the chunk of the first enrolled user"""
+            student_ids = [student.id for student in students]
+            if min(user.id for user in CourseEnrollment.users_enrolled_in(course_id)) in student_ids:
+                raise TestTaskFailure("Grading failed")
+            return ((student, {'percent': 0.5, 'section_breakdown': []}, "") for student in students)
+        mock_iterate_grades_for.side_effect = iterate_grades_for
+        enrolled_ids, task_entry, grades_store, filenames = self._run_grade_report(3, 2)
+
+        # the failed chunk's students are listed in the error report
+        err_filename = [filename for filename in filenames if filename.endswith('_err.csv')][0]
+        err_rows = list(grades_store.rows_for(self.course.id, err_filename))
+        self.assertEquals([int(row[0]) for row in err_rows[1:]], enrolled_ids[:2])
+
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(json.loads(entry.task_output)['failed'], 2)
+        self.assertEquals(json.loads(entry.subtasks)['failed'], 1)
+
+
+class TestAnswerDistributionInstructorTask(TestInstructorTasks):
+    """Tests answer distribution reports counted across subtasks."""
+
+    def setUp(self):
+        super(TestAnswerDistributionInstructorTask, self).setUp()
+        self.grades_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.grades_dir)
+
+    def _run_answer_distribution(self, modules_per_task):
+        """
+        Compute the answer distribution, and return the task entry and the
+        rows of the report stored for the course.
+        """
+        grades_download = {'STORAGE_TYPE': 'localfs', 'ROOT_PATH': self.grades_dir}
+        with override_settings(GRADES_DOWNLOAD=grades_download,
+                               ANSWER_DISTRIBUTION_MODULES_PER_TASK=modules_per_task,
+                               ANSWER_DISTRIBUTION_MODULES_PER_QUERY=modules_per_task * 2):
+            task_entry = self._create_input_entry(use_problem_url=False)
+            self._run_task_with_mock_celery(calculate_answer_distribution_csv, task_entry.id, task_entry.task_id)
+            grades_store = LocalFSGradesStore.from_config()
+            filenames = [
+                filename for filename in grades_store.filenames_for(self.course.id)
+                if not filename.endswith('_err.csv')
+            ]
+            self.assertEquals(len(filenames), 1)
+            self.assertIn('_answer_distribution_', filenames[0])
+            return task_entry, list(grades_store.rows_for(self.course.id, filenames[0]))
+
+    def test_answers_counted_across_chunks(self):
+        students = self._create_students_with_state(7, state=json.dumps({'student_answers': {'part_1': u'Option 1'}}))
+        for student in students[:3]:
+            module = StudentModule.objects.get(student=student, module_state_key=self.problem_url)
+            module.state = json.dumps({'student_answers': {'part_1': u'\u24de\u24df\u24e3', 'part_2': 1}})
+            module.save()
+
+        task_entry, rows = self._run_answer_distribution(2)
+        self.assertEquals(rows[0], ['url_name', 'display name', 'answer id', 'answer', 'count'])
+        self.assertEquals(sorted(rows[1:]), sorted([
+            [PROBLEM_URL_NAME, PROBLEM_URL_NAME, 'part_1', 'Option 1', '4'],
+            [PROBLEM_URL_NAME, PROBLEM_URL_NAME, 'part_1', u'\u24de\u24df\u24e3'.encode('utf-8'), '3'],
+            [PROBLEM_URL_NAME, PROBLEM_URL_NAME, 'part_2', '1', '3'],
+        ]))
+
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(json.loads(entry.task_output)['succeeded'], 7)
+        self.assertEquals(json.loads(entry.subtasks)['total'], 4)
+        # The chunks are cleaned up once merged
+        self.assertEquals(LocalFSGradesStore(self.grades_dir).filenames_for(
+            "{}/answer_distribution_chunks/{}".format(self.course.id, task_entry.task_id)), [])
+
+    def test_no_submissions(self):
+        self._create_students_with_state(2, grade=None)
+        __, rows = self._run_answer_distribution(2)
+        self.assertEquals(rows, [['url_name', 'display name', 'answer id', 'answer', 'count']])
+
+    @patch('instructor_task.tasks_helper.iterate_submitted_problem_states')
+    def test_failed_chunk_recorded(self, mock_iterate_states):
+        students = self._create_students_with_state(3, state=json.dumps({'student_answers': {'part_1': u'Option 1'}}))
+        module_ids = sorted(
+            StudentModule.objects.filter(student__in=students, module_state_key=self.problem_url).values_list('id', flat=True)
+        )
+
+        def iterate_states(course_id, student_module_ids):
+            """Fail to read the chunk of the first StudentModule"""
+            if module_ids[0] in student_module_ids:
+                raise TestTaskFailure("Reading state failed")
+            return StudentModule.objects.filter(id__in=student_module_ids).values('id', 'module_state_key', 'state')
+        mock_iterate_states.side_effect = iterate_states
+        task_entry, rows = self._run_answer_distribution(2)
+        self.assertEquals(rows[1:], [[PROBLEM_URL_NAME, PROBLEM_URL_NAME, 'part_1', 'Option 1', '1']])
+
+        # the range of the failed chunk is recorded
+        grades_store = LocalFSGradesStore(self.grades_dir)
+        err_filename = [filename for filename in grades_store.filenames_for(self.course.id) if filename.endswith('_err.csv')][0]
+        err_rows = list(grades_store.rows_for(self.course.id, err_filename))
+        self.assertEquals([int(value) for value in err_rows[1][:3]], [module_ids[0], module_ids[1], 2])
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(json.loads(entry.task_output)['failed_module_ranges'], [[module_ids[0], module_ids[1], 2]])
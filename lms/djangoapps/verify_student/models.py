@@ -8,6 +8,7 @@ of a student over a period of time. Right now, the only models are the abstract
 `SoftwareSecurePhotoVerification`. The hope is to keep as much of the
 photo verification process as generic as possible.
 """
+from collections import defaultdict
 from datetime import datetime, timedelta
 from email.utils import formatdate
 from hashlib import md5
@@ -491,6 +492,42 @@ class PhotoVerification(StatusModel):
         except IndexError:
             return True
 
+    @classmethod
+    def reverification_statuses(cls, user, windows):
+        """
+        Returns a dictionary mapping the id of each of the (midcourse
+        reverification) windows to the tuple (status, error_msg, display) of
+        user_status and display_status for (user, window), using a single query.
+        """
+        attempts_by_window = defaultdict(list)
+        if windows:
+            attempts = cls.objects.filter(user=user, window__in=windows).order_by('-updated_at')
+            for attempt in attempts:
+                attempts_by_window[attempt.window_id].append(attempt)
+
+        earliest_allowed_date = cls._earliest_allowed_date()
+        statuses = {}
+        for window in windows:
+            attempts = attempts_by_window[window.id]
+            recent = [attempt for attempt in attempts if attempt.created_at >= earliest_allowed_date]
+            status, error_msg = 'none', ''
+            if any(attempt.status == 'approved' for attempt in recent):
+                status = 'approved'
+            elif any(attempt.status in ('submitted', 'approved') for attempt in recent):
+                status = 'pending'
+            elif not attempts:
+                status = 'must_reverify'
+            elif attempts[0].created_at < earliest_allowed_date:
+                status = 'expired'
+            else:
+                if attempts[0].status == 'denied':
+                    status = 'denied'
+                if attempts[0].error_msg:
+                    error_msg = attempts[0].parsed_error_msg()
+            display = attempts[0].display if attempts else True
+            statuses[window.id] = (status, error_msg, display)
+        return statuses
+
 
 class SoftwareSecurePhotoVerification(PhotoVerification):
     """
@@ -381,6 +381,32 @@ class TestPhotoVerification(TestCase):
         reverify_status = SoftwareSecurePhotoVerification.user_status(user=user, window=window)
         self.assertEquals(reverify_status, ('denied', ''))
 
+    def test_reverification_statuses(self):
+        user = UserFactory.create()
+        windows = [
+            MidcourseReverificationWindowFactory(course_id='MITx/999/Course_{0}'.format(index))
+            for index in range(5)
+        ]
+        SoftwareSecurePhotoVerification(user=user, window=windows[1], status='submitted').save()
+        SoftwareSecurePhotoVerification(user=user, window=windows[2], status='approved').save()
+        SoftwareSecurePhotoVerification(
+            user=user, window=windows[3], status='denied', error_msg='[{"photoIdReasons": ["Not provided"]}]'
+        ).save()
+        SoftwareSecurePhotoVerification(user=user, window=windows[4], status='must_retry', display=False).save()
+        # another user's attempts don't count:
+        SoftwareSecurePhotoVerification(user=UserFactory.create(), window=windows[0], status='approved').save()
+
+        with self.assertNumQueries(1):
+            statuses = SoftwareSecurePhotoVerification.reverification_statuses(user, windows)
+        for window in windows:
+            status, error_msg = SoftwareSecurePhotoVerification.user_status(user, window)
+            display = SoftwareSecurePhotoVerification.display_status(user, window)
+            self.assertEquals(statuses[window.id], (status, error_msg, display))
+        self.assertEquals(statuses[windows[3].id], ('denied', "No photo ID was provided.", True))
+
+        with self.assertNumQueries(0):
+            self.assertEquals(SoftwareSecurePhotoVerification.reverification_statuses(user, []), {})
+
     def test_display(self):
         user = UserFactory.create()
         window = MidcourseReverificationWindowFactory()
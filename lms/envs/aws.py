@@ -163,6 +163,9 @@ if 'loc_cache' not in CACHES:
         'LOCATION': 'edx_location_mem_cache',
     }
 
+STATIC_CONTENT_DISK_CACHE_DIR = ENV_TOKENS.get('STATIC_CONTENT_DISK_CACHE_DIR', STATIC_CONTENT_DISK_CACHE_DIR)
+STATIC_CONTENT_DISK_CACHE_SIZE = ENV_TOKENS.get('STATIC_CONTENT_DISK_CACHE_SIZE', STATIC_CONTENT_DISK_CACHE_SIZE)
+
 # Email overrides
 DEFAULT_FROM_EMAIL = ENV_TOKENS.get('DEFAULT_FROM_EMAIL', DEFAULT_FROM_EMAIL)
 DEFAULT_FEEDBACK_EMAIL = ENV_TOKENS.get('DEFAULT_FEEDBACK_EMAIL', DEFAULT_FEEDBACK_EMAIL)
@@ -187,6 +190,9 @@ BULK_EMAIL_MAX_RETRIES = ENV_TOKENS.get('BULK_EMAIL_MAX_RETRIES', BULK_EMAIL_MAX
 BULK_EMAIL_INFINITE_RETRY_CAP = ENV_TOKENS.get('BULK_EMAIL_INFINITE_RETRY_CAP', BULK_EMAIL_INFINITE_RETRY_CAP)
 BULK_EMAIL_LOG_SENT_EMAILS = ENV_TOKENS.get('BULK_EMAIL_LOG_SENT_EMAILS', BULK_EMAIL_LOG_SENT_EMAILS)
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = ENV_TOKENS.get('BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS', BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
+BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS = ENV_TOKENS.get('BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS', BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS)
+BULK_EMAIL_MESSAGES_PER_SEND = ENV_TOKENS.get('BULK_EMAIL_MESSAGES_PER_SEND', BULK_EMAIL_MESSAGES_PER_SEND)
+BULK_EMAIL_CONNECTION_MAX_IDLE = ENV_TOKENS.get('BULK_EMAIL_CONNECTION_MAX_IDLE', BULK_EMAIL_CONNECTION_MAX_IDLE)
 # We want Bulk Email running on the high-priority queue, so we define the
 # routing key that points to it.  At the moment, the name is the same.
 # We have to reset the value here, since we have changed the value of the queue name.
@@ -347,6 +353,21 @@ VERIFY_STUDENT = AUTH_TOKENS.get("VERIFY_STUDENT", VERIFY_STUDENT)
 GRADES_DOWNLOAD_ROUTING_KEY = HIGH_MEM_QUEUE
 
 GRADES_DOWNLOAD = ENV_TOKENS.get("GRADES_DOWNLOAD", GRADES_DOWNLOAD)
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = ENV_TOKENS.get('GRADES_DOWNLOAD_STUDENTS_PER_TASK', GRADES_DOWNLOAD_STUDENTS_PER_TASK)
+GRADES_DOWNLOAD_STUDENTS_PER_QUERY = ENV_TOKENS.get('GRADES_DOWNLOAD_STUDENTS_PER_QUERY', GRADES_DOWNLOAD_STUDENTS_PER_QUERY)
+ANSWER_DISTRIBUTION_MODULES_PER_TASK = ENV_TOKENS.get('ANSWER_DISTRIBUTION_MODULES_PER_TASK', ANSWER_DISTRIBUTION_MODULES_PER_TASK)
+ANSWER_DISTRIBUTION_MODULES_PER_QUERY = ENV_TOKENS.get('ANSWER_DISTRIBUTION_MODULES_PER_QUERY', ANSWER_DISTRIBUTION_MODULES_PER_QUERY)
+
+# Problem state updates
+MODULE_STATE_UPDATES_PER_TASK = ENV_TOKENS.get('MODULE_STATE_UPDATES_PER_TASK', MODULE_STATE_UPDATES_PER_TASK)
+MODULE_STATE_UPDATES_PER_QUERY = ENV_TOKENS.get('MODULE_STATE_UPDATES_PER_QUERY', MODULE_STATE_UPDATES_PER_QUERY)
+MODULE_STATE_UPDATE_PROGRESS_INTERVAL = ENV_TOKENS.get(
+    'MODULE_STATE_UPDATE_PROGRESS_INTERVAL', MODULE_STATE_UPDATE_PROGRESS_INTERVAL
+)
+MODULE_STATE_BULK_UPDATE_SIZE = ENV_TOKENS.get('MODULE_STATE_BULK_UPDATE_SIZE', MODULE_STATE_BULK_UPDATE_SIZE)
+
+# Sequence rendering
+SEQUENCE_PREFETCH_UNITS = ENV_TOKENS.get('SEQUENCE_PREFETCH_UNITS', SEQUENCE_PREFETCH_UNITS)
 
 ##### ACCOUNT LOCKOUT DEFAULT PARAMETERS #####
 MAX_FAILED_LOGIN_ATTEMPTS_ALLOWED = ENV_TOKENS.get("MAX_FAILED_LOGIN_ATTEMPTS_ALLOWED", 5)
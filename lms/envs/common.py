@@ -215,6 +215,29 @@ FEATURES = {
 
     # Turn off account locking if failed login attempts exceeds a limit
     'ENABLE_MAX_FAILED_LOGIN_ATTEMPTS': False,
+
+    # Store each student's course grade summary in the database, and only
+    # recompute it after one of their problem scores has changed
+    'ENABLE_PERSISTENT_GRADES': False,
+
+    # Reset problem attempts and delete problem state for many students with
+    # batched queries, rather than loading and saving each StudentModule
+    'ENABLE_BULK_MODULE_STATE_UPDATES': True,
+
+    # Keep per-problem grade counts (StudentModuleGradeCount), and read the
+    # grade histograms shown to staff from them rather than aggregating over
+    # StudentModules. Fill the counts in with `backfill_grade_counts` once enabled.
+    'ENABLE_GRADE_HISTOGRAM_COUNTS': False,
+
+    # Keep per-answer counts (StudentModuleAnswerCount), and read answer
+    # distributions from them rather than parsing the state of every submitted
+    # problem. Fill the counts in with `rebuild_answer_counts` once enabled.
+    'ENABLE_ANSWER_DISTRIBUTION_COUNTS': False,
+
+    # Render only the active unit of a sequence (and SEQUENCE_PREFETCH_UNITS
+    # units on either side of it) with the courseware page, fetching the others
+    # when the student navigates to them
+    'ENABLE_LAZY_SEQUENCE_RENDERING': False,
 }
 
 # Used for A/B testing
@@ -409,6 +432,11 @@ DOC_STORE_CONFIG = {
     'collection': 'modulestore',
 }
 
+# Local directory in which to cache assets too large for memcached, and the total size
+# it may grow to. The disk cache is disabled when the directory is None.
+STATIC_CONTENT_DISK_CACHE_DIR = None
+STATIC_CONTENT_DISK_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
 ############# XBlock Configuration ##########
 
 # This should be moved into an XBlock Runtime/Application object
@@ -694,6 +722,9 @@ MIDDLEWARE_CLASSES = (
     # Detects user-requested locale from 'accept-language' header in http request
     'django.middleware.locale.LocaleMiddleware',
 
+    # sends the count changes made by a request once TransactionMiddleware has committed it
+    'courseware.middleware.CountChangesMiddleware',
+
     'django.middleware.transaction.TransactionMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 
@@ -1006,12 +1037,24 @@ BULK_EMAIL_ROUTING_KEY = HIGH_PRIORITY_QUEUE
 # a bulk email message.
 BULK_EMAIL_LOG_SENT_EMAILS = False
 
-# Delay in seconds to sleep between individual mail messages being sent,
-# when a bulk email task is retried for rate-related reasons.  Choose this
-# value depending on the number of workers that might be sending email in
-# parallel, and what the SES rate is.
+# Delay in seconds to sleep between sends, once the mail server throttles a
+# bulk email task (or when the task is retried for rate-related reasons).
+# Each throttling response doubles the delay, and each successful send shortens
+# it by this amount again.  Choose this value depending on the number of workers
+# that might be sending email in parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# Maximum delay in seconds between sends.  When throttling would call for a
+# longer delay, the bulk email task is retried later instead.
+BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS = 1
+
+# Number of messages passed to the mail backend at a time.
+BULK_EMAIL_MESSAGES_PER_SEND = 20
+
+# Number of seconds a worker keeps its mail connection open between bulk
+# email tasks.  Set to 0 to open a new connection for each task.
+BULK_EMAIL_CONNECTION_MAX_IDLE = 30
+
 
 ############################## Video ##########################################
 
@@ -1244,6 +1287,36 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+# Parameters for breaking down course enrollment into grading subtasks.
+# Each subtask grades at most GRADES_DOWNLOAD_STUDENTS_PER_TASK students and
+# writes them out as one chunk of the grade report.
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = 100
+GRADES_DOWNLOAD_STUDENTS_PER_QUERY = 1000
+
+# Parameters for breaking down a course's submitted problems into answer
+# distribution subtasks. Each subtask counts the answers in at most
+# ANSWER_DISTRIBUTION_MODULES_PER_TASK StudentModules.
+ANSWER_DISTRIBUTION_MODULES_PER_TASK = 5000
+ANSWER_DISTRIBUTION_MODULES_PER_QUERY = 50000
+
+###################### Problem State Updates ######################
+# Rescoring, resetting or deleting the state of a problem for more than
+# MODULE_STATE_UPDATES_PER_TASK students is split among subtasks that each
+# update at most that many StudentModules.
+MODULE_STATE_UPDATES_PER_TASK = 100
+MODULE_STATE_UPDATES_PER_QUERY = 1000
+
+# Minimum number of seconds between saves of the progress of such updates.
+MODULE_STATE_UPDATE_PROGRESS_INTERVAL = 5
+
+# Maximum number of StudentModules reset or deleted per query by bulk updates.
+MODULE_STATE_BULK_UPDATE_SIZE = 100
+
+###################### Sequence Rendering ######################
+# With FEATURES['ENABLE_LAZY_SEQUENCE_RENDERING'], the number of units on
+# either side of the active one that are rendered along with it.
+SEQUENCE_PREFETCH_UNITS = 1
+
 #### PASSWORD POLICY SETTINGS #####
 
 PASSWORD_MIN_LENGTH = None
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Benchmark the Mongo modulestore's metadata inheritance tree computation over a
+synthetic course, reporting the time taken and the size of the pickled tree (which
+is what gets written to memcached on every cache miss).
+
+    python scripts/benchmark_metadata_inheritance.py --blocks 10000
+"""
+
+import argparse
+import cPickle as pickle
+import operator
+import random
+import sys
+import time
+
+from xmodule.modulestore import Location
+from xmodule.modulestore.mongo.base import metadata_inheritance_tree
+
+
+# (category, number of children) for each level of the synthetic course
+LEVELS = [('chapter', 20), ('sequential', 10), ('vertical', 5)]
+LEAF_CATEGORIES = ['problem', 'html', 'video']
+
+
+def synthetic_course(num_blocks, metadata_rate, seed=0):
+    """
+    Return the Mongo records for the containers of a synthetic course with about
+    `num_blocks` blocks. Each container sets some inheritable metadata with
+    probability `metadata_rate`.
+    """
+    rand = random.Random(seed)
+    num_verticals = reduce(operator.mul, [count for __, count in LEVELS])
+    leaves_per_vertical = max(1, num_blocks // num_verticals - 1)
+
+    def location(category, name):
+        return Location('i4x', 'bench', 'course', category, name)
+
+    def metadata():
+        if rand.random() >= metadata_rate:
+            return {}
+        return {
+            'graded': rand.choice([True, False]),
+            'due': '2014-0{}-01T00:00:00Z'.format(rand.randint(1, 9)),
+            'showanswer': rand.choice(['always', 'finished', 'never']),
+        }
+
+    course = location('course', 'run')
+    records = []
+    parents = [course]
+    course_record = {
+        '_id': course.dict(),
+        'definition': {'children': []},
+        'metadata': {'start': '2014-01-01T00:00:00Z', 'graceperiod': '1 day'},
+    }
+    records.append(course_record)
+    records_by_url = {course.url(): course_record}
+    for category, count in LEVELS:
+        next_parents = []
+        for parent in parents:
+            for index in range(count):
+                child = location(category, '{}_{}'.format(parent.name, index))
+                record = {'_id': child.dict(), 'definition': {'children': []}, 'metadata': metadata()}
+                records.append(record)
+                records_by_url[child.url()] = record
+                records_by_url[parent.url()]['definition']['children'].append(child.url())
+                next_parents.append(child)
+        parents = next_parents
+    for parent in parents:
+        for index in range(leaves_per_vertical):
+            leaf = location(rand.choice(LEAF_CATEGORIES), '{}_{}'.format(parent.name, index))
+            records_by_url[parent.url()]['definition']['children'].append(leaf.url())
+
+    return records, len(records) + leaves_per_vertical * len(parents)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark metadata inheritance tree computation")
+    parser.add_argument('--blocks', type=int, default=10000, help="Approximate number of blocks in the course")
+    parser.add_argument('--metadata-rate', type=float, default=0.1,
+                        help="Fraction of containers that set inheritable metadata")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of timed runs")
+    args = parser.parse_args(argv)
+
+    records, num_blocks = synthetic_course(args.blocks, args.metadata_rate)
+    timings = []
+    for __ in range(args.repeat):
+        start = time.time()
+        tree = metadata_inheritance_tree(records)
+        timings.append(time.time() - start)
+
+    print "blocks:           {}".format(num_blocks)
+    print "tree entries:     {}".format(len(tree))
+    print "distinct dicts:   {}".format(len(set(id(metadata) for metadata in tree.itervalues())))
+    print "pickled size:     {} bytes".format(len(pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)))
+    print "best time:        {:.1f} ms".format(min(timings) * 1000)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))